@@ -2,7 +2,7 @@
     This helps expedite the process of setting anemones. It sets the exact location with
     correct offset, flippness, and rotation.
     
-    USAGE EXAMPLE: "python cli_anemone.py wx1"
+    USAGE EXAMPLE: "python cli_anemone.py wx1" or "python cli_anemone.py wx1 --stats" to also log how long each pattern took
 """
 import argparse
 import random
@@ -15,6 +15,7 @@ import logic.pattern.pattern_matcher as PM
 parser = argparse.ArgumentParser(description='Search a level for the layer _anemones & add corresponding anemones.')
 parser.add_argument('filename', type=str, help='Name of the tiled level XML to goo ATs objects to')
 parser.add_argument('--v', type=int, choices=[0, 1, 2], default=1, help='Verbosity level: 0 = silent. 2 = verbose')
+parser.add_argument('--stats', action='store_true', help='Log how long each pattern took to search & how often it matched')
 args = parser.parse_args()
 
 log.SetVerbosityLevel(args.v)
@@ -27,13 +28,12 @@ templates = ["anemone_flat", "anemone_flat_xl", "anemone_slope_1_xl", "anemone_s
              "anemone_slope_2_xl", "anemone_slope_2", "anemone_slope_4_xl", "anemone_slope_4"]
 
 pattern_matcher = PM.PatternMatcher()
-for pattern_file in templates:
-    file_path = file_utils.GetPatternRoot() + f"{pattern_file}.xml"
-    pattern_matcher.LoadPattern(file_path)
+pattern_matcher.LoadLibrary([file_utils.GetPatternRoot() + f"{pattern_file}.xml" for pattern_file in templates])
 
 # Look for matches. We search all visible tile layers
 pattern_matcher.FindAndCreate(playdo, "_anemones", "objects_anemones", allow_overlap = False)
 pattern_matcher.FindAndCreate(playdo, "_anemones2", "objects_anemones", allow_overlap = False, discard_old = False)
+if args.stats: pattern_matcher.LogMatchStats()
 
 # Flush changes to File!
 playdo.Write()
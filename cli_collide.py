@@ -10,6 +10,8 @@ Command-Line Tool to automatically add the following objects to a level:
 USAGE EXAMPLE:
     python cli_collide.py j01
     python cli_collide.py j01 --v 2
+    python cli_collide.py j01 --full    # Searches the whole level again, rather than only the tiles changed since the last run
+    python cli_collide.py j01 --stats   # Also logs how long each pattern took & how often it matched
 
 '''
 import argparse
@@ -81,6 +83,8 @@ _LIST_ASTEROIDS = [
 arg_description = 'Process a tiled level XML and add BB + reef objects to a "_BB" layer.'
 arg_help1 = 'Name of the tiled level XML to add BB & reef objects to'
 arg_help2 = 'Controls the amount of information displayed to screen. 0 = nearly silent, 2 = verbose'
+arg_help3 = 'Search the whole level again, instead of only around the tiles that changed since the last run'
+arg_help4 = 'Log how long each pattern took to search & how often it matched, slowest first'
 
 
 
@@ -90,6 +94,8 @@ def main():
     parser.add_argument('filename', type=str, help = arg_help1)
     parser.add_argument('--v', type=int, choices=[0, 1, 2], default=1, help = arg_help2)
     parser.add_argument('--rewind', action='store_true')
+    parser.add_argument('--full', action='store_true', help = arg_help3)
+    parser.add_argument('--stats', action='store_true', help = arg_help4)
     args = parser.parse_args()
     log.SetVerbosityLevel(args.v)
 
@@ -111,34 +117,33 @@ def main():
 
     # Create a PatternMatcher for "_BB" : Breakable Blocks and Skell Reefs
     pattern_matcher_bb = PM.PatternMatcher()
-    for pattern in _LIST_PATTERN_BB:
-        pattern_matcher_bb.LoadPattern(pattern_root + pattern + ".xml")
+    pattern_matcher_bb.LoadLibrary([pattern_root + pattern + ".xml" for pattern in _LIST_PATTERN_BB])
 
     # Create a PatternMatcher for "fg_raw" : Ground and Slopes
     pattern_matcher_ground = PM.PatternMatcher()
-    for pattern in _LIST_PATTERN_GROUND:
-        pattern_matcher_ground.LoadPattern(pattern_root + pattern + ".xml")
+    pattern_matcher_ground.LoadLibrary([pattern_root + pattern + ".xml" for pattern in _LIST_PATTERN_GROUND])
     
     # Create a PatternMatcher for "fg_crystal" : Crystals
     pattern_matcher_crystal = PM.PatternMatcher()
-    for pattern in _LIST_CRYSTAL:
-        pattern_matcher_crystal.LoadPattern(pattern_root + pattern + ".xml")
+    pattern_matcher_crystal.LoadLibrary([pattern_root + pattern + ".xml" for pattern in _LIST_CRYSTAL])
 
     # Create a PatternMatcher for "_asteroids" : Creates Asteroids
     pattern_matcher_asteroid = PM.PatternMatcher()
-    for pattern in _LIST_ASTEROIDS:
-        pattern_matcher_asteroid.LoadPattern(pattern_root + pattern + ".xml")
+    pattern_matcher_asteroid.LoadLibrary([pattern_root + pattern + ".xml" for pattern in _LIST_ASTEROIDS])
     
     # Check if fg_raw or _BB is in the available_layers list, only raises an error if BOTH layers are missing
     available_layers = playdo.GetAllTileLayerNames()
     if "fg_raw" not in available_layers and "_BB" not in available_layers:
         raise Exception("Could not add collisions. Neither fg_raw nor _BB tile layers were found!")
 
-    # Perform the matching - mold the playdo
-    pattern_matcher_bb.FindAndCreate(playdo, "_BB", "collisions_BB", allow_overlap = False)
-    pattern_matcher_ground.FindAndCreate(playdo, "fg_raw", "collisions", allow_overlap = False)
-    pattern_matcher_crystal.FindAndCreate(playdo, "fg_crystal", "collisions_crystal", allow_overlap = False)
-    pattern_matcher_asteroid.FindAndCreate(playdo, "_asteroids", "objects_asteroids", allow_overlap = False)
+    # Perform the matching - mold the playdo. Only the tiles changed since the last run are searched again
+    pattern_matcher_bb.FindAndCreate(playdo, "_BB", "collisions_BB", allow_overlap = False, incremental = not args.full)
+    pattern_matcher_ground.FindAndCreate(playdo, "fg_raw", "collisions", allow_overlap = False, incremental = not args.full)
+    pattern_matcher_crystal.FindAndCreate(playdo, "fg_crystal", "collisions_crystal", allow_overlap = False, incremental = not args.full)
+    pattern_matcher_asteroid.FindAndCreate(playdo, "_asteroids", "objects_asteroids", allow_overlap = False, incremental = not args.full)
+    if args.stats:
+        for pattern_matcher in [pattern_matcher_bb, pattern_matcher_ground, pattern_matcher_crystal, pattern_matcher_asteroid]:
+            pattern_matcher.LogMatchStats()
     
     VB.VaryBreakBlocks(playdo)
     # Flush changes to File!
@@ -14,7 +14,7 @@ import argparse
 import logic.common.file_utils as file_utils
 import logic.common.level_playdo as play
 import logic.common.tiled_utils as tiled
-import xml.etree.ElementTree as ET
+from logic.common.xml_backend import ET
 import logic.common.multi_target as multi
 import os
 
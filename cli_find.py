@@ -5,16 +5,24 @@ This is useful for when we need references and would like to know where a tile
 has been used. Also good for when we suspect a tile ID has become obsoleted and
 would like to confirm that no levels are using it.
 
+Which levels use which tiles is kept in an index (see tile_usage.py), only levels changed since the last
+search are scanned again. Only the levels the index points to are searched for the tile's coordinates.
+
 USAGE EXAMPLE:
 	python cli_search.py 657    # where 657 is a number ID assigned by TILED
+	python cli_find.py --unused # lists the tiles of the master tiles.png that no level uses
 '''
 
+import os
 import sys
 import time
 import argparse
+import numpy
 import logic.common.file_utils as file_utils
 import logic.common.tiled_utils as tiled_utils
+import logic.common.image_utils as image_utils
 import logic.finder.tile_finder as tile_finder
+import logic.finder.tile_usage as tile_usage
 import logic.common.log_utils as log
 
 
@@ -25,21 +33,24 @@ tool_description = 'Searches all levels for usecases of a tile ID'
 arg_desc_tile_id = 'ID of the tile we wish to search'
 arg_desc_prefix = 'Narrows the search selection requiring files match a prefix. For Ex: "--prefix=f" targets the stomach area'
 arg_desc_verbosity = 'Controls the amount of information displayed to screen. 0 = nearly silent, 2 = verbose'
+arg_desc_unused = 'Instead of searching for a tile ID, list the tiles of the master tiles.png that are not used by any level'
 
 
 def main():
     # Use argparse to get the filename & other optional arguments from the command line
     parser = argparse.ArgumentParser(description=tool_description)
-    parser.add_argument('tile_id', type=int, help=arg_desc_tile_id)
+    parser.add_argument('tile_id', type=int, nargs='?', help=arg_desc_tile_id)
     parser.add_argument('--prefix', type=str, default=None, help=arg_desc_prefix)
     parser.add_argument('--v', type=int, choices=[0, 1, 2], default=0, help=arg_desc_verbosity)
+    parser.add_argument('--unused', action='store_true', help=arg_desc_unused)
     args = parser.parse_args()
+    if args.tile_id is None and not args.unused:
+        parser.error('a tile_id is needed, unless --unused is given')
 
     log.SetVerbosityLevel(args.v)
-    log.Must(f'Running cli_find on TILE ID {args.tile_id} ...')
+    if args.unused: log.Must('Running cli_find on all tiles of the master tiles.png ...')
+    else: log.Must(f'Running cli_find on TILE ID {args.tile_id} ...')
     
-    true_tile_id = args.tile_id + 1 # TILE's funny offset thing
-    tiles_to_search = tiled_utils.GetTileIdPermutations(true_tile_id)
     files_to_search = file_utils.GetAllLevelFiles()
     
     # prune the list of files to search if "prefix" is specified
@@ -49,13 +60,28 @@ def main():
         
     num_files =  len(files_to_search)
     log.Must(f"Preparing to search {num_files} files...\n")
+
+    # Bring the index up to date, only the levels changed since the last search are scanned
+    on_progress = lambda num, total, filename: PrintProgressBar(num, total, prefix='Index Progress:', suffix=f'processing {_FormatName(filename)}', length=30)
+    tile_usage.Refresh(files_to_search, on_progress)
+    errored_levels = tile_usage.GetErroredLevels()
+    files_w_errors = [fn for fn in files_to_search if os.path.abspath(fn) in errored_levels]  # Files that could not be searched
+    if args.unused:
+        _ListUnusedTiles(files_to_search, files_w_errors)
+        return
+
+    # Only the files using the tile are searched, to find the coordinates where it's used
+    true_tile_id = args.tile_id + 1 # TILE's funny offset thing
+    tiles_to_search = tiled_utils.GetTileIdPermutations(true_tile_id)
+    tile_usage_by_file = tile_usage.GetTileUsage(true_tile_id)
+    files_using_tile = [fn for fn in files_to_search if os.path.abspath(fn) in tile_usage_by_file]
+    log.Info(f"\nThe index found TILE ID {args.tile_id} in {len(files_using_tile)} files")
     
-    files_w_errors = []     # List of files that could not be searched, likely due to using wrong encoding
     files_w_matches = {}    # dict mapping file_name to another dict of {tile_layer_name : coordinates}
                             # In other words: {file_name : {tile_layer_name : [(x1,y1), (x2, y2), ...]}
-    for num, filename in enumerate(files_to_search):
+    for num, filename in enumerate(files_using_tile):
         search_results = tile_finder.SearchFileForTileIds(filename, tiles_to_search)
-        PrintProgressBar(num + 1, num_files, prefix='Find Progress:', suffix=f'processing {_FormatName(filename)}', length=30)
+        PrintProgressBar(num + 1, len(files_using_tile), prefix='Find Progress:', suffix=f'processing {_FormatName(filename)}', length=30)
         if search_results:
             files_w_matches[file_utils.StripFilename(filename)] = search_results
         elif search_results is None:
@@ -78,6 +104,26 @@ def main():
     log.Must(f"\n\ncli_find concluded! {len(files_w_matches)} files found with a match!")
 
 
+def _ListUnusedTiles(files_to_search, files_w_errors):
+    '''Logs the tiles of the master tiles.png (by the number ID assigned by TILED) that none of the files use'''
+    tiles_png_path = file_utils.GetGfxFolder() + "tiles.png"
+    if not os.path.exists(tiles_png_path):
+        log.Must(f"\nError in graphics file '{tiles_png_path}'!\nGraphics PNG does not exist!")
+        return
+    num_cols, num_rows = image_utils.GetTileSheetSize(tiles_png_path)
+    num_tiles = num_cols * num_rows
+
+    used_tile_ids = tile_usage.GetUsedTileIds(files_to_search)
+    unused_tile_ids = (numpy.setdiff1d(numpy.arange(1, num_tiles + 1), used_tile_ids) - 1).tolist()
+    if files_w_errors:
+        log.Must(f"\nWARNING: The below {len(files_w_errors)} files were unsearchable, their tiles are not accounted for!")
+        for erred_file in files_w_errors:
+            log.Must(f" - {file_utils.StripFilename(erred_file)}")
+    log.Must(f"\n\n{len(unused_tile_ids)} of {num_tiles} tiles are not used in any of the {len(files_to_search)} files:\n")
+    for i in range(0, len(unused_tile_ids), 16):
+        log.Must(' '.join(f'{tile_id:>5}' for tile_id in unused_tile_ids[i:i+16]))
+
+
 def PrintProgressBar(iteration, total, prefix='', suffix='', decimals=1, length=50, fill='='):
     """Call in a loop to create terminal progress bar"""
     percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
@@ -2,7 +2,7 @@
     This helps expedite the process of setting goo ATs. It sets the exact location with
     correct offset, flippness, and rotation.
     
-    USAGE EXAMPLE: "python cli_goo.py l27"
+    USAGE EXAMPLE: "python cli_goo.py l27" or "python cli_goo.py l27 --stats" to also log how long each pattern took
 """
 import argparse
 import random
@@ -15,6 +15,7 @@ import logic.pattern.pattern_matcher as PM
 parser = argparse.ArgumentParser(description='Search a level for the layer _goo_ATs & add corresponding goo ATs.')
 parser.add_argument('filename', type=str, help='Name of the tiled level XML to goo ATs objects to')
 parser.add_argument('--v', type=int, choices=[0, 1, 2], default=1, help='Verbosity level: 0 = silent. 2 = verbose')
+parser.add_argument('--stats', action='store_true', help='Log how long each pattern took to search & how often it matched')
 args = parser.parse_args()
 
 log.SetVerbosityLevel(args.v)
@@ -26,12 +27,11 @@ playdo = play.LevelPlayDo(file_utils.GetFullLevelPath(args.filename))
 templates = ["goo_flat_3", "goo_flat_2", "goo_flat_1", "goo_slope_4", "goo_slope_2", "goo_slope_1"]
 
 pattern_matcher = PM.PatternMatcher()
-for pattern_file in templates:
-    file_path = file_utils.GetPatternRoot() + f"{pattern_file}.xml"
-    pattern_matcher.LoadPattern(file_path)
+pattern_matcher.LoadLibrary([file_utils.GetPatternRoot() + f"{pattern_file}.xml" for pattern_file in templates])
 
 # Look for matches. We search all visible tile layers
 pattern_matcher.FindAndCreate(playdo, "_goo_ATs", "objects_goo_ATs", allow_overlap = False)
+if args.stats: pattern_matcher.LogMatchStats()
 
 # Flush changes to File!
 playdo.Write()
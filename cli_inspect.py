@@ -13,7 +13,7 @@ import time
 import argparse
 import logic.common.log_utils as log
 import logic.common.file_utils as file_utils
-import logic.common.level_playdo as play
+import logic.common.level_scanner as level_scanner
 
 #--------------------------------------------------#
 '''Pattern Lists'''
@@ -27,51 +27,32 @@ arg_description = "Inspect a tiled level XML to inform aboutthe level's costs in
 arg_help1 = 'Name of the tiled level XML in which to count the rectangles, polygons, and polylines'
 arg_help2 = 'Controls the amount of information displayed to screen. 0 = nearly silent, 2 = verbose'
 
-def IsPolyline(tiled_object):
-    polyline = tiled_object.find('polyline')
-    if polyline is not None:
-        return True
-    return False
-
-def IsPolygon(tiled_object):    
-    polygon = tiled_object.find('polygon')
-    if polygon is not None:
-        return True
-    return False
-
 def Inspect(filename):
     ''' Inspects a Tiled level XML and returns the total counts of (num_rect, num_polys, num_lines, num_relic_block) '''
-    # Use a playdo to read/process the XML
+    # Stream the XML, as nothing gets edited. Levels unchanged since the last inspection are read from their snapshot
     if filename.endswith('.xml') or filename.endswith('.tmx'): # cases where we run cli_inspect on all files 
-        playdo = play.LevelPlayDo(filename)
+        scanner = level_scanner.LevelScanner(filename, use_cache=True)
     else:
-        playdo = play.LevelPlayDo(file_utils.GetFullLevelPath(filename)) # cases where we run cli_inspect on individual file "f02"
+        scanner = level_scanner.LevelScanner(file_utils.GetFullLevelPath(filename), use_cache=True) # cases where we run cli_inspect on individual file "f02"
     
-    # Retrieve all the object groups, layers tucked inside folder are also solved by using GetAllObjectGroup (per comment from playdo file)
-    obj_grps = playdo.GetAllObjectgroup(is_print=False)
-    layers_w_collision = [] # ["collisions_CAVE", "collisions_BB", "collisions_TREE"] XML objectgroup with name attribute that starts with "collisions"
+    # Objects from all object groups are scanned, including those tucked inside folders
     num_relic = 0
-    for obj_grp in obj_grps:                             
-        group_name = obj_grp.get("name", "")
-        if group_name.startswith("collisions"):
-            layers_w_collision.append(obj_grp)
-        if group_name.startswith("objects"): # Groups that starts with "objects" will only contain relic blocks
-            for shape in obj_grp:
-                if shape.get("name") == "relic_block":
-                    num_relic += 1    
-
     num_rects = 0
     num_polys = 0
     num_lines = 0
-    # Count shapes in collision layers, handle case where obj_group starts with "collisions" in which we have all shapes (polygon, lines, rects, and relic blocks)
-    for obj_grp in layers_w_collision:
-        for shape in obj_grp:
-            if IsPolygon(shape):
+    for shape in scanner.Objects():
+        group_name = shape['objectgroup']
+        if group_name.startswith("objects"): # Groups that starts with "objects" will only contain relic blocks
+            if shape['name'] == "relic_block":
+                num_relic += 1
+        # Count shapes in collision layers, handle case where obj_group starts with "collisions" in which we have all shapes (polygon, lines, rects, and relic blocks)
+        if group_name.startswith("collisions"): # ["collisions_CAVE", "collisions_BB", "collisions_TREE"]
+            if shape['shape'] == 'polygon':
                 num_polys += 1
-            elif IsPolyline(shape):
+            elif shape['shape'] == 'polyline':
                 num_lines += 1
             else:
-                if shape.get("name") == "relic_block":
+                if shape['name'] == "relic_block":
                     num_relic += 1
                 else:
                     num_rects += 1
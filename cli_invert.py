@@ -35,18 +35,19 @@ def main():
     log.SetVerbosityLevel(args.v)
 
     # Use a playdo to read/process the XML
-    playdo = play.LevelPlayDo(file_utils.GetFullLevelPath(args.filename))
+    # Tiles2d are handed out as numpy arrays, so whole layers are rotated & flipped at once
+    playdo = play.LevelPlayDo(file_utils.GetFullLevelPath(args.filename), use_arrays = True)
 
     # Main Logic
     for layer_name in playdo.GetAllTileLayerNames():
         tiles2d = playdo.GetTiles2d(layer_name)
         
-        tiles2d = tiled_utils.RotateTiles2d(tiles2d)
-        tiles2d = tiled_utils.RotateTiles2d(tiles2d)
+        tiles2d = tiled_utils.RotateArray2d(tiles2d)
+        tiles2d = tiled_utils.RotateArray2d(tiles2d)
         
         # "inverting" is accomplished by two rotations & then a flipX, because we don't have a flipY
         if not args.rotate:
-            tiles2d = tiled_utils.FlipTiles2d(tiles2d)
+            tiles2d = tiled_utils.FlipArray2d(tiles2d)
             
         playdo.SetTiles2d(layer_name, tiles2d)
 
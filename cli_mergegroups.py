@@ -19,7 +19,7 @@ import argparse
 import logic.common.file_utils as file_utils
 import logic.common.level_playdo as play
 import logic.common.log_utils as log
-import xml.etree.ElementTree as ET
+from logic.common.xml_backend import ET
 
 # Use argparse to get the filename & other optional arguments from the command line
 parser = argparse.ArgumentParser(description='Combine two or more object groups of a tiled level XML')
@@ -78,17 +78,16 @@ def main():
         return
         
     for objectgroup_name in merge_opportunities:
-        combined_group = ET.Element("objectgroup", name=objectgroup_name)
+        combined_group = ET.SubElement(playdo.level_root, "objectgroup", name=objectgroup_name)
         
+        # Objects are moved through the playdo so its parent map stays valid
         objectgroups_to_combine = wider_objectgroup_map[objectgroup_name]
         for objectgroup in objectgroups_to_combine:
             for obj in objectgroup.findall("object"):
-                combined_group.append(obj)
+                playdo.MoveElement(obj, combined_group)
             parent = parent_map[objectgroup]
             parent.remove(objectgroup)
         
-        playdo.level_root.append(combined_group)
-        
     # Proceeding with merge operation. Flush changes to File!
     playdo.Write()
 
@@ -22,12 +22,19 @@ USAGE EXAMPLE:
     
     > python cli_migration.py
 
+    Forgotten tiles are only reported if a level uses them (see tile_usage.py). Levels changed since the
+    last run of cli_find or cli_migration are scanned for their tiles first
+
     The below command has "real_run" specified, so changes will be recorded. However, a prefix
     is also specified, so it'll target just one level (a02). Useful as a small test run
     > python cli_migration.py --real_run --prefix=a02
     
     The below command performs the run for real on the entire levels folder
     > python cli_migration.py --real_run 
+
+    Levels are migrated across one process per CPU core. The below command limits this to 4 processes,
+    "--workers=1" migrates one level after another within this process
+    > python cli_migration.py --real_run --workers=4
     
 TRELLO SOURCES:
     https://trello.com/c/rzlr5Ncw <-- This contains the latest video how-to demo
@@ -39,9 +46,11 @@ import os
 import sys
 import time
 import argparse
+import concurrent.futures
 import logic.common.level_playdo as play
 import logic.common.file_utils as file_utils
 import logic.remapper.tile_remapper as TM
+import logic.finder.tile_usage as tile_usage
 import logic.common.log_utils as log
 
 
@@ -89,21 +98,69 @@ def _CompactPrintFiles(files):
 
 
 
-def PerformTilesMigration(tile_remapper, files_to_process, is_real_run):
+def PerformTilesMigration(tile_remapper, files_to_process, is_real_run, num_workers = 1):
+    '''
+     Remaps every file (& writes it back when is_real_run). With more than 1 worker, files are migrated across
+     a pool of processes, each given the tile_remapper once. Returns the number of tiles remapped in each file as a
+     list of (file_name, count), & the files that errored out as a list of (file_name, error_message), both in
+     the order of files_to_process
+    '''
     total_files = len(files_to_process)
-    errored_files_n_messages = [] # List of tuple of file_name to error_messages
-    for i, file_path in enumerate(files_to_process, 1):
-        short_name = _FormatName(file_path)
-        try:
-            PrintProgressBar(i, total_files, prefix='Migration Progress:', suffix=f'processing {short_name}', length=50)
-            playdo = play.LevelPlayDo(file_path)
-            tile_remapper.Remap(playdo)
-            if is_real_run: playdo.Write()
-        except Exception as e:
-            errored_files_n_messages.append((short_name, str(e)))
+    results = [None] * total_files # (count, error_message) of each file
+    if num_workers <= 1 or total_files <= 1:
+        for i, file_path in enumerate(files_to_process, 1):
+            PrintProgressBar(i, total_files, prefix='Migration Progress:', suffix=f'processing {_FormatName(file_path)}', length=50)
+            results[i - 1] = _MigrateFile(tile_remapper, file_path, is_real_run)
+    else:
+        # The remapper (with its lookup tables already built) is sent to each process once, not with every file
+        tile_remapper.PrepareLookupTables()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, initializer=_InitWorker, initargs=(tile_remapper,)) as executor:
+            futures = {executor.submit(_MigrateFileInWorker, file_path, is_real_run): num for num, file_path in enumerate(files_to_process)}
+            for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                num = futures[future]
+                PrintProgressBar(i, total_files, prefix='Migration Progress:', suffix=f'processed {_FormatName(files_to_process[num])}', length=50)
+                try:
+                    results[num] = future.result()
+                except Exception as e:
+                    results[num] = (0, str(e))  # e.g. the process died
             
     PrintProgressBar(100, 100, prefix='Migration Progress:', suffix='COMPLETE!!!'.ljust(40), length=50)
-    return errored_files_n_messages
+    remap_counts = []
+    errored_files_n_messages = [] # List of tuple of file_name to error_messages
+    for file_path, (count, error_message) in zip(files_to_process, results):
+        if error_message is None: remap_counts.append((_FormatName(file_path), count))
+        else: errored_files_n_messages.append((_FormatName(file_path), error_message))
+    return remap_counts, errored_files_n_messages
+
+
+
+def _MigrateFile(tile_remapper, file_path, is_real_run, interactive = True):
+    '''
+     Returns (number of tiles remapped, None), or (0, error_message) if the file errored out
+     interactive - when False, the user is never prompted & e.g. levels with multiple tilesheets count as errored
+    '''
+    try:
+        playdo = play.LevelPlayDo(file_path, interactive=interactive)
+        count = tile_remapper.Remap(playdo)
+        if is_real_run: playdo.Write()
+        return count, None
+    except Exception as e:
+        return 0, str(e)
+
+
+
+_worker_tile_remapper = None # The TileRemapper of a worker process, set once as the process starts
+
+def _InitWorker(tile_remapper):
+    global _worker_tile_remapper
+    _worker_tile_remapper = tile_remapper
+
+def _MigrateFileInWorker(file_path, is_real_run):
+    # Workers can't be answered (their stdin is closed), & must never exit before reporting back
+    try:
+        return _MigrateFile(_worker_tile_remapper, file_path, is_real_run, interactive=False)
+    except SystemExit as e:
+        return 0, f'exited early ({e})'
 
 
 
@@ -112,6 +169,7 @@ arg_real_run_desc = 'By default, all runs are simulation runs. Set this flag to
 arg_new_tiles_desc = 'Name of the new tiles XML we are migrating to. This XML should sit in the regular Levels folder'
 arg_prefix_desc = 'Narrows the migration selection requiring files match a prefix. For Ex: "--prefix=f" targets the stomach area'
 arg_desc_verbosity = 'Controls the amount of information displayed to screen. 0 = nearly silent, 2 = verbose'
+arg_workers_desc = 'Number of processes migrating levels at once. Defaults to the number of CPU cores, 1 migrates one level at a time'
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description=tool_description)
@@ -119,6 +177,7 @@ if __name__ == "__main__":
     parser.add_argument('--new_tiles', type=str, default='new_tiles', help=arg_new_tiles_desc)
     parser.add_argument('--prefix', type=str, default=None, help=arg_prefix_desc)
     parser.add_argument('--v', type=int, choices=[0, 1, 2], default=1, help=arg_desc_verbosity )
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help=arg_workers_desc)
     args = parser.parse_args()
     
     log.SetVerbosityLevel(args.v)
@@ -130,7 +189,11 @@ if __name__ == "__main__":
     mapping_file_path = file_utils.GetFullLevelPath(args.new_tiles)
     tiles_png_path = file_utils.GetGfxFolder() + "tiles.png"
     
-    unseen_tile_ids = tile_remapper.LoadMigrationMap(mapping_file_path, tiles_png_path)
+    # Forgotten tiles only matter if a level uses them. new_tiles.xml sits among the levels, but uses every tile
+    level_files = file_utils.GetAllLevelFiles()
+    level_files = [fn for fn in level_files if os.path.abspath(fn) != os.path.abspath(mapping_file_path)]
+    tile_usage.Refresh(level_files)
+    unseen_tile_ids = tile_remapper.LoadMigrationMap(mapping_file_path, tiles_png_path, tile_usage.GetUsedTileIds(level_files))
     
     if unseen_tile_ids:
         log.Must(f"\nDiscovered {len(unseen_tile_ids)} forgotten tiles! Check generated image.")
@@ -158,8 +221,11 @@ if __name__ == "__main__":
         
     # Begin the Tiles Migration
     log.Must('\n')
-    errors = PerformTilesMigration(tile_remapper, files_to_process, args.real_run)
+    remap_counts, errors = PerformTilesMigration(tile_remapper, files_to_process, args.real_run, args.workers)
     log.Must('\n')
+    for filename, count in remap_counts:
+        log.Extra(f"\t{filename} - {count} tiles remapped")
+    log.Must(f"Remapped {sum(count for _, count in remap_counts)} tiles across {len(remap_counts)} files")
     
     if not errors: sys.exit()
     
@@ -3,10 +3,11 @@
     and their glow values are randomly generated within their acceptable range. After which, it's easy
     to trim down and reduce their effect as needed.
     
-    USAGE EXAMPLE: "python cli_natty.py d51"
+    USAGE EXAMPLE: "python cli_natty.py d51" or "python cli_natty.py d51 --stats" to also log how long each pattern took
 """
 import argparse
 import random
+import logic.common.log_utils as log
 import logic.common.level_playdo as play
 import logic.common.file_utils as file_utils
 import logic.pattern.pattern_matcher as PM
@@ -15,8 +16,11 @@ import logic.pattern.pattern_matcher as PM
 parser = argparse.ArgumentParser(description='Search a level for natty mark tiles & add corresponding natty mark ATs.')
 parser.add_argument('filename', type=str, help='Name of the tiled level XML to natty mark objects to')
 parser.add_argument('--v', type=int, choices=[0, 1, 2], default=1, help='Verbosity level: 0 = silent. 2 = verbose')
+parser.add_argument('--stats', action='store_true', help='Log how long each pattern took to search & how often it matched')
 args = parser.parse_args()
 
+log.SetVerbosityLevel(args.v)
+
 # Use a playdo to read/process the XML
 playdo = play.LevelPlayDo(file_utils.GetFullLevelPath(args.filename))
 
@@ -24,12 +28,11 @@ playdo = play.LevelPlayDo(file_utils.GetFullLevelPath(args.filename))
 templates = ["good1", "good2", "good3", "good4", "bad1", "bad2", "bad3", "bad4",
     "clam1", "clam2", "clam3", "clam4", "puzz1", "puzz2", "puzz3", "puzz4"]
 pattern_matcher = PM.PatternMatcher()
-for template_file in templates:
-    file_path = file_utils.GetTemplateRoot() + f"{template_file}.xml"
-    pattern_matcher.LoadPattern(file_path)
+pattern_matcher.LoadLibrary([file_utils.GetTemplateRoot() + f"{template_file}.xml" for template_file in templates])
 
 # Look for matches. We search all visible tile layers
 pattern_matcher.FindAndCreateAll(playdo, "objects_natty_mark_ATs")
+if args.stats: pattern_matcher.LogMatchStats()
 
 # After FindAndCreateAll(), we have created a new object layer called "objects_natty_mark_ATs" that
 # contains Natty Mark AT objects. However, the objects are still "templates" - meaning they contain
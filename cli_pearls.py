@@ -2,10 +2,11 @@
     tiles. This helps expedite the process of setting oysters, and particularly their angle, which when
     outside of the 8 cardinal directions, can have finnicky precise angle setting requirements.
     
-    USAGE EXAMPLE: "python cli_pearls.py l26"
+    USAGE EXAMPLE: "python cli_pearls.py l26" or "python cli_pearls.py l26 --stats" to also log how long each pattern took
 """
 import argparse
 import random
+import logic.common.log_utils as log
 import logic.common.level_playdo as play
 import logic.common.file_utils as file_utils
 import logic.pattern.pattern_matcher as PM
@@ -14,20 +15,22 @@ import logic.pattern.pattern_matcher as PM
 parser = argparse.ArgumentParser(description='Search a level for natty mark tiles & add corresponding natty mark ATs.')
 parser.add_argument('filename', type=str, help='Name of the tiled level XML to natty mark objects to')
 parser.add_argument('--v', type=int, choices=[0, 1, 2], default=1, help='Verbosity level: 0 = silent. 2 = verbose')
+parser.add_argument('--stats', action='store_true', help='Log how long each pattern took to search & how often it matched')
 args = parser.parse_args()
 
+log.SetVerbosityLevel(args.v)
+
 # Use a playdo to read/process the XML
 playdo = play.LevelPlayDo(file_utils.GetFullLevelPath(args.filename))
 
 # Create a PatternMatcher and load in the patterns it'll scan for
 patterns = ["pearls0", "pearls1", "pearls2", "pearls3", "pearls4"]
 pattern_matcher = PM.PatternMatcher()
-for pattern_file in patterns:
-    file_path = file_utils.GetPatternRoot() + f"{pattern_file}.xml"
-    pattern_matcher.LoadPattern(file_path)
+pattern_matcher.LoadLibrary([file_utils.GetPatternRoot() + f"{pattern_file}.xml" for pattern_file in patterns])
 
 # Look for matches. We search all visible tile layers
 pattern_matcher.FindAndCreate(playdo, "_pearls", "objects_pearls", allow_overlap = False)
+if args.stats: pattern_matcher.LogMatchStats()
 
 # Flush changes to File!
 playdo.Write()
@@ -7,7 +7,7 @@ USAGE EXAMPLE:
     python cli_dupe_tiles.py l02
 """
 import argparse
-import xml.etree.ElementTree as ET
+from logic.common.xml_backend import ET
 import logic.common.level_playdo as play
 import logic.common.file_utils as file_utils
 import logic.common.log_utils as log
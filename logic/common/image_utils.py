@@ -23,6 +23,32 @@ def SliceTileSheet(png_image_path, make_into_np_array = False, tile_size = 16):
 
 
 
+def SliceTileSheetIntoArray(png_image_path, tile_size = 16):
+    '''
+    Slice a tilesheet png into tiles, returned as a single np.array (RGBA) of shape (rows, cols, tile_size, tile_size, 4).
+    The tiles are a view of the sheet's pixels rather than copies, so tiles only get copied (or made into images with
+    NpArrayToImage) when needed, e.g. tiles[row][col].tobytes()
+    '''
+    with Image.open(png_image_path) as img:
+        sheet_array = np.asarray(img.convert('RGBA'))
+
+    # Same as cropping past the edge, partial tiles are padded with transparent pixels
+    rows = math.ceil(sheet_array.shape[0] / tile_size)
+    cols = math.ceil(sheet_array.shape[1] / tile_size)
+    if sheet_array.shape[:2] != (rows * tile_size, cols * tile_size):
+        padding = ((0, rows * tile_size - sheet_array.shape[0]), (0, cols * tile_size - sheet_array.shape[1]), (0, 0))
+        sheet_array = np.pad(sheet_array, padding)
+    return sheet_array.reshape(rows, tile_size, cols, tile_size, 4).swapaxes(1, 2)
+
+
+
+def GetTileSheetSize(png_image_path, tile_size = 16):
+    '''Returns the (columns, rows) of tiles in a tilesheet png, counting partial tiles. Only the png's header is read'''
+    with Image.open(png_image_path) as img:
+        return math.ceil(img.width / tile_size), math.ceil(img.height / tile_size)
+
+
+
 def NpArrayToImage(np_array):
     return Image.fromarray(np_array, 'RGBA')
 
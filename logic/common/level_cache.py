@@ -0,0 +1,190 @@
+'''
+Logic module for keeping decoded snapshots of levels on disk, inside the tool folder
+
+Parsing a level XML and inflating every tile layer is the slowest part of most tool runs. A snapshot
+keeps each tile layer already decoded as a .npy file (memory-mapped when loaded, so only the parts
+actually read are brought in) along with a compact table of the level's objects. A snapshot is only
+used while the level's size and content hash still match, otherwise it is rebuilt on the next run.
+
+USAGE EXAMPLE:
+    playdo = play.LevelPlayDo(file_name, use_cache=True)    # Loads from the snapshot when it's fresh
+    level_cache.ClearCache()                                # Deletes all snapshots
+'''
+
+import os
+import json
+import shutil
+import hashlib
+import numpy
+from pathlib import Path
+import logic.common.log_utils as log
+import logic.common.file_utils as file_utils
+import logic.common.tiled_utils as tiled_utils
+
+#--------------------------------------------------#
+'''Variables'''
+
+CACHE_VERSION = 2               # Bump whenever the snapshot format changes, so old snapshots are ignored
+META_FILE_NAME = 'meta.json'
+LAYER_FILE_PREFIX = 'layer_'
+LAYER_EXTENSION = '.npy'
+
+
+
+
+#--------------------------------------------------#
+'''General Public Functions'''
+
+def LoadSnapshot(level_path, level_bytes):
+	'''
+	 Returns the snapshot (a dictionary, see SaveSnapshot) of the level if it's still fresh, otherwise None
+	 level_bytes is the content of the level file, already read by the caller
+	 Tile arrays are memory-mapped copy-on-write, so editing them never touches the snapshot on disk
+	'''
+	meta_path = _GetSnapshotFolder(level_path) / META_FILE_NAME
+	if not meta_path.exists(): return None
+
+	try:
+		with open(meta_path, 'r') as meta_file:
+			snapshot = json.load(meta_file)
+	except (OSError, ValueError):
+		log.Extra(f'-- level_cache.py : unreadable snapshot for {level_path}, ignoring it')
+		return None
+
+	# The size is a cheap check, but the content hash is what decides. A level touched without edits stays fresh
+	if snapshot.get('version') != CACHE_VERSION: return None
+	if snapshot.get('size') != len(level_bytes): return None
+	if snapshot.get('content_hash') != _HashContent(level_bytes): return None
+
+	try:
+		for tile_layer in snapshot['tile_layers']:
+			layer_file_name = tile_layer['file']
+			if layer_file_name is None: tile_layer['tiles_array'] = None
+			else: tile_layer['tiles_array'] = numpy.load(meta_path.parent / layer_file_name, mmap_mode='c').view(numpy.ndarray)
+	except (OSError, ValueError):
+		log.Extra(f'-- level_cache.py : incomplete snapshot for {level_path}, ignoring it')
+		return None
+
+	log.Extra(f'-- level_cache.py : loaded snapshot for {level_path}')
+	return snapshot
+
+
+
+def SaveSnapshot(level_path, level_bytes, map_attributes, tile_layers, object_table):
+	'''
+	 Stores a snapshot of the level, replacing the previous one
+
+	 :param level_path:     Path of the level XML the snapshot is for
+	 :param level_bytes:    Content of the level file, the snapshot is valid for as long as the file holds the same
+	 :param map_attributes: Dictionary of the map's width, height, tilewidth & tileheight
+	 :param tile_layers:    List of dictionaries with 'name', 'folder_path', 'width', 'height', 'digest' (hex string)
+	                        and 'tiles_array' of each tile layer in document order. Layers without data have None
+	 :param object_table:   List of dictionaries, see BuildObjectTable
+	'''
+	folder_path = _GetSnapshotFolder(level_path)
+	shutil.rmtree(folder_path, ignore_errors=True)
+	folder_path.mkdir(parents=True, exist_ok=True)
+
+	snapshot_layers = []
+	for num, tile_layer in enumerate(tile_layers):
+		snapshot_layer = {key: value for key, value in tile_layer.items() if key != 'tiles_array'}
+		snapshot_layer['file'] = None
+		if tile_layer['tiles_array'] is not None:
+			snapshot_layer['file'] = f'{LAYER_FILE_PREFIX}{num}{LAYER_EXTENSION}'
+			numpy.save(folder_path / snapshot_layer['file'], tile_layer['tiles_array'])
+		snapshot_layers.append(snapshot_layer)
+
+	snapshot = {
+		'version': CACHE_VERSION,
+		'path': os.path.abspath(level_path),
+		'mtime_ns': os.stat(level_path).st_mtime_ns,
+		'size': len(level_bytes),
+		'content_hash': _HashContent(level_bytes),
+		'map': map_attributes,
+		'tile_layers': snapshot_layers,
+		'objects': object_table,
+	}
+
+	# The meta file is written last & swapped in at once, so an interrupted save leaves no snapshot behind
+	temp_meta_path = folder_path / (META_FILE_NAME + '.tmp')
+	with open(temp_meta_path, 'w') as meta_file:
+		json.dump(snapshot, meta_file)
+	os.replace(temp_meta_path, folder_path / META_FILE_NAME)
+	log.Extra(f'-- level_cache.py : saved snapshot for {level_path}')
+
+
+
+def BuildObjectTable(level_root):
+	'''
+	 Returns a compact table of all objects in the level as a list of dictionaries (see MakeObjectRow), in document order
+	'''
+	object_table = []
+	for objectgroup in level_root.iter('objectgroup'):
+		objectgroup_name = objectgroup.get('name', '')
+		for obj in objectgroup.findall('object'):
+			object_table.append(MakeObjectRow(objectgroup_name, obj))
+	return object_table
+
+
+
+def MakeObjectRow(objectgroup_name, obj):
+	'''
+	 Returns the object table's row for one object, e.g.
+	   {'objectgroup': 'collisions', 'name': 'relic_block', 'type': None, 'shape': 'rect', 'x': 16.0, 'y': 32.0, ...}
+	 shape is one of 'rect', 'polygon', 'polyline', 'ellipse' or 'point', & properties holds all of the object's properties
+	'''
+	return {
+		'objectgroup': objectgroup_name,
+		'id': obj.get('id'),
+		'name': obj.get('name'),
+		'type': obj.get('type', obj.get('class')),
+		'shape': _GetShape(obj),
+		'x': float(obj.get('x', 0)),
+		'y': float(obj.get('y', 0)),
+		'width': float(obj.get('width', 0)),
+		'height': float(obj.get('height', 0)),
+		'properties': tiled_utils.ParsePropertiesFromObject(obj),    # Not cached, LevelScanner clears each object right after
+	}
+
+
+
+def GetCacheFolder():
+	'''Returns the path of the folder inside the tool folder, where level snapshots (& other caches) are kept'''
+	folder_path = Path( file_utils.GetInputFolder() )
+	folder_path = folder_path.parent
+	folder_path /= 'cache/'    # This adds the folder to the directory
+	return folder_path
+
+
+
+def ClearCache():
+	'''Deletes all level snapshots, along with everything else in the cache folder'''
+	folder_path = GetCacheFolder()
+	log.Info(f' Deleting all level snapshots at \"{folder_path}\"...')
+	shutil.rmtree(folder_path, ignore_errors=True)
+
+
+
+
+#--------------------------------------------------#
+'''Private Functions'''
+
+def _GetSnapshotFolder(level_path):
+	'''Each level gets its own folder, named after the level & keyed by its full path (levels may share names)'''
+	full_path = os.path.abspath(level_path)
+	path_hash = hashlib.blake2b(full_path.encode('utf-8'), digest_size=8).hexdigest()
+	return GetCacheFolder() / f'{file_utils.StripFilename(full_path)}-{path_hash}'
+
+def _HashContent(level_bytes):
+	return hashlib.blake2b(level_bytes, digest_size=16).hexdigest()
+
+def _GetShape(obj):
+	for shape in ('polygon', 'polyline', 'ellipse', 'point'):
+		if obj.find(shape) is not None: return shape
+	return 'rect'
+
+
+
+
+
+# end of file
@@ -13,36 +13,132 @@ An example usage of LevelPlayDo would be as follows:
     playdo.write()                                      # Write back our changes to the tiled xml
     
 '''
+import re
 import sys
 import random
-import copy
-import xml.etree.ElementTree as ET
+import numpy
 import logic.common.log_utils as log
+import logic.common.xml_backend as xml_backend
+from logic.common.xml_backend import ET
 import logic.common.tiled_utils as tiled_utils
 import logic.common.file_utils as file_utils
 import logic.common.backup_utils as backup_utils
+import logic.common.level_cache as level_cache
 
 
 
 #--------------------------------------------------#
 
+class _TileLayer():
+    '''Registry entry for one tile layer of the level. Created at parse time, but the layer's tile data is
+    only decoded the first time it is requested'''
+
+    def __init__(self, element, name, folder_path, width, height):
+        self.element = element          # The <layer> XML element
+        self.name = name                # Name of the layer, 'unnamed_tile_layer' if it has none
+        self.folder_path = folder_path  # Folders (Tiled groups) the layer is tucked in, e.g. 'rules/mouth/'
+        self.width = width              # Layer width in tiles
+        self.height = height            # Layer height in tiles
+        self.tiles_array = None         # Decoded tile IDs as a 2D numpy array, filled on first request
+        self.tiles2d = None             # Decoded tile IDs in the format the playdo hands out (list or array)
+        self.is_hashed = False          # True once the tile IDs were added to the playdo's hash sets
+        self.saved_digest = None        # Digest of the tile IDs currently encoded in the XML, to detect no-op edits
+        self.disk_digest = None         # Digest of the tile IDs as they are on disk...
+        self.disk_data_str = None       #  ... and the data string that encodes them there, restored on undo
+        self.disk_data_span = None      # (start, end) byte offsets of the <data> payload within the file on disk
+        self.snapshot_array = None      # Memory-mapped tile IDs from the level's snapshot, used in place of decoding
+        self.chunks = None              # For layers of infinite maps, their _TileChunks sorted by (y, x). None otherwise
+        self.origin_x = 0               # Tile coordinates of the layer's top-left tile. Only chunked layers...
+        self.origin_y = 0               #  ... can start elsewhere than (0, 0), even at negative coordinates
+
+
+
+class _TileChunk():
+    '''One <chunk> of a tile layer in an infinite map. Its data is only decoded once a region touching it is accessed'''
+
+    def __init__(self, element, x, y, width, height):
+        self.element = element          # The <chunk> XML element
+        self.x = x                      # Tile coordinates of the chunk's top-left tile
+        self.y = y
+        self.width = width              # Chunk size in tiles, usually 16 x 16
+        self.height = height
+        self.tiles_array = None         # Decoded tile IDs as a 2D numpy array, filled on first request
+        self.saved_digest = None        # Same as _TileLayer's, but for this chunk only
+        self.disk_digest = None
+        self.disk_data_str = element.text
+
+
+
+class _ObjectIndex():
+    '''Lookup tables for the level's TILED objects, so searching for them doesn't scan the whole level each time'''
+
+    # Objectgroup name prefixes that are looked up the most, e.g. objects_relic, collisions_wall, meta
+    COMMON_PREFIXES = ('objects', 'collisions', 'meta')
+
+    def __init__(self, level_root):
+        self.objectgroups = []          # (objectgroup, list of its objects), in document order
+        self.by_name = {}               # Object name -> list of objects with that name
+        self.by_prefix = {}             # Common objectgroup name prefix -> list of objects in matching objectgroups
+        self.by_property = {}           # Property name -> list of objects with that property, filled on request
+        self.property_edit_count = tiled_utils.GetPropertyEditCount()
+        # Object -> its parsed properties, filled by tiled_utils.GetPropertiesFromObject while this index is alive
+        self.properties = tiled_utils.NewPropertyCache(level_root)
+
+        for objectgroup in level_root.iter('objectgroup'):
+            objects = objectgroup.findall('object')
+            self.objectgroups.append((objectgroup, objects))
+            for obj in objects:
+                self.by_name.setdefault(obj.get('name'), []).append(obj)
+        for prefix in _ObjectIndex.COMMON_PREFIXES:
+            self.by_prefix[prefix] = self.GetObjectsInObjectgroups(prefix)
+
+    def GetObjectsInObjectgroups(self, name_prefix):
+        objects_found = []
+        for objectgroup, objects in self.objectgroups:
+            if objectgroup.get('name', '').startswith(name_prefix): objects_found.extend(objects)
+        return objects_found
+
+    def GetObjectsWithProperty(self, property_name):
+        # Property lookups are only valid until an object's properties are edited
+        if self.property_edit_count != tiled_utils.GetPropertyEditCount():
+            self.by_property = {}
+            self.property_edit_count = tiled_utils.GetPropertyEditCount()
+        if property_name not in self.by_property:
+            self.by_property[property_name] = [obj for _, objects in self.objectgroups for obj in objects
+                if property_name in tiled_utils.GetPropertiesFromObject(obj)]
+        return self.by_property[property_name]
+
+
+
 class LevelPlayDo():
     '''The convenience class to aid performing operations upon a TILED level XML file'''
 
-    def __init__(self, file_name):
-        # Parse the XML file and store the high-level root variables
+    def __init__(self, file_name, use_arrays = False, compression = None, compression_level = None, use_cache = False, interactive = True):
+        '''
+         file_name - path to the TILED level XML
+         use_arrays - when True, Tiles2d are handed out as 2D numpy arrays (uint32) instead of lists of lists.
+             Arrays skip the costly list conversion and allow vectorized operations on whole layers.
+             Both formats are accepted by SetTiles2d regardless of this flag
+         compression - 'zlib', 'gzip', 'zstd' or '' for none, used for tile layers created by the playdo.
+             When None, new layers use zlib. Existing layers keep their own compression unless SetTiles2d says otherwise
+         compression_level - used whenever tile data is encoded, e.g. 1 (fast) to 9 (small) for zlib. None for default
+         use_cache - when True, the level is loaded from its snapshot in the tool folder if the file hasn't changed
+             since (see level_cache.py). Tile layers then come memory-mapped & already decoded, and the XML itself
+             is only parsed once something needs it (objects, edits, ...). A new snapshot is saved otherwise
+         interactive - when False, the user is never prompted (e.g. in worker processes). Errors the user would
+             be asked to fix, such as multiple tilesheets, are raised as exceptions instead
+        '''
         self.full_file_name = file_name
-        self.my_xml_tree = ET.parse(self.full_file_name)
-        self.level_root = self.my_xml_tree.getroot()
-
-        # Check if more than 1 tilesheet is being used & gracefully handle error if so
-        self._CheckForMultiSheetError()
+        self.interactive = interactive
+        self.use_arrays = use_arrays
+        self.compression = compression
+        self.compression_level = compression_level
+        with open(self.full_file_name, 'rb') as level_file:
+            self._disk_bytes = level_file.read()
         
-        # Extract map dimensions and tile size from the level
-        self.map_width = int(self.level_root.get('width'))
-        self.map_height = int(self.level_root.get('height'))
-        self.tile_width = int(self.level_root.get('tilewidth'))
-        self.tile_height = int(self.level_root.get('tileheight'))
+        # The parsed XML file. Access through my_xml_tree & level_root, which parse the file on first use
+        self._my_xml_tree = None
+        self._level_root = None
         
         # Map for tile_layer_name to a tiles2d (A 2d array of tile IDs). This is created & cached w/ GetTiles2d()
         self._tiles2d_map = {}
@@ -50,20 +146,76 @@ class LevelPlayDo():
         # Map for tile_layer_name to a Hashset (for quick checking tile matches). This is created & cached w/  GetTiles2d()
         self._tiles2d_hash = {}
         
+        # Registry of all tile layers (including those tucked within folders), in document order. Layers
+        # sharing a name are kept apart in the by_name map, where the first layer in the document comes first
+        self._tile_layers = []
+        self._tile_layers_by_name = {}
+        
+        # Infinite maps store their tile layers as chunks instead (see GetRegion & GetChunks). New chunks are
+        # laid out on a grid of the map's chunk size
+        self.is_infinite = False
+        self._chunk_width = DEFAULT_CHUNK_SIZE
+        self._chunk_height = DEFAULT_CHUNK_SIZE
+        
+        # Signatures of the level's contents as they are on disk. Write() compares against these to find
+        # which tile layers & objectgroups were actually edited, and skips writing when nothing was
+        self._saved_signatures = None
+        
+        # Table of the level's objects, only kept while the level was loaded from its snapshot & isn't parsed yet
+        self._cached_object_table = None
+        
+        # Map for each XML element to its parent element. Built on first use by GetParent() and then kept
+        # up to date by the playdo's own mutators, so looking up an object's objectgroup no longer walks the tree
+        self._parent_map = None
+        
+        # Tile layer data already encoded by SetManyTiles2d, as (digest, codec, encoded_str) per registry entry.
+        # SetTiles2d uses them in place of encoding, as long as they are for the same tiles & codec
+        self._pending_encodings = {}
+        
+        # Lookup tables of objects by name, objectgroup prefix & property. Built on first use, and dropped by
+        # the playdo's mutators whenever objects or objectgroups are added, moved or removed
+        self._object_index = None
+        
+        # Load the level from its snapshot if it's fresh. Otherwise parse the XML file (& save a snapshot if asked to)
+        snapshot = level_cache.LoadSnapshot(file_name, self._disk_bytes) if use_cache else None
+        if snapshot is not None:
+            self._LoadSnapshot(snapshot)
+        else:
+            self._ParseLevel()
+            if use_cache: self._SaveSnapshot()
+        
         log.Extra(f"-- level_playdo.py : initialized {file_name} ...")
 
 
+
+    # The XML is parsed lazily, so a level loaded from its snapshot is only parsed once it's needed
+    @property
+    def my_xml_tree(self):
+        if self._my_xml_tree is None: self._ParseLevel()
+        return self._my_xml_tree
+
+    @property
+    def level_root(self):
+        if self._level_root is None: self._ParseLevel()
+        return self._level_root
+
+
+
+    def GetObjectTable(self):
+        '''
+         Returns a compact table of all objects in the level as a list of dictionaries (see level_cache.BuildObjectTable).
+         Unlike GetAllObjects, this does not require the XML to be parsed when the level was loaded from its snapshot
+        '''
+        if self._level_root is None and self._cached_object_table is not None:
+            return self._cached_object_table
+        return level_cache.BuildObjectTable(self.level_root)
+
+
     def GetAllTileLayerNames(self):
         '''Fetches the names of all graphic tile layers and returns them as a list of strings'''
-        tile_layer_names = []
-        # Search using an XPath query so that tile_layers tucked within folders will not be missed
-        for tile_layer in self.level_root.findall(".//layer"):
-            tile_layer_name = tile_layer.get('name')
-            if tile_layer_name is None:
-                tile_layer_names.append('unnamed_tile_layer')
-            else:
-                tile_layer_names.append(tile_layer_name)
-                
+        # The registry includes tile_layers tucked within folders, so none will be missed
+        tile_layer_names = [tile_layer.name for tile_layer in self._tile_layers]
+
         log.Extra(f'-- level_playdo.py : number tile layers found : {len(tile_layer_names)}')
         return tile_layer_names
 
@@ -80,41 +232,38 @@ class LevelPlayDo():
         
         Returns 'Tiles2d'. Tiles2d presents the data in an already decoded, easily readable and
         editable format. Apply changes to the Tiles2d and write them back using SetTiles2d()
+        If the playdo was created with use_arrays, the Tiles2d is a 2D numpy array (uint32)
         '''
         if tile_layer_name in self._tiles2d_map:
             return self._tiles2d_map[tile_layer_name]
         
-        tiles2d = None
-        for layer in self.level_root.findall('.//layer'):
-            if layer.get('name') == tile_layer_name:
-                self._ProcessLayer(layer, tile_layer_name)
-                if tiles2d is None:
-                    tiles2d = self._tiles2d_map[tile_layer_name]
-                    if ignore_dupe_warnings: return tiles2d
-                else:
-                    log.Extra(f"level_playdo.py : GetTiles2d was called for a layer '{tile_layer_name}'" + 
-                        ", but multiple tile layers with that name exists!")
-                
-        
-        if tiles2d is None:
+        tile_layers = self._tile_layers_by_name.get(tile_layer_name)
+        if not tile_layers:
             log.Extra(f"level_playdo.py : GetTiles2d was called for a layer '{tile_layer_name}' " + 
                 "which did not exist!")
+            return None
+        
+        if len(tile_layers) > 1 and not ignore_dupe_warnings:
+            log.Extra(f"level_playdo.py : GetTiles2d was called for a layer '{tile_layer_name}'" + 
+                ", but multiple tile layers with that name exists!")
         
-        return tiles2d
+        # Only the requested layer gets decoded, all other layers are left untouched
+        self._ProcessLayer(tile_layers[0])
+        return self._tiles2d_map[tile_layer_name]
 
 
 
     def GetAllTiles2d(self, active_layer_only = False):
         '''Fetches all graphic tile layers and returns them as a list of Tiles2d'''
         list_tiles2d = []
-        # Search using an XPath query so that tile_layers tucked within folders will not be missed
-        for layer in self.level_root.findall(".//layer"):
-            if active_layer_only:
-                if not (layer.get('name').startswith('fg') or layer.get('name').startswith('bg')): continue
-            data = layer.find('data').text.strip()
-            tile_2d_map = tiled_utils.DecodeIntoTiles2d(data, self.map_width)
-            if tile_2d_map is None: continue
-            list_tiles2d.append(tile_2d_map)
+        # The registry includes tile_layers tucked within folders, so none will be missed
+        tile_layers = self._tile_layers
+        if active_layer_only:
+            tile_layers = [t for t in tile_layers if t.name.startswith('fg') or t.name.startswith('bg')]
+        # Layers are decoded once (all at once, across threads) and cached, repeated calls reuse the decoded data
+        self._DecodeTileLayers(tile_layers)
+        for tile_layer in tile_layers:
+            list_tiles2d.append(tile_layer.tiles2d)
         log.Extra(f'-- level_playdo.py : number tile layers found : {len(list_tiles2d)}')
         return list_tiles2d
 
@@ -122,20 +271,9 @@ class LevelPlayDo():
 
     def GetBlankTiles2d(self):
         '''Return an empty Tiles2d that matches the current playdo's dimension'''
-        # Copy from GetAllTiles2d() to fetch valid graphic tilelayer
-        new_tiles2d = []
-        for layer in self.level_root.findall(".//layer"):
-            data = layer.find('data').text.strip()
-            tile_2d_map = tiled_utils.DecodeIntoTiles2d(data, self.map_width)
-            if tile_2d_map is None: continue
-            new_tiles2d = copy.deepcopy(tile_2d_map)
-            break
-
-        # Wipes it clean before returning
-        for row in range(self.map_height):
-          for col in range(self.map_width):
-            new_tiles2d[row][col] = 0
-        return new_tiles2d
+        if self.use_arrays:
+            return numpy.zeros((self.map_height, self.map_width), dtype=numpy.uint32)
+        return [[0] * self.map_width for _ in range(self.map_height)]
 
 
 
@@ -167,25 +305,100 @@ class LevelPlayDo():
 
 
 
-    def SetTiles2d(self, tile_layer_name, new_tiles2d):
+    def SetTiles2d(self, tile_layer_name, new_tiles2d, compression = None, compression_level = None):
         '''Overwrites a LEVEL XML's tile layer with new data - usually after edits have been made
         
         tile_layer_name - the name of the tile layer that we want to overwrite
-        new_tiles2d - A 2D array of Tile Ids that contains the edits we want to flush
+        new_tiles2d - A 2D array of Tile Ids that contains the edits we want to flush. Both lists of lists
+            and 2D numpy arrays are accepted
+        compression - when given, the layer is (re)encoded as base64 with this compression, e.g. 'zstd'.
+            Otherwise the layer keeps the encoding it already had
+        compression_level - overrides the playdo's compression_level for this call
         '''
-        tile_layer_to_rewrite = None
-        for layer in self.level_root.findall('layer'):
-            if tile_layer_name == layer.get('name'):
-                tile_layer_to_rewrite = layer
-                break
-
-        if tile_layer_to_rewrite is None:
-            tile_layer_to_rewrite = self.AddNewTileLayer(tile_layer_name, "")
+        self._ParseLevelIfNeeded()
+        tile_layers = self._tile_layers_by_name.get(tile_layer_name)
+        if tile_layers:
+            tile_layer = tile_layers[0]
+        else:
+            self.AddNewTileLayer(tile_layer_name, "")
+            tile_layer = self._tile_layers[-1]
+            if compression is None: compression = self.compression
 #            raise Exception(f"level_playdo.py : SetTiles2d was called for '{tile_layer_name}'," 
 #                + f" but '{tile_layer_name}' does not exist!")
+        if compression_level is None: compression_level = self.compression_level
+
+        # Encode the same way the layer already was (e.g. csv layers stay csv), unless asked otherwise
+        data = tile_layer.element.find('data')
+        old_codec = tiled_utils.GetDataCodec(data)
+        new_codec = old_codec if compression is None else ('base64', compression)
+
+        if tile_layer.chunks is not None:
+            # Chunked layers are handed out from their top-left chunk on, and written back chunk by chunk
+            tiles_array = numpy.ascontiguousarray(new_tiles2d, dtype=numpy.uint32)
+            if tile_layer.chunks and tiles_array.shape != (tile_layer.height, tile_layer.width):
+                raise Exception(f"level_playdo.py : SetTiles2d was called for chunked layer '{tile_layer_name}' with"
+                    + f" {tiles_array.shape[1]} x {tiles_array.shape[0]} tiles, but it is {tile_layer.width} x {tile_layer.height}!")
+            if self._WriteChunks(tile_layer, tile_layer.origin_x, tile_layer.origin_y, tiles_array, new_codec, compression_level):
+                self._ForgetDecodedTiles(tile_layer)
+            else:
+                self._CacheTileLayer(tile_layer, tiles_array, new_tiles2d)
+            return tile_layer.element
+
+        # Skip re-encoding if the tiles are identical to what's already encoded in the XML
+        self._DecodeTileLayer(tile_layer)
+        tiles_array = numpy.ascontiguousarray(new_tiles2d, dtype=numpy.uint32)
+        new_digest = _DigestTiles(tiles_array)
+        if new_digest == tile_layer.disk_digest and new_codec == old_codec:
+            # Edits were reverted, reuse the data string from disk so the layer is no longer seen as edited
+            data.text = tile_layer.disk_data_str
+            tile_layer.saved_digest = new_digest
+        elif new_digest != tile_layer.saved_digest or new_codec != old_codec:
+            pending_encoding = self._pending_encodings.pop(tile_layer, None)
+            if pending_encoding is not None and pending_encoding[:2] == (new_digest, new_codec):
+                data.text = pending_encoding[2]
+            else:
+                data.text = tiled_utils.EncodeToTiledFormat(tiles_array, new_codec[0], new_codec[1], compression_level)
+            tiled_utils.SetDataCodec(data, new_codec[0], new_codec[1])
+            tile_layer.saved_digest = new_digest
+        else:
+            log.Extra(f"-- level_playdo.py : tile layer '{tile_layer_name}' is unchanged, skipped encoding")
+        
+        # Keep the cached data in sync, so later calls to GetTiles2d return the new data
+        self._CacheTileLayer(tile_layer, tiles_array, new_tiles2d)
+        return tile_layer.element
 
-        tile_layer_to_rewrite.find('data').text = tiled_utils.EncodeIntoZlibString64(new_tiles2d)
-        return tile_layer_to_rewrite
+
+
+    def SetManyTiles2d(self, new_tiles2d_by_name, compression = None, compression_level = None):
+        '''
+         Same as calling SetTiles2d for each tile_layer_name: new_tiles2d pair of the dictionary, but the layers
+         needing a new encoding are all encoded at once across a thread pool. Returns the list of layer elements
+        '''
+        self._ParseLevelIfNeeded()
+        if compression_level is None: compression_level = self.compression_level
+        tile_layers = [self._tile_layers_by_name[name][0] for name in new_tiles2d_by_name if name in self._tile_layers_by_name]
+        self._DecodeTileLayers(tile_layers)
+        
+        # Work out which layers SetTiles2d would encode (new layers & chunked layers are left to SetTiles2d itself)
+        pending = []
+        for tile_layer_name, new_tiles2d in new_tiles2d_by_name.items():
+            tile_layers = self._tile_layers_by_name.get(tile_layer_name)
+            if not tile_layers or tile_layers[0].chunks is not None: continue
+            tile_layer = tile_layers[0]
+            old_codec = tiled_utils.GetDataCodec(tile_layer.element.find('data'))
+            new_codec = old_codec if compression is None else ('base64', compression)
+            tiles_array = numpy.ascontiguousarray(new_tiles2d, dtype=numpy.uint32)
+            new_digest = _DigestTiles(tiles_array)
+            if new_codec == old_codec and new_digest in (tile_layer.disk_digest, tile_layer.saved_digest): continue
+            pending.append((tile_layer, new_digest, new_codec, (tiles_array, new_codec[0], new_codec[1], compression_level)))
+        
+        encoded_strs = tiled_utils.EncodeManyToTiledFormat([encode_job for _, _, _, encode_job in pending])
+        for (tile_layer, new_digest, new_codec, _), encoded_str in zip(pending, encoded_strs):
+            self._pending_encodings[tile_layer] = (new_digest, new_codec, encoded_str)
+        try:
+            return [self.SetTiles2d(name, new_tiles2d, compression, compression_level) for name, new_tiles2d in new_tiles2d_by_name.items()]
+        finally:
+            self._pending_encodings.clear()
 
 
 
@@ -198,6 +411,84 @@ class LevelPlayDo():
 
 
 
+    def GetTilesOrigin(self, tile_layer_name):
+        '''Returns the tile coordinates (x, y) of Tiles2d[0][0] for the layer. Always (0, 0), except for chunked layers'''
+        tile_layer = self._tile_layers_by_name[tile_layer_name][0]
+        return tile_layer.origin_x, tile_layer.origin_y
+
+
+
+    def GetRegion(self, tile_layer_name, x, y, width, height):
+        '''
+         Returns the tiles of a rectangular region of the layer as a Tiles2d, tiles outside of the layer being 0
+
+         :param x, y:           Tile coordinates of the region's top-left tile (may be negative in infinite maps)
+         :param width, height:  Size of the region in tiles
+
+         In infinite maps, only the chunks touching the region are decoded
+        '''
+        tile_layer = self._tile_layers_by_name[tile_layer_name][0]
+        if tile_layer.chunks is not None:
+            self._ParseLevelIfNeeded()
+            region = self._ReadChunks(tile_layer, x, y, width, height)
+        else:
+            self._DecodeTileLayer(tile_layer)
+            region = numpy.zeros((height, width), dtype=numpy.uint32)
+            overlap = _GetOverlap((x, y, width, height), (0, 0, tile_layer.width, tile_layer.height))
+            if overlap is not None:
+                x0, y0, x1, y1 = overlap
+                region[y0-y:y1-y, x0-x:x1-x] = tile_layer.tiles_array[y0:y1, x0:x1]
+        return region if self.use_arrays else region.tolist()
+
+
+
+    def SetRegion(self, tile_layer_name, x, y, new_tiles2d):
+        '''
+         Overwrites a rectangular region of the layer, x & y being the tile coordinates of the region's top-left tile.
+         In infinite maps, only the chunks touching the region are re-encoded, & new chunks are added to hold any
+         tiles outside of the existing ones. Elsewhere, tiles outside of the layer are dropped
+        '''
+        self._ParseLevelIfNeeded()
+        tile_layer = self._tile_layers_by_name[tile_layer_name][0]
+        tiles_array = numpy.ascontiguousarray(new_tiles2d, dtype=numpy.uint32)
+        if tile_layer.chunks is not None:
+            data = tile_layer.element.find('data')
+            self._WriteChunks(tile_layer, x, y, tiles_array, tiled_utils.GetDataCodec(data), self.compression_level)
+            self._ForgetDecodedTiles(tile_layer)
+            return tile_layer.element
+
+        self._DecodeTileLayer(tile_layer)
+        layer_array = tile_layer.tiles_array.copy()
+        overlap = _GetOverlap((x, y, tiles_array.shape[1], tiles_array.shape[0]), (0, 0, tile_layer.width, tile_layer.height))
+        if overlap is not None:
+            x0, y0, x1, y1 = overlap
+            layer_array[y0:y1, x0:x1] = tiles_array[y0-y:y1-y, x0-x:x1-x]
+        return self.SetTiles2d(tile_layer_name, layer_array)
+
+
+
+    def GetChunks(self, tile_layer_name, include_empty = False):
+        '''
+         Yields (x, y, Tiles2d) for each chunk of the layer, x & y being the tile coordinates of its top-left tile.
+         Chunks holding only empty tiles are skipped unless include_empty. Each chunk is decoded as it's reached,
+         so tools can walk the few chunks of a mostly empty infinite map without ever building the whole layer.
+         Layers of fixed size are handed out as a single chunk. Use SetRegion to write edits back
+        '''
+        tile_layer = self._tile_layers_by_name[tile_layer_name][0]
+        if tile_layer.chunks is None:
+            self._DecodeTileLayer(tile_layer)
+            if include_empty or tile_layer.tiles_array.any():
+                yield 0, 0, tile_layer.tiles2d
+            return
+
+        self._ParseLevelIfNeeded()
+        for chunk in list(tile_layer.chunks):
+            chunk_array = self._GetChunkArray(tile_layer, chunk)
+            if not include_empty and not chunk_array.any(): continue
+            yield chunk.x, chunk.y, (chunk_array if self.use_arrays else chunk_array.tolist())
+
+
+
     def GetTilelayer(self, tilelayer_name, discard_old):
         '''
          Return tilelayer as XML Object, allowing to get its name & properties
@@ -206,14 +497,22 @@ class LevelPlayDo():
          :param tilelayer_name: Name of the new tilelayer
          :param discard_old:    Boolean; When true, set the tiles2D to blank
         '''
-        for tilelayer in self.level_root.findall('layer'):
-            if tilelayer_name is None or tilelayer.get('name') == tilelayer_name:
-                if discard_old: self.SetTiles2d(tilelayer_name, self.GetBlankTiles2d())
-                return tilelayer
+        self._ParseLevelIfNeeded()
+        if tilelayer_name is None and self._tile_layers:
+            tilelayer_name = self._tile_layers[0].name
         
-        # If the object group does NOT exists in the level, create a new one and return it for editing
-        new_tilelayer = ET.SubElement(self.level_root, 'layer', {'name': tilelayer_name})
-        return new_tilelayer
+        tile_layers = self._tile_layers_by_name.get(tilelayer_name)
+        if tile_layers:
+            if discard_old and tile_layers[0].chunks is not None:
+                self.SetTiles2d(tilelayer_name, numpy.zeros((tile_layers[0].height, tile_layers[0].width), dtype=numpy.uint32))
+            elif discard_old:
+                self.SetTiles2d(tilelayer_name, self.GetBlankTiles2d())
+            return tile_layers[0].element
+        
+        # If the tile layer does NOT exists in the level, create a new blank one and return it for editing
+        compression = 'zlib' if self.compression is None else self.compression
+        blank_data_str = tiled_utils.EncodeToTiledFormat(self.GetBlankTiles2d(), 'base64', compression, self.compression_level)
+        return self.AddNewTileLayer(tilelayer_name, blank_data_str, compression = compression)
 
 
 
@@ -232,7 +531,8 @@ class LevelPlayDo():
             if object_group_name is None or object_group.get('name') == object_group_name:
                 if (discard_old):
                     for object in object_group.findall('object'):
-                        object_group.remove(object)
+                        self.RemoveElement(object)
+                self._object_index = None       # Objectgroup is handed out for editing, so objects may change
                 return object_group
 
         # When no objectgroup found, return None if specified to not create a new one
@@ -240,6 +540,7 @@ class LevelPlayDo():
 
         # If the object group does NOT exists in the level, create a new one and return it for editing
         new_object_group = ET.SubElement(self.level_root, 'objectgroup', {'name': object_group_name})
+        self._RegisterParents(new_object_group, self.level_root)
         return new_object_group
 
 
@@ -247,7 +548,7 @@ class LevelPlayDo():
     def DuplicateObjectGroup(self, object_group_to_copy, new_object_group_name, attrib_properties = None):
         '''Given an object group, create a copy of it into our own level root structures'''
 
-        new_object_group = copy.deepcopy(object_group_to_copy)
+        new_object_group = xml_backend.CloneElement(object_group_to_copy)
         new_object_group.set('name', new_object_group_name)
         
         if attrib_properties is not None:
@@ -255,20 +556,82 @@ class LevelPlayDo():
                 AddPropertiesToObject(obj, attrib_properties)
         
         self.level_root.append(new_object_group)
+        self._RegisterParents(new_object_group, self.level_root)
 
 
 
     def GetAllObjectsWithName(self, object_name):
         '''Searches all object groups to find objects with the given object_name'''
-        objects_w_matching_names = []
-        for object in self.level_root.findall(".//object"):
-            if object.get('name') == object_name:
-                objects_w_matching_names.append(object)
-        return objects_w_matching_names
+        return list(self._GetObjectIndex().by_name.get(object_name, []))
+
+
+
+    def GetAllObjectsWithProperty(self, property_name):
+        '''Searches all object groups to find objects that have the given property, regardless of its value'''
+        return list(self._GetObjectIndex().GetObjectsWithProperty(property_name))
+
+
+
+    def GetObjectsInObjectgroups(self, name_prefix):
+        '''Fetches all objects from the objectgroups whose name starts with name_prefix, e.g. "objects", "meta"'''
+        object_index = self._GetObjectIndex()
+        if name_prefix in object_index.by_prefix: return list(object_index.by_prefix[name_prefix])
+        return object_index.GetObjectsInObjectgroups(name_prefix)
+
+
+
+    def InvalidateObjectIndex(self):
+        '''Must be called after adding, removing or renaming objects by hand, so object lookups see the change'''
+        self._object_index = None
+
+
+
+    def AppendObjects(self, object_group, new_objects):
+        '''Adds many new objects at the end of object_group at once, keeping object lookups & the parent map valid'''
+        object_group.extend(new_objects)
+        self._object_index = None
+        if self._parent_map is None: return
+        for new_object in new_objects: self._RegisterParents(new_object, object_group)
+
+
 
+    def SpliceObjects(self, object_group, objects, start, end, new_objects):
+        '''
+         Replaces objects[start:end] with new_objects (either may be empty), keeping object lookups & the parent map
+         valid. objects is the list of all of object_group's objects, which must come after its other children (as
+         TILED writes them). Unlike removing & inserting objects one by one, this takes the same time however many
+         objects the objectgroup holds. To splice several times with the same list, go from the back
+        '''
+        xml_backend.SpliceChildren(object_group, objects, start, end, new_objects)
+        self._object_index = None
+        if self._parent_map is None: return
+        for old_object in objects[start:end]:
+            for child in old_object.iter(): self._parent_map.pop(child, None)
+        for new_object in new_objects: self._RegisterParents(new_object, object_group)
+
+
+
+    def ReserveObjectIds(self, count):
+        '''
+         Hands out count unused object ids (as a range of ints), advancing the map's nextobjectid past them.
+         Levels without a nextobjectid continue from the highest object id in use
+        '''
+        next_object_id = self.level_root.get('nextobjectid')
+        if next_object_id is None:
+            object_ids = [int(obj.get('id')) for obj in self.level_root.iter('object') if obj.get('id') is not None]
+            next_object_id = max(object_ids, default=0) + 1
+        next_object_id = int(next_object_id)
+        self.level_root.set('nextobjectid', str(next_object_id + count))
+        return range(next_object_id, next_object_id + count)
 
 
-    def AddNewTileLayer(self, new_tile_layer_name, encoded_data_str, number_id = '100'):
+
+    def AddNewTileLayer(self, new_tile_layer_name, encoded_data_str, number_id = '100', compression = 'zlib'):
+        '''
+         Adds a new tile layer at the top of the level, holding encoded_data_str as its data.
+         compression must be the one encoded_data_str was encoded with ('' for none, 'csv' for csv data).
+         Empty data is fine too, in which case the layer is encoded on its first SetTiles2d
+        '''
         # create new tile layer's high and low-level attributes
         tile_layer_attributes = {
             'id': number_id, 
@@ -282,12 +645,63 @@ class LevelPlayDo():
         }
         new_tile_layer = ET.Element('layer', tile_layer_attributes)
         new_tile_layer_data = ET.SubElement(new_tile_layer, "data", data_attributes)
-        new_tile_layer_data.text = encoded_data_str
+        if compression == 'csv':    tiled_utils.SetDataCodec(new_tile_layer_data, 'csv', '')
+        elif compression != 'zlib': tiled_utils.SetDataCodec(new_tile_layer_data, 'base64', compression)
+        if not self.is_infinite:
+            new_tile_layer_data.text = encoded_data_str
         self.level_root.append(new_tile_layer)
+        self._RegisterTileLayer(new_tile_layer, '')
+        self._RegisterParents(new_tile_layer, self.level_root)
+
+        # Infinite maps only hold chunks, so the data is moved into chunks starting at the map's origin
+        if self.is_infinite and encoded_data_str:
+            codec = tiled_utils.GetDataCodec(new_tile_layer_data)
+            self.SetRegion(new_tile_layer_name, 0, 0, tiled_utils.DecodeIntoArray2d(encoded_data_str, self.map_width, *codec))
         return new_tile_layer
 
 
 
+    def GetParent(self, element):
+        '''
+         Return the parent of any XML element in the level, e.g. the objectgroup for a given TILED object.
+         With lxml, elements know their own parent. Otherwise, a parent map is built once; elements added by
+         hand afterwards are picked up by rebuilding it on a miss. Elements that are moved by hand should go
+         through MoveElement() to keep the map valid
+        '''
+        parent = self._FindParent(element)
+        if parent is None: raise KeyError(element)
+        return parent
+
+
+
+    def MoveElement(self, element, new_parent, index = None):
+        '''
+         Relocate an XML element (object, objectgroup, tilelayer, folder) under new_parent, keeping the parent map valid
+
+         :param element:    Element to be relocated, can be currently outside of the level
+         :param new_parent: Destination element, e.g. an objectgroup for a TILED object
+         :param index:      Position among new_parent's children. When None, element is appended at the end
+        '''
+        old_parent = self._FindParent(element)
+        if old_parent is not None: old_parent.remove(element)
+
+        if index is None: new_parent.append(element)
+        else: new_parent.insert(index, element)
+        self._RegisterParents(element, new_parent)
+
+
+
+    def RemoveElement(self, element):
+        '''Remove an XML element from the level (along with everything inside it) and returns its old parent'''
+        parent = self.GetParent(element)
+        parent.remove(element)
+        if self._parent_map is not None:
+            for child in element.iter(): self._parent_map.pop(child, None)
+        self._object_index = None
+        return parent
+
+
+
     def RegexReplacePropertyValues(self, target_text, generate_replacement_fn):
         '''Searches through all objects (in all object layers) and looks for object property "values" that contain text
            matching target_text. If found, it will replace target_text with the value generated by generate_replacement_fn.
@@ -297,20 +711,162 @@ class LevelPlayDo():
             if target_text in elem.get('value', ''):
                 new_number_string = generate_replacement_fn()
                 elem.set('value', elem.get('value').replace(target_text, new_number_string))
+                tiled_utils.ForgetCachedProperties(self.GetParent(self.GetParent(elem)))
 
 
-    def Write(self, location = None, make_auto_backup = False):
-        '''Stamps the Playdo back into an XML file and writes to disk'''
+    def Write(self, location = None, make_auto_backup = False, force_write = False):
+        '''Stamps the Playdo back into an XML file and writes to disk.
+        
+        When writing back to the level itself, nothing is written (and no backup is made) if the playdo
+        holds no changes. Set force_write to write regardless. Returns True if a file was written
+        '''
+        # The level is hashed once here, & the signatures shared with everything below that needs them
+        curr_signatures = None if self._level_root is None else _ComputeSignatures(self.level_root)
+        if location is None and not force_write and not self._HasChanges(curr_signatures):
+            log.Extra(f"-- level_playdo.py : no changes made, skipped writing {self.full_file_name}")
+            return False
+        
         if make_auto_backup:
             log.Extra('\nMaking backup...')
             backup_utils.CreateBackup(self)
 
+        # When only tile data was edited, patch the new payloads into the original file's bytes. Otherwise
+        # fall back to serializing the entire ElementTree
+        if curr_signatures is None: curr_signatures = _ComputeSignatures(self.level_root)
+        level_bytes = self._SpliceEditedTileData(curr_signatures)
+        if level_bytes is None:
+            log.Extra(f"-- level_playdo.py : serializing the entire level ({xml_backend.BACKEND_NAME})...")
+            level_bytes = xml_backend.WriteBytes(self.my_xml_tree)
+
         if location is None:
-            log.Extra(f"-- level_playdo.py : flushing changes...")
-            self.my_xml_tree.write(self.full_file_name)
+            if log.GetVerbosityLevel() == 2:
+                log.Extra(f"-- level_playdo.py : flushing changes to {', '.join(self._GetDirtyLayerNames(curr_signatures))}...")
+            with open(self.full_file_name, 'wb') as level_file:
+                level_file.write(level_bytes)
+            self._disk_bytes = level_bytes
+            # Splicing only touches <data> payloads, which signatures leave out, so they still hold after writing
+            self._saved_signatures = curr_signatures
+            for tile_layer in self._tile_layers:
+                data = tile_layer.element.find('data')
+                tile_layer.disk_digest = tile_layer.saved_digest
+                tile_layer.disk_data_str = None if data is None else data.text
+            self._LocateDataSpans()
         else:
             log.Extra(f"-- level_playdo.py : flushing changes to new location...")
-            self.my_xml_tree.write(location)
+            with open(location, 'wb') as level_file:
+                level_file.write(level_bytes)
+        return True
+
+
+
+    def HasChanges(self):
+        '''Returns True if anything in the level was edited since it was read from (or last written to) disk'''
+        if self._level_root is None: return False   # Nothing can be edited before the XML is parsed
+        return self._HasChanges(_ComputeSignatures(self.level_root))
+
+
+
+    def GetDirtyLayerNames(self):
+        '''Returns the names of the tile layers & objectgroups that were edited since the level was read from
+        (or last written to) disk. Edits outside of those (e.g. map properties, folders) are listed as 'map'
+        '''
+        if self._level_root is None: return []
+        return self._GetDirtyLayerNames(_ComputeSignatures(self.level_root))
+
+
+
+    def _HasChanges(self, curr_signatures):
+        '''HasChanges(), given the level's current signatures (None if the XML was never parsed)'''
+        if curr_signatures is None: return False
+        if self._GetTileLayersWithEditedData(): return True
+        return curr_signatures != self._saved_signatures
+
+
+
+    def _GetDirtyLayerNames(self, curr_signatures):
+        '''GetDirtyLayerNames(), given the level's current signatures'''
+        dirty_layer_names = [tile_layer.name for tile_layer in self._GetTileLayersWithEditedData()]
+        for element, signature in curr_signatures.items():
+            if self._saved_signatures.get(element) == signature: continue
+            if element is None: dirty_layer_names.append('map')
+            elif element.get('name', '') not in dirty_layer_names: dirty_layer_names.append(element.get('name', ''))
+        
+        # Deleted tile layers & objectgroups are counted as an edit to the map itself
+        if 'map' not in dirty_layer_names and any(e not in curr_signatures for e in self._saved_signatures):
+            dirty_layer_names.append('map')
+        return dirty_layer_names
+
+
+
+    def _GetTileLayersWithEditedData(self):
+        '''Returns the registered tile layers whose data string differs from the one on disk'''
+        edited_tile_layers = []
+        for tile_layer in self._tile_layers:
+            data = tile_layer.element.find('data')
+            if data is None: continue
+            data_str = data.text
+            if data_str is not tile_layer.disk_data_str and data_str != tile_layer.disk_data_str:
+                edited_tile_layers.append(tile_layer)
+        return edited_tile_layers
+
+
+
+    def _LocateDataSpans(self):
+        '''Finds the byte offsets of each tile layer's <data> payload in the file on disk. If the file can't be
+        matched up with the registry 1:1 (e.g. infinite maps, unusual formatting), no spans are recorded and
+        Write() will always serialize the entire level'''
+        for tile_layer in self._tile_layers:
+            tile_layer.disk_data_span = None
+        
+        # Chunked layers are never spliced (their <data> holds <chunk>s, which the regex doesn't match)
+        fixed_tile_layers = [tile_layer for tile_layer in self._tile_layers if tile_layer.chunks is None]
+        payload_matches = list(_DATA_PAYLOAD_REGEX.finditer(self._disk_bytes))
+        if len(payload_matches) != len(fixed_tile_layers): return
+        
+        # Both are in document order. Confirm each payload really belongs to its layer before trusting it
+        for tile_layer, payload_match in zip(fixed_tile_layers, payload_matches):
+            payload_str = payload_match.group(1).decode('ascii', errors='replace').strip()
+            if payload_str != (tile_layer.disk_data_str or '').strip(): return
+        for tile_layer, payload_match in zip(fixed_tile_layers, payload_matches):
+            tile_layer.disk_data_span = payload_match.span(1)
+
+
+
+    def _SpliceEditedTileData(self, curr_signatures):
+        '''
+        Builds the level file's new bytes by patching edited <data> payloads into the bytes from disk, which
+        is much faster than serializing the tree and leaves everything else in the file byte-for-byte intact.
+        Returns None if that's not possible, i.e. something besides tile data was edited
+
+        curr_signatures - the level's current signatures, see _ComputeSignatures
+        '''
+        if curr_signatures != self._saved_signatures: return None
+        
+        edited_tile_layers = self._GetTileLayersWithEditedData()
+        patches = []
+        for tile_layer in edited_tile_layers:
+            data_str = tile_layer.element.find('data').text or ''
+            if tile_layer.disk_data_span is None: return None
+            if '<' in data_str or '&' in data_str or '>' in data_str: return None
+            patches.append((tile_layer.disk_data_span, tile_layer))
+        
+        # Keep the whitespace around the payload from disk (e.g. Tiled's indentation) for minimal diffs
+        level_bytes = []
+        prev_end = 0
+        for (start, end), tile_layer in sorted(patches, key=lambda patch: patch[0]):
+            old_payload = self._disk_bytes[start:end]
+            leading_ws = old_payload[:len(old_payload) - len(old_payload.lstrip())]
+            trailing_ws = old_payload[len(old_payload.rstrip()):]
+            new_payload_str = tile_layer.element.find('data').text.strip()
+            if new_payload_str:
+                new_payload_str = leading_ws.decode() + new_payload_str + trailing_ws.decode()
+            tile_layer.element.find('data').text = new_payload_str
+            level_bytes.append(self._disk_bytes[prev_end:start])
+            level_bytes.append(new_payload_str.encode('ascii'))
+            prev_end = end
+        level_bytes.append(self._disk_bytes[prev_end:])
+        log.Extra(f"-- level_playdo.py : patched tile data of {len(patches)} layer(s) into the original file")
+        return b''.join(level_bytes)
 
 
 
@@ -330,28 +886,362 @@ class LevelPlayDo():
         
         Returns two maps: '_tiles2d_map' & '_tiles2d_hash'
         '''
-        for tile_layer in self.level_root.findall(".//layer"):
-            tile_layer_name = tile_layer.get('name')
-            if tile_layer_name is None:
-                tile_layer_name = 'unnamed_tile_layer'
-            self._ProcessLayer(tile_layer, tile_layer_name)
+        self._DecodeTileLayers(self._tile_layers)
+        for tile_layer in self._tile_layers:
+            self._ProcessLayer(tile_layer)
         
         return self._tiles2d_map, self._tiles2d_hash
     
     
     
-    def _ProcessLayer(self, layer, tile_layer_name):
-        '''Process a tile layer element tree object, and fill our internal data structures for future ops'''
-        
-        # Create and store the Tile2d map
-        data = layer.find('data').text.strip()
-        tile_2d_map = tiled_utils.DecodeIntoTiles2d(data, self.map_width)
-        self._tiles2d_map[tile_layer_name] = tile_2d_map
-        
-        # Also maintain hash of the Tile Ids to facililate quicker lookups in the future
-        self._tiles2d_hash[tile_layer_name] = set()
-        for tile_row in tile_2d_map:
-            self._tiles2d_hash[tile_layer_name].update(tile_row)
+    def _ProcessLayer(self, tile_layer):
+        '''Process a tile layer registry entry, and fill our internal data structures for future ops'''
+        self._DecodeTileLayer(tile_layer)
+        tile_layer_name = tile_layer.name
+        
+        # Store the Tile2d map. For duplicate names, the 1st layer in the document is the one kept
+        if tile_layer_name not in self._tiles2d_map:
+            self._tiles2d_map[tile_layer_name] = tile_layer.tiles2d
+            self._tiles2d_hash[tile_layer_name] = set()
+        
+        # Also maintain hash of the Tile Ids to facililate quicker lookups in the future. Layers sharing
+        # a name all contribute to the same hash, so a search never misses tiles from a duplicate layer
+        if not tile_layer.is_hashed:
+            self._tiles2d_hash[tile_layer_name].update(numpy.unique(tile_layer.tiles_array).tolist())
+            tile_layer.is_hashed = True
+    
+    def _DecodeTileLayers(self, tile_layers):
+        '''Same as calling _DecodeTileLayer on each layer, but their data is decoded all at once across a thread pool'''
+        pending = []
+        for tile_layer in tile_layers:
+            if tile_layer.tiles_array is not None or tile_layer.snapshot_array is not None: continue
+            self._ParseLevelIfNeeded()
+            data = tile_layer.element.find('data')
+            if tile_layer.chunks is not None or data.text is None or not data.text.strip(): continue
+            pending.append((tile_layer, (data.text.strip(), tile_layer.width) + tiled_utils.GetDataCodec(data)))
+        
+        decoded_arrays = tiled_utils.DecodeManyIntoArray2d([decode_job for _, decode_job in pending])
+        for (tile_layer, _), tiles_array in zip(pending, decoded_arrays):
+            self._DecodeTileLayer(tile_layer, tiles_array)
+        for tile_layer in tile_layers:
+            self._DecodeTileLayer(tile_layer)
+    
+    def _DecodeTileLayer(self, tile_layer, decoded_array = None):
+        '''Decodes the tile layer's data on first request. Subsequent calls are free.
+        decoded_array is the layer's data when it was already decoded elsewhere (see _DecodeTileLayers)'''
+        if tile_layer.tiles_array is not None: return
+        if tile_layer.snapshot_array is not None:
+            # Tiles from a fresh snapshot are the same as the ones encoded on disk, so there's nothing to decode
+            self._CacheTileLayer(tile_layer, tile_layer.snapshot_array)
+            tile_layer.snapshot_array = None
+            return
+        self._ParseLevelIfNeeded()
+        if tile_layer.chunks is not None:
+            # Chunked layers are assembled from all of their chunks, covering the area from the top-left chunk on
+            tiles_array = self._ReadChunks(tile_layer, tile_layer.origin_x, tile_layer.origin_y, tile_layer.width, tile_layer.height)
+            tile_layer.saved_digest = _DigestTiles(tiles_array)
+            self._CacheTileLayer(tile_layer, tiles_array)
+            return
+        data = tile_layer.element.find('data')
+        if data.text is None or not data.text.strip():
+            # Freshly added layers may not have any data yet (e.g. AddNewTileLayer(name, "")), treat as blank
+            tiles_array = numpy.zeros((tile_layer.height, tile_layer.width), dtype=numpy.uint32)
+        elif decoded_array is not None:
+            tiles_array = decoded_array
+        else:
+            tiles_array = tiled_utils.DecodeIntoArray2d(data.text.strip(), tile_layer.width, *tiled_utils.GetDataCodec(data))
+        # Layers without data have nothing encoded yet, so leave their digests empty to force an encode
+        if data.text is not None and data.text.strip():
+            tile_layer.saved_digest = _DigestTiles(tiles_array)
+            if data.text == tile_layer.disk_data_str: tile_layer.disk_digest = tile_layer.saved_digest
+        self._CacheTileLayer(tile_layer, tiles_array)
+    
+    def _CacheTileLayer(self, tile_layer, tiles_array, tiles2d = None):
+        '''Stores decoded data into a registry entry and refreshes any of the playdo's caches built from it'''
+        tile_layer.tiles_array = tiles_array
+        if self.use_arrays:     tile_layer.tiles2d = tiles_array
+        elif tiles2d is None:   tile_layer.tiles2d = tiles_array.tolist()
+        else:                   tile_layer.tiles2d = tiles2d
+        
+        # Only the 1st layer of a given name is reachable by name, so only it refreshes the name-based caches
+        tile_layer_name = tile_layer.name
+        if self._tile_layers_by_name[tile_layer_name][0] is not tile_layer: return
+        if tile_layer_name in self._tiles2d_map:
+            self._tiles2d_map[tile_layer_name] = tile_layer.tiles2d
+        if tile_layer_name in self._tiles2d_hash:
+            self._tiles2d_hash[tile_layer_name] = set(numpy.unique(tiles_array).tolist())
+            tile_layer.is_hashed = True
+    
+    def _ForgetDecodedTiles(self, tile_layer):
+        '''Drops the decoded data of a layer (e.g. when a chunked layer grew), so it gets assembled anew on request'''
+        tile_layer.tiles_array = None
+        tile_layer.tiles2d = None
+        tile_layer.is_hashed = False
+        if self._tile_layers_by_name[tile_layer.name][0] is not tile_layer: return
+        self._tiles2d_map.pop(tile_layer.name, None)
+        self._tiles2d_hash.pop(tile_layer.name, None)
+    
+    
+    
+    def _GetChunkArray(self, tile_layer, chunk):
+        '''Decodes a chunk's data on first request. Subsequent calls are free'''
+        if chunk.tiles_array is not None: return chunk.tiles_array
+        data_str = chunk.element.text
+        if data_str is None or not data_str.strip():
+            chunk.tiles_array = numpy.zeros((chunk.height, chunk.width), dtype=numpy.uint32)
+            return chunk.tiles_array
+        codec = tiled_utils.GetDataCodec(tile_layer.element.find('data'))
+        chunk.tiles_array = tiled_utils.DecodeIntoArray2d(data_str.strip(), chunk.width, *codec)
+        chunk.saved_digest = _DigestTiles(chunk.tiles_array)
+        if data_str == chunk.disk_data_str: chunk.disk_digest = chunk.saved_digest
+        return chunk.tiles_array
+    
+    def _ReadChunks(self, tile_layer, x, y, width, height):
+        '''Returns a region of a chunked layer as a 2D numpy array, decoding only the chunks touching it'''
+        region = numpy.zeros((height, width), dtype=numpy.uint32)
+        for chunk in tile_layer.chunks:
+            overlap = _GetOverlap((x, y, width, height), (chunk.x, chunk.y, chunk.width, chunk.height))
+            if overlap is None: continue
+            x0, y0, x1, y1 = overlap
+            region[y0-y:y1-y, x0-x:x1-x] = self._GetChunkArray(tile_layer, chunk)[y0-chunk.y:y1-chunk.y, x0-chunk.x:x1-chunk.x]
+        return region
+    
+    def _WriteChunks(self, tile_layer, x, y, tiles_array, codec, compression_level):
+        '''
+        Writes a region into a chunked layer, re-encoding only the chunks it changed (or all of them, if codec is
+        new to the layer). Returns True if chunks had to be added, which also changes the bounds of the layer
+        '''
+        data = tile_layer.element.find('data')
+        codec_changed = codec != tiled_utils.GetDataCodec(data)
+        height, width = tiles_array.shape
+        
+        # Tiles falling outside of all chunks get new chunks first, laid out on the map's chunk grid
+        is_covered = numpy.zeros((height, width), dtype=bool)
+        for chunk in tile_layer.chunks:
+            overlap = _GetOverlap((x, y, width, height), (chunk.x, chunk.y, chunk.width, chunk.height))
+            if overlap is not None:
+                x0, y0, x1, y1 = overlap
+                is_covered[y0-y:y1-y, x0-x:x1-x] = True
+        rows, cols = numpy.nonzero((tiles_array != 0) & ~is_covered)
+        new_cells = set(zip(((rows + y) // self._chunk_height).tolist(), ((cols + x) // self._chunk_width).tolist()))
+        for cell_y, cell_x in sorted(new_cells):
+            self._AddChunk(tile_layer, cell_x * self._chunk_width, cell_y * self._chunk_height)
+        
+        for chunk in tile_layer.chunks:
+            overlap = _GetOverlap((x, y, width, height), (chunk.x, chunk.y, chunk.width, chunk.height))
+            if overlap is None and not codec_changed: continue
+            chunk_array = self._GetChunkArray(tile_layer, chunk)
+            if overlap is not None:
+                x0, y0, x1, y1 = overlap
+                new_part = tiles_array[y0-y:y1-y, x0-x:x1-x]
+                if not numpy.array_equal(chunk_array[y0-chunk.y:y1-chunk.y, x0-chunk.x:x1-chunk.x], new_part):
+                    chunk_array = chunk_array.copy()
+                    chunk_array[y0-chunk.y:y1-chunk.y, x0-chunk.x:x1-chunk.x] = new_part
+            self._EncodeChunk(chunk, chunk_array, codec, codec_changed, compression_level)
+        if codec_changed: tiled_utils.SetDataCodec(data, codec[0], codec[1])
+        
+        if not new_cells: return False
+        self._UpdateChunkedBounds(tile_layer)
+        tile_layer.element.set('width', str(tile_layer.width))
+        tile_layer.element.set('height', str(tile_layer.height))
+        return True
+    
+    def _EncodeChunk(self, chunk, chunk_array, codec, codec_changed, compression_level):
+        '''Same as SetTiles2d's encoding, but for a single chunk'''
+        new_digest = _DigestTiles(chunk_array)
+        if new_digest == chunk.disk_digest and not codec_changed:
+            chunk.element.text = chunk.disk_data_str
+        elif new_digest != chunk.saved_digest or codec_changed:
+            chunk.element.text = tiled_utils.EncodeToTiledFormat(chunk_array, codec[0], codec[1], compression_level)
+        chunk.saved_digest = new_digest
+        chunk.tiles_array = chunk_array
+    
+    def _AddChunk(self, tile_layer, x, y):
+        '''Adds an empty chunk to a chunked layer, keeping its chunks sorted like TILED does (by row, then column)'''
+        data = tile_layer.element.find('data')
+        chunk_attributes = {'x': str(x), 'y': str(y), 'width': str(self._chunk_width), 'height': str(self._chunk_height)}
+        chunk_element = ET.Element('chunk', chunk_attributes)
+        chunk = _TileChunk(chunk_element, x, y, self._chunk_width, self._chunk_height)
+        chunk.tiles_array = numpy.zeros((chunk.height, chunk.width), dtype=numpy.uint32)
+        
+        index = 0
+        while index < len(tile_layer.chunks) and (tile_layer.chunks[index].y, tile_layer.chunks[index].x) < (y, x):
+            index += 1
+        if index < len(tile_layer.chunks):
+            data.insert(list(data).index(tile_layer.chunks[index].element), chunk_element)
+        else:
+            data.append(chunk_element)
+        tile_layer.chunks.insert(index, chunk)
+        return chunk
+    
+    def _UpdateChunkedBounds(self, tile_layer):
+        '''Sets the size & origin of a chunked layer to the area covered by its chunks, like TILED does'''
+        if not tile_layer.chunks:
+            tile_layer.origin_x, tile_layer.origin_y, tile_layer.width, tile_layer.height = 0, 0, 0, 0
+            return
+        tile_layer.origin_x = min(chunk.x for chunk in tile_layer.chunks)
+        tile_layer.origin_y = min(chunk.y for chunk in tile_layer.chunks)
+        tile_layer.width = max(chunk.x + chunk.width for chunk in tile_layer.chunks) - tile_layer.origin_x
+        tile_layer.height = max(chunk.y + chunk.height for chunk in tile_layer.chunks) - tile_layer.origin_y
+    
+    
+    
+    def _FindParent(self, element):
+        '''Looks up element's parent, rebuilding the parent map on a miss. Returns None if element is not in the level'''
+        if xml_backend.HAS_PARENT_POINTERS:
+            # No map needed, but the element's topmost ancestor must be the level itself (not a removed subtree)
+            ancestors = list(element.iterancestors())
+            if not ancestors or ancestors[-1] is not self.level_root: return None
+            return ancestors[0]
+        if self._parent_map is None or element not in self._parent_map:
+            self._parent_map = {child: parent for parent in self.level_root.iter() for child in parent}
+        return self._parent_map.get(element)
+
+
+
+    def _RegisterParents(self, element, parent):
+        '''Record element (and everything inside it) in the parent map, if the map was built already'''
+        self._object_index = None
+        if self._parent_map is None: return
+        self._parent_map[element] = parent
+        for child_parent in element.iter():
+            for child in child_parent: self._parent_map[child] = child_parent
+
+
+
+    def _GetObjectIndex(self):
+        if self._object_index is None: self._object_index = _ObjectIndex(self.level_root)
+        return self._object_index
+
+
+
+    def _ParseLevelIfNeeded(self):
+        if self._level_root is None: self._ParseLevel()
+
+
+
+    def _ParseLevel(self):
+        '''Parses the XML file, and builds the registry of tile layers & everything else that needs the XML'''
+        self._my_xml_tree = xml_backend.ParseBytes(self._disk_bytes)
+        self._level_root = self._my_xml_tree.getroot()
+        self._cached_object_table = None
+
+        # Check if more than 1 tilesheet is being used & gracefully handle error if so
+        self._CheckForMultiSheetError()
+        
+        # Extract map dimensions and tile size from the level
+        self.map_width = int(self._level_root.get('width'))
+        self.map_height = int(self._level_root.get('height'))
+        self.tile_width = int(self._level_root.get('tilewidth'))
+        self.tile_height = int(self._level_root.get('tileheight'))
+        self.is_infinite = self._level_root.get('infinite') == '1'
+        chunk_size = self._level_root.find('editorsettings/chunksize')
+        if chunk_size is not None:
+            self._chunk_width = int(chunk_size.get('width', DEFAULT_CHUNK_SIZE))
+            self._chunk_height = int(chunk_size.get('height', DEFAULT_CHUNK_SIZE))
+
+        # Layers loaded from the snapshot are matched up with their XML elements, keeping their decoded tiles
+        cached_tile_layers = self._tile_layers
+        self._tile_layers = []
+        self._tile_layers_by_name = {}
+        self._RegisterTileLayersIn(self._level_root, '')
+        if cached_tile_layers:
+            if [t.name for t in cached_tile_layers] != [t.name for t in self._tile_layers]:
+                raise Exception(f"level_playdo.py : snapshot of {self.full_file_name} does not match the level!")
+            for cached_tile_layer, tile_layer in zip(cached_tile_layers, self._tile_layers):
+                cached_tile_layer.element = tile_layer.element
+                cached_tile_layer.disk_data_str = tile_layer.disk_data_str
+            self._tile_layers = cached_tile_layers
+            self._tile_layers_by_name = {}
+            for tile_layer in self._tile_layers:
+                self._tile_layers_by_name.setdefault(tile_layer.name, []).append(tile_layer)
+
+        self._saved_signatures = _ComputeSignatures(self._level_root)
+        self._LocateDataSpans()
+
+
+
+    def _LoadSnapshot(self, snapshot):
+        '''Fills the registry of tile layers from a fresh snapshot, without parsing the XML file'''
+        self.map_width = snapshot['map']['width']
+        self.map_height = snapshot['map']['height']
+        self.tile_width = snapshot['map']['tilewidth']
+        self.tile_height = snapshot['map']['tileheight']
+
+        for cached_layer in snapshot['tile_layers']:
+            tile_layer = _TileLayer(None, cached_layer['name'], cached_layer['folder_path'], cached_layer['width'], cached_layer['height'])
+            if cached_layer['tiles_array'] is not None:
+                # The snapshot matches the file on disk, so its tiles are also what's encoded on disk
+                tile_layer.saved_digest = bytes.fromhex(cached_layer['digest'])
+                tile_layer.disk_digest = tile_layer.saved_digest
+                tile_layer.snapshot_array = cached_layer['tiles_array']
+            self._tile_layers.append(tile_layer)
+            self._tile_layers_by_name.setdefault(tile_layer.name, []).append(tile_layer)
+        self._cached_object_table = snapshot['objects']
+
+
+
+    def _SaveSnapshot(self):
+        '''Decodes all tile layers & saves them into a snapshot, so the next run can skip parsing the level'''
+        if any(tile_layer.chunks is not None for tile_layer in self._tile_layers):
+            log.Extra(f"-- level_playdo.py : chunked layers aren't kept in snapshots, skipped {self.full_file_name}")
+            return
+        snapshot_layers = []
+        self._DecodeTileLayers(self._tile_layers)
+        for tile_layer in self._tile_layers:
+            has_data = tile_layer.saved_digest is not None
+            snapshot_layers.append({
+                'name': tile_layer.name,
+                'folder_path': tile_layer.folder_path,
+                'width': tile_layer.width,
+                'height': tile_layer.height,
+                'digest': tile_layer.saved_digest.hex() if has_data else None,
+                'tiles_array': tile_layer.tiles_array if has_data else None,
+            })
+        map_attributes = {'width': self.map_width, 'height': self.map_height,
+            'tilewidth': self.tile_width, 'tileheight': self.tile_height}
+        try:
+            level_cache.SaveSnapshot(self.full_file_name, self._disk_bytes, map_attributes, snapshot_layers,
+                level_cache.BuildObjectTable(self.level_root))
+        except OSError as e:
+            log.Extra(f"-- level_playdo.py : could not save snapshot of {self.full_file_name} : {e}")
+
+
+
+    def _RegisterTileLayersIn(self, parent_element, folder_path):
+        '''Recursively adds all tile layers under parent_element (including those inside folders) to the registry'''
+        for child in parent_element:
+            if child.tag == 'layer':
+                self._RegisterTileLayer(child, folder_path)
+            elif child.tag == 'group':
+                self._RegisterTileLayersIn(child, folder_path + child.get('name', '') + '/')
+    
+    def _RegisterTileLayer(self, layer, folder_path):
+        '''Adds one tile layer element to the registry. Its data is NOT decoded until requested'''
+        tile_layer_name = layer.get('name')
+        if tile_layer_name is None:
+            tile_layer_name = 'unnamed_tile_layer'
+        
+        # Copied over layers (e.g. from cli_pic) use their own width and height, rather than the level's
+        width = int(layer.get('width', self.map_width))
+        height = int(layer.get('height', self.map_height))
+        tile_layer = _TileLayer(layer, tile_layer_name, folder_path, width, height)
+        
+        data = layer.find('data')
+        if data is not None: tile_layer.disk_data_str = data.text
+        
+        # Layers of infinite maps are made of chunks, each decoded on its own. The layer covers all of them
+        if data is not None and (self.is_infinite or data.find('chunk') is not None):
+            tile_layer.chunks = []
+            for chunk_element in data.findall('chunk'):
+                tile_layer.chunks.append(_TileChunk(chunk_element, int(chunk_element.get('x')), int(chunk_element.get('y')),
+                    int(chunk_element.get('width')), int(chunk_element.get('height'))))
+            tile_layer.chunks.sort(key=lambda chunk: (chunk.y, chunk.x))
+            self._UpdateChunkedBounds(tile_layer)
+        
+        self._tile_layers.append(tile_layer)
+        self._tile_layers_by_name.setdefault(tile_layer_name, []).append(tile_layer)
+        return tile_layer
             
     def _CheckForMultiSheetError(self):
         '''Check if more than 1 tilesheet is being used.
@@ -359,6 +1249,8 @@ class LevelPlayDo():
         
         has_multiple_tilesheet = len(self.level_root.findall('tileset')) > 1
         if not has_multiple_tilesheet: return
+        if not self.interactive:
+            raise Exception(f'Multiple tilesheets detected in "{file_utils.StripFilename(self.full_file_name)}"! Only 1 tilesheet at a time is supported!')
             
         log.Must(f'\nERROR! Multiple tilesheets detected in "{file_utils.StripFilename(self.full_file_name)}"! Only 1 tilesheet at a time is supported!')
         log.Must(f"\nWould you like to fix it now? (Y/N)")
@@ -376,15 +1268,82 @@ class LevelPlayDo():
                 xml_tag.set('source', first_tilesheet_directory)
         
         log.Must(f'\tMade "{first_tilesheet_directory}\" the only existant tileset in the level file.\n')
-        self.Write()
-        self.my_xml_tree = None
-        self.level_root = None
+        self.Write(force_write = True)
+        self._my_xml_tree = None
+        self._level_root = None
         log.Must('\tHowever, this is only one-half of the fix.\n')
         log.Must('\tNext, you must open the problem level XML in Tiled and manually save [Ctrl]+[S]')
         log.Must('\t(Perform a no-op operation if you must to trigger the ability to save)\n')
         log.Must('\tTiled will see the unusually high tile IDs and normalize them (Tile ID 16385 becomes ID 1, etc)')
         log.Must('\tAfter this step is performed, you may re-run the tool safely!\n')
         sys.exit()
+#--------------------------------------------------#
+'''Chunks'''
+
+# Size of new chunks in infinite maps, when the map doesn't say otherwise (TILED's own default)
+DEFAULT_CHUNK_SIZE = 16
+
+
+
+def _GetOverlap(rect_a, rect_b):
+    '''Takes two (x, y, width, height) rectangles & returns their overlap as (x0, y0, x1, y1), or None if they don't'''
+    x0 = max(rect_a[0], rect_b[0])
+    y0 = max(rect_a[1], rect_b[1])
+    x1 = min(rect_a[0] + rect_a[2], rect_b[0] + rect_b[2])
+    y1 = min(rect_a[1] + rect_a[3], rect_b[1] + rect_b[3])
+    if x0 >= x1 or y0 >= y1: return None
+    return x0, y0, x1, y1
+
+
+
+#--------------------------------------------------#
+'''Change Detection'''
+
+def _DigestTiles(tiles_array):
+    '''Returns a short digest of a tile layer's contents, used to detect if new data differs from the old'''
+    return tiled_utils.DigestTiles2d(tiles_array)
+
+
+
+# Matches a <data> element holding a plain payload (base64 or csv) & captures the payload itself
+_DATA_PAYLOAD_REGEX = re.compile(rb'<data\b[^>]*>([^<]*)</data>')
+
+
+
+def _ElementSignature(element):
+    '''Hashes an element and its whole subtree (tags, attributes, text & order of children). The payload
+    of tile layer <data> is left out, it's compared separately since it's the part most often edited'''
+    return hash(tuple((e.tag, tuple(e.attrib.items()), None if e.tag == 'data' else e.text, e.tail)
+        for e in element.iter()))
+
+
+
+def _ComputeSignatures(level_root):
+    '''
+    Returns a dict mapping every tile layer & objectgroup element to a signature of its contents.
+    Everything else in the level (map attributes, tilesets, folders & the order of all layers) is
+    hashed together under the key None. Comparing two results tells exactly which layers were edited
+    '''
+    signatures = {}
+    rest_of_level = []
+    elements_to_visit = [level_root]
+    while elements_to_visit:
+        element = elements_to_visit.pop()
+        children = list(element)
+        # Tile layers & objectgroups are identified by id (they're kept alive as keys of the signatures, which
+        # lxml needs for ids to stay the same). The contents of everything else is hashed here anyway
+        rest_of_level.append((element.tag, tuple(element.attrib.items()), element.text, element.tail,
+            tuple(id(child) if child.tag == 'layer' or child.tag == 'objectgroup' else child.tag for child in children)))
+        for child in children:
+            if child.tag == 'layer' or child.tag == 'objectgroup':
+                signatures[child] = _ElementSignature(child)
+            else:
+                elements_to_visit.append(child)
+    signatures[None] = hash(tuple(rest_of_level))
+    return signatures
+
+
+
 #--------------------------------------------------#
 '''...'''        
 
@@ -397,6 +1356,7 @@ def AddPropertiesToObject(tiled_object, properties):
         
     The above two lines will give tiled_obj the properties A and B, which map to 1 & 2 respectively
     '''
+    tiled_utils.ForgetCachedProperties(tiled_object)
     prop_elem = tiled_object.find('properties')
     if prop_elem is None:
         prop_elem = ET.SubElement(tiled_object, 'properties')
@@ -0,0 +1,284 @@
+'''
+LevelScanner is a read-only alternative to LevelPlayDo, for tools that only look through levels.
+
+Rather than building the level's whole ElementTree, it streams the XML and hands out tile layers
+and objects one at a time, in document order, discarding each once it has been handed out. Tile
+data is only decoded when asked for, and a scan can be stopped early once the caller has found what
+it was looking for. With use_cache, levels that have a fresh snapshot (see level_cache.py) are
+served from it without reading the XML at all, and levels scanned from start to end get a snapshot.
+
+An example usage of LevelScanner would be as follows:
+
+    scanner = LevelScanner("star_ilid/levels/g03.xml")
+    for tile_layer in scanner.TileLayers():
+        if 657 in tile_layer.GetArray2d(): break        # Stops reading the file right away
+    for obj in scanner.Objects():
+        print(obj['name'], obj['properties'])
+
+'''
+import io
+import numpy
+import logic.common.log_utils as log
+import logic.common.xml_backend as xml_backend
+import logic.common.tiled_utils as tiled_utils
+import logic.common.level_cache as level_cache
+
+#--------------------------------------------------#
+
+class ScannedTileLayer():
+    '''One tile layer handed out by LevelScanner. Its data is decoded on first request only'''
+    kind = 'layer'
+
+    def __init__(self, name, folder_path, width, height, data_str = None, codec = (None, ''), tiles_array = None, chunks = None):
+        self.name = name                # Name of the layer, 'unnamed_tile_layer' if it has none
+        self.folder_path = folder_path  # Folders (Tiled groups) the layer is tucked in, e.g. 'rules/mouth/'
+        self.width = width              # Layer width in tiles
+        self.height = height            # Layer height in tiles
+        self.encoding, self.compression = codec
+        self._data_str = data_str       # Encoded data as found in the XML, None if the layer holds no data
+        self._tiles_array = tiles_array
+        self._chunks = chunks           # For layers of infinite maps, (x, y, width, height, data_str) of each chunk
+
+        # Tile coordinates of the layer's top-left tile, only chunked layers can start elsewhere than (0, 0)
+        self.origin_x = min((chunk[0] for chunk in chunks), default=0) if chunks else 0
+        self.origin_y = min((chunk[1] for chunk in chunks), default=0) if chunks else 0
+
+    def HasData(self):
+        return self._tiles_array is not None or bool(self._data_str) or bool(self._chunks)
+
+    def GetArray2d(self):
+        '''Returns the layer's tile IDs as a 2D numpy array (uint32). Layers without data are blank. Chunked
+        layers are assembled from all of their chunks, Array2d[0][0] being the tile at (origin_x, origin_y)'''
+        if self._tiles_array is None:
+            if self._chunks is not None:
+                self._tiles_array = numpy.zeros((self.height, self.width), dtype=numpy.uint32)
+                for x, y, chunk_array in self.GetChunks():
+                    x -= self.origin_x
+                    y -= self.origin_y
+                    self._tiles_array[y:y+chunk_array.shape[0], x:x+chunk_array.shape[1]] = chunk_array
+            elif self._data_str:
+                self._tiles_array = tiled_utils.DecodeIntoArray2d(self._data_str, self.width, self.encoding, self.compression)
+            else:
+                self._tiles_array = numpy.zeros((self.height, self.width), dtype=numpy.uint32)
+            self._data_str = None
+        return self._tiles_array
+
+    def GetChunks(self, include_empty = False):
+        '''
+         Yields (x, y, Array2d) for each chunk of the layer, decoding one chunk at a time. Chunks holding only empty
+         tiles are skipped unless include_empty. Layers of fixed size are handed out as a single chunk
+        '''
+        if self._chunks is None:
+            tiles_array = self.GetArray2d()
+            if include_empty or tiles_array.any(): yield 0, 0, tiles_array
+            return
+        for x, y, width, height, data_str in self._chunks:
+            if data_str: chunk_array = tiled_utils.DecodeIntoArray2d(data_str, width, self.encoding, self.compression)
+            else:        chunk_array = numpy.zeros((height, width), dtype=numpy.uint32)
+            if include_empty or chunk_array.any(): yield x, y, chunk_array
+
+    def GetTiles2d(self):
+        '''Same as GetArray2d, but returns a list of lists like LevelPlayDo.GetTiles2d'''
+        return self.GetArray2d().tolist()
+
+
+
+class LevelScanner():
+    '''Streams a TILED level XML, handing out its tile layers & objects without keeping the whole level in memory'''
+
+    def __init__(self, file_name, use_cache = False, save_snapshot = True):
+        '''
+         file_name - path to the TILED level XML
+         use_cache - when True, levels with a fresh snapshot are scanned from it instead of the XML. Levels that
+             don't have one get a snapshot saved once they were scanned from start to end
+         save_snapshot - when False, use_cache only reuses snapshots that already exist & never saves new ones
+        '''
+        self.full_file_name = file_name
+        self.use_cache = use_cache
+        self.save_snapshot = save_snapshot
+
+        # Map dimensions and tile size, filled in as soon as a scan starts
+        self.map_width = None
+        self.map_height = None
+        self.tile_width = None
+        self.tile_height = None
+        self.is_infinite = False
+
+
+    def Scan(self):
+        '''
+         Yields every tile layer (as a ScannedTileLayer) and every object (as a ScannedObject) in document order,
+         use .kind to tell them apart. When scanning from a snapshot, all tile layers come before all objects
+        '''
+        if not self.use_cache:
+            yield from self._StreamLevel(None)
+            return
+
+        with open(self.full_file_name, 'rb') as level_file:
+            level_bytes = level_file.read()
+        snapshot = level_cache.LoadSnapshot(self.full_file_name, level_bytes)
+        if snapshot is not None:
+            yield from self._ScanSnapshot(snapshot)
+        else:
+            yield from self._StreamLevel(level_bytes if self.save_snapshot else None)
+
+
+    def TileLayers(self):
+        '''Yields only the tile layers of the level, see Scan()'''
+        for item in self.Scan():
+            if item.kind == 'layer': yield item
+
+
+    def Objects(self):
+        '''Yields only the objects of the level, see Scan()'''
+        for item in self.Scan():
+            if item.kind == 'object': yield item
+
+
+
+    def _ScanSnapshot(self, snapshot):
+        self.map_width = snapshot['map']['width']
+        self.map_height = snapshot['map']['height']
+        self.tile_width = snapshot['map']['tilewidth']
+        self.tile_height = snapshot['map']['tileheight']
+
+        # Snapshots keep tile layers & objects apart, so they are handed out one after the other
+        for cached_layer in snapshot['tile_layers']:
+            yield ScannedTileLayer(cached_layer['name'], cached_layer['folder_path'], cached_layer['width'],
+                cached_layer['height'], tiles_array = cached_layer['tiles_array'])
+        for row in snapshot['objects']:
+            yield ScannedObject(row)
+
+
+    def _StreamLevel(self, level_bytes):
+        '''Streams the XML with iterparse. When level_bytes are given (use_cache), a snapshot is saved at the end'''
+        scanned_layers = [] if level_bytes is not None else None
+        object_table = [] if level_bytes is not None else None
+        num_tilesets = 0
+        has_chunks = False
+
+        folder_names = []           # Names of the folders (Tiled groups) we're currently in
+        objectgroup_names = []      # Name of the objectgroup we're currently in (a list, in case they are nested)
+        elements = []               # Elements currently open, root first
+        level_source = open(self.full_file_name, 'rb') if level_bytes is None else io.BytesIO(level_bytes)
+        with level_source:
+            for event, element in xml_backend.IterParse(level_source, ('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if not elements:
+                        self._ReadMapAttributes(element)
+                    elif tag == 'group':
+                        folder_names.append(element.get('name', ''))
+                    elif tag == 'objectgroup':
+                        objectgroup_names.append(element.get('name', ''))
+                    elif tag == 'tileset':
+                        num_tilesets += 1
+                    elements.append(element)
+                    continue
+
+                # Only the 'end' of an element guarantees its children were read
+                elements.pop()
+                if tag == 'layer':
+                    tile_layer = self._MakeTileLayer(element, ''.join(name + '/' for name in folder_names))
+                    has_chunks = has_chunks or tile_layer._chunks is not None
+                    if scanned_layers is not None: scanned_layers.append(tile_layer)
+                    yield tile_layer
+                elif tag == 'object' and objectgroup_names:
+                    row = level_cache.MakeObjectRow(objectgroup_names[-1], element)
+                    if object_table is not None: object_table.append(row)
+                    yield ScannedObject(row)
+                elif tag == 'group':
+                    folder_names.pop()
+                elif tag == 'objectgroup':
+                    objectgroup_names.pop()
+                else:
+                    continue
+
+                # Discard what was handed out. Top level elements are removed from the root altogether
+                element.clear()
+                if len(elements) == 1: elements[0].remove(element)
+
+        # Levels using more than 1 tilesheet need fixing by LevelPlayDo first, so they don't get a snapshot.
+        # Neither do infinite maps, as snapshots don't keep chunks
+        if level_bytes is not None and num_tilesets <= 1 and not has_chunks:
+            self._SaveSnapshot(level_bytes, scanned_layers, object_table)
+
+
+    def _ReadMapAttributes(self, map_element):
+        self.map_width = int(map_element.get('width'))
+        self.map_height = int(map_element.get('height'))
+        self.tile_width = int(map_element.get('tilewidth'))
+        self.tile_height = int(map_element.get('tileheight'))
+        self.is_infinite = map_element.get('infinite') == '1'
+
+
+    def _MakeTileLayer(self, layer, folder_path):
+        # Same naming & sizing rules as LevelPlayDo's registry of tile layers
+        tile_layer_name = layer.get('name')
+        if tile_layer_name is None:
+            tile_layer_name = 'unnamed_tile_layer'
+        width = int(layer.get('width', self.map_width))
+        height = int(layer.get('height', self.map_height))
+
+        data = layer.find('data')
+        chunk_elements = [] if data is None else data.findall('chunk')
+        if chunk_elements or (data is not None and self.is_infinite):
+            # Chunked layers cover the area of all of their chunks, like LevelPlayDo's
+            chunks = [(int(chunk.get('x')), int(chunk.get('y')), int(chunk.get('width')), int(chunk.get('height')),
+                (chunk.text or '').strip()) for chunk in chunk_elements]
+            if chunks:
+                width = max(x + w for x, _, w, _, _ in chunks) - min(x for x, _, _, _, _ in chunks)
+                height = max(y + h for _, y, _, h, _ in chunks) - min(y for _, y, _, _, _ in chunks)
+            else:
+                width, height = 0, 0
+            return ScannedTileLayer(tile_layer_name, folder_path, width, height, codec = tiled_utils.GetDataCodec(data), chunks = chunks)
+        if data is None or data.text is None or not data.text.strip():
+            return ScannedTileLayer(tile_layer_name, folder_path, width, height)
+        return ScannedTileLayer(tile_layer_name, folder_path, width, height, data.text.strip(), tiled_utils.GetDataCodec(data))
+
+
+    def _SaveSnapshot(self, level_bytes, scanned_layers, object_table):
+        snapshot_layers = []
+        for tile_layer in scanned_layers:
+            has_data = tile_layer.HasData()
+            tiles_array = tile_layer.GetArray2d() if has_data else None
+            snapshot_layers.append({
+                'name': tile_layer.name,
+                'folder_path': tile_layer.folder_path,
+                'width': tile_layer.width,
+                'height': tile_layer.height,
+                'digest': tiled_utils.DigestTiles2d(tiles_array).hex() if has_data else None,
+                'tiles_array': tiles_array,
+            })
+        map_attributes = {'width': self.map_width, 'height': self.map_height,
+            'tilewidth': self.tile_width, 'tileheight': self.tile_height}
+        try:
+            level_cache.SaveSnapshot(self.full_file_name, level_bytes, map_attributes, snapshot_layers, object_table)
+        except OSError as e:
+            log.Extra(f"-- level_scanner.py : could not save snapshot of {self.full_file_name} : {e}")
+
+
+
+class ScannedObject(dict):
+    '''
+     One object handed out by LevelScanner. It's a copy of the object's row in the level's object table
+     (see level_cache.BuildObjectTable), e.g. obj['name'], obj['x'], obj['properties']['_sort']
+    '''
+    kind = 'object'
+
+
+
+
+
+#--------------------------------------------------#
+
+
+
+
+
+
+
+
+
+
+# end of file
@@ -1,32 +1,69 @@
 '''Common tiled functions that are generally useful for all Tiling-related scripts.'''
 
+import os
 import base64
 import zlib
 import numpy
-import copy
-import xml.etree.ElementTree as ET
+import gzip
+import concurrent.futures
+import hashlib
+import weakref
 import logic.common.log_utils as log
+import logic.common.xml_backend as xml_backend
+from logic.common.xml_backend import ET
 
 #--------------------------------------------------#
 '''Base64 string <-> Array'''
     
 
-def DecodeIntoTiles2d(encoded_str, row_width, encoding_used = None):
-    '''All-purpose Decode to Tiles2d function that will delegate which decoding Fn to use'''
+def DecodeIntoTiles2d(encoded_str, row_width, encoding_used = None, compression_used = None):
+    '''
+    All-purpose Decode to Tiles2d function that will delegate which decoding Fn to use
+      encoding_used - 'csv' or 'base64' (default), the 'encoding' attribute of the layer's <data>
+      compression_used - 'zlib', 'gzip', 'zstd' or '' for none, the 'compression' attribute of the layer's <data>.
+          When None, it is guessed from the data itself (gzip & zstd are recognizable, zlib otherwise)
+    '''
     if encoding_used == 'csv':
         return DecodeCSVIntoTiles2d(encoded_str, row_width)
     else:
-        # The only other supported encoding is 'base64 zlib'
-        return DecodeBase64ZlibIntoTiles2d(encoded_str, row_width)
+        return DecodeBase64IntoArray2d(encoded_str, row_width, compression_used).tolist()
 
 
 
-def EncodeToTiledFormat(tiles2d, encoding_used = None):
+def DecodeIntoArray2d(encoded_str, row_width, encoding_used = None, compression_used = None):
+    '''Same as DecodeIntoTiles2d, except a 2D numpy array (uint32) is returned instead of a list of lists'''
+    if encoding_used == 'csv':
+        return DecodeCSVIntoArray2d(encoded_str, row_width)
+    else:
+        return DecodeBase64IntoArray2d(encoded_str, row_width, compression_used)
+
+
+
+def EncodeToTiledFormat(tiles2d, encoding_used = None, compression_used = None, compression_level = None):
+    '''
+    All-purpose Encode from Tiles2d (list of lists or 2D numpy array), the counterpart of DecodeIntoTiles2d
+      compression_used - 'zlib' (default), 'gzip', 'zstd' or '' for none. Ignored for csv
+      compression_level - trades file size for speed, e.g. 1-9 for zlib & gzip, 1-22 for zstd. None for default
+    '''
     if encoding_used == 'csv':
         return EncodeIntoCsv(tiles2d)
     else:
-        # The only other supported encoding is 'base64 zlib'
-        return EncodeIntoZlibString64(tiles2d)
+        if compression_used is None: compression_used = 'zlib'
+        return EncodeIntoBase64String(tiles2d, compression_used, compression_level)
+
+
+
+def GetDataCodec(data_element):
+    '''Return (encoding, compression) of a layer's <data> XML element, e.g. ('base64', 'zstd') or ('csv', '')'''
+    return (data_element.get('encoding'), data_element.get('compression', ''))
+
+
+
+def SetDataCodec(data_element, encoding_used, compression_used):
+    '''Counterpart of GetDataCodec, updates the attributes of a layer's <data> XML element'''
+    data_element.set('encoding', encoding_used)
+    if compression_used and encoding_used != 'csv': data_element.set('compression', compression_used)
+    else:                                           data_element.attrib.pop('compression', None)
 
 
 
@@ -39,29 +76,54 @@ def DecodeBase64ZlibIntoTiles2d(encoded_str, row_width):
       >>> DecodeBase64ZlibIntoTiles2d("eAENw4cNACAMAKA66/r/XiGhRES12R1O0+X2eH1+BeAATw==", 4)
       >>> [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]]
     '''
+    return DecodeBase64ZlibIntoArray2d(encoded_str, row_width).tolist()
+
+
+
+def DecodeBase64ZlibIntoArray2d(encoded_str, row_width):
+    '''
+    Same as DecodeBase64ZlibIntoTiles2d, but skips the list conversion and returns a 2D numpy array (uint32).
+    The array is a view laid directly over the decompressed buffer, so no per-tile work is done at all.
+    The buffer is a bytearray so that the array stays writable, e.g. array[y][x] = tile_id
+    '''
+    return DecodeBase64IntoArray2d(encoded_str, row_width, 'zlib')
+
+
 
+def DecodeBase64IntoArray2d(encoded_str, row_width, compression_used = None):
+    '''Same as DecodeBase64ZlibIntoArray2d, but for any compression TILED supports. See DecodeIntoTiles2d'''
     # Convert the base64 string to a numpy array (uint32)
     decoded_data = base64.b64decode(encoded_str)
-    decompressed_data = zlib.decompress(decoded_data)
+    if compression_used is None: compression_used = _GuessCompression(decoded_data)
+    decompressed_data = bytearray(_Decompress(decoded_data, compression_used))
     array = numpy.frombuffer(decompressed_data, dtype=numpy.uint32)
 
     # Reshape the array to the desired dimensions
-    tiles2d = array.reshape(-1, row_width)
-    return tiles2d.tolist()
+    return array.reshape(-1, row_width)
 
 
 
 def DecodeCSVIntoTiles2d(csv_str, row_width):
     '''Does same thing as 'DecodeBase64ZlibIntoTiles2d', except it works on CSV data strings '''
-    numbers = [int(num_str) for num_str in csv_str.split(',')]
-    result = []
-    for i in range(0, len(numbers), row_width):
-        result.append(numbers[i:i+row_width])
-    return result
+    return DecodeCSVIntoArray2d(csv_str, row_width).tolist()
+
+
+
+def DecodeCSVIntoArray2d(csv_str, row_width):
+    '''
+    Same as DecodeCSVIntoTiles2d, but returns a 2D numpy array (uint32).
+    The whole string is parsed by numpy in one go. Line breaks between rows, as written by TILED, are ignored
+    '''
+    array = numpy.fromstring(csv_str, dtype=numpy.uint32, sep=',')
+
+    # Older numpy versions stop quietly at the first cell they can't parse, so fall back to int() to raise the error
+    if array.size != csv_str.count(',') + 1:
+        array = numpy.array([int(num_str) for num_str in csv_str.split(',')], dtype=numpy.uint32)
+    return array.reshape(-1, row_width)
     
 
 
-def EncodeIntoZlibString64(tiles2d):
+def EncodeIntoZlibString64(tiles2d, compression_level = None):
     '''
     Takes a TILED layer encoded string and converts it into a tiles2d
       tiles2d - 2d array of Tile IDs, first row is at top
@@ -69,10 +131,17 @@ def EncodeIntoZlibString64(tiles2d):
       >>> EncodeIntoZlibString64([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]])
       >>> "eAENw4cNACAMAKA66/r/XiGhRES12R1O0+X2eH1+BeAATw=="
     '''
-    # Convert: tiles2d array -> numpy array (uint32) -> bytes -> zlib string -> base64 string
-    np_array = numpy.array(tiles2d, dtype=numpy.uint32)
+    return EncodeIntoBase64String(tiles2d, 'zlib', compression_level)
+
+
+
+def EncodeIntoBase64String(tiles2d, compression_used = 'zlib', compression_level = None):
+    '''Same as EncodeIntoZlibString64, but for any compression TILED supports. See EncodeToTiledFormat'''
+    # Convert: tiles2d array -> numpy array (uint32) -> bytes -> compressed bytes -> base64 string
+    # Tiles2d that are already uint32 numpy arrays are used as-is without making a copy
+    np_array = numpy.ascontiguousarray(tiles2d, dtype=numpy.uint32)
     array_bytes = np_array.tobytes()
-    compressed_data = zlib.compress(array_bytes)
+    compressed_data = _Compress(array_bytes, compression_used, compression_level)
     encoded_str = base64.b64encode(compressed_data).decode()
 
     return encoded_str
@@ -80,10 +149,117 @@ def EncodeIntoZlibString64(tiles2d):
     
     
 def EncodeIntoCsv(tiles2d):
-    '''Similar to EncodeIntoZlibString64, except it generates a CSV string'''
-    flattened_list = [str(num) for row in tiles2d for num in row]
-    encoded_str = ', '.join(flattened_list)
-    return encoded_str
+    '''
+    Similar to EncodeIntoZlibString64, except it generates a CSV string laid out the way TILED writes it,
+    i.e. one row per line, with a line break before the first row and after the last one
+      >>> EncodeIntoCsv([[1, 2], [3, 4]])
+      >>> "\n1,2,\n3,4\n"
+    '''
+    # Format a whole row at a time rather than converting each tile into a string of its own
+    np_array = numpy.asarray(tiles2d, dtype=numpy.uint32)
+    row_format = ','.join(['%d'] * np_array.shape[1])
+    rows = [row_format % tuple(row) for row in np_array.tolist()]
+    return '\n' + ',\n'.join(rows) + '\n'
+
+
+
+def DigestTiles2d(tiles2d):
+    '''Returns a short digest (bytes) of a tiles2d's contents, to tell cheaply whether two tiles2d differ'''
+    return hashlib.blake2b(numpy.ascontiguousarray(tiles2d, dtype=numpy.uint32), digest_size=16).digest()
+
+
+
+#--------------------------------------------------#
+'''Batch Encoding & Decoding'''
+
+# zlib, gzip, zstd & hashing release the GIL on large buffers, so the layers of a level are decoded & encoded
+# across a pool of threads. Results always come back in the order the layers were given
+CODEC_THREADS = os.cpu_count() or 1
+_codec_pool = None
+
+def DecodeManyIntoArray2d(decode_jobs):
+    '''
+     Decodes many tile layers at once & returns a list of 2D numpy arrays, in the same order as decode_jobs
+       decode_jobs - list of (encoded_str, row_width, encoding_used, compression_used), see DecodeIntoArray2d
+    '''
+    return _RunCodecJobs(DecodeIntoArray2d, decode_jobs)
+
+def EncodeManyToTiledFormat(encode_jobs):
+    '''
+     Encodes many tile layers at once & returns a list of encoded strings, in the same order as encode_jobs
+       encode_jobs - list of (tiles2d, encoding_used, compression_used, compression_level), see EncodeToTiledFormat
+    '''
+    return _RunCodecJobs(EncodeToTiledFormat, encode_jobs)
+
+def _RunCodecJobs(codec_fn, jobs):
+    # A single layer (or a single core) isn't worth handing over to the pool
+    if len(jobs) < 2 or CODEC_THREADS < 2:
+        return [codec_fn(*job) for job in jobs]
+    global _codec_pool
+    if _codec_pool is None:
+        _codec_pool = concurrent.futures.ThreadPoolExecutor(max_workers=CODEC_THREADS, thread_name_prefix='tiled_codec')
+    return list(_codec_pool.map(lambda job: codec_fn(*job), jobs))
+
+
+
+#--------------------------------------------------#
+'''Compression'''
+
+# Leading bytes of gzip & zstd streams, used to tell them apart from zlib when the compression is not given
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+def _GuessCompression(compressed_data):
+    if compressed_data.startswith(_GZIP_MAGIC): return 'gzip'
+    if compressed_data.startswith(_ZSTD_MAGIC): return 'zstd'
+    return 'zlib'
+
+def _Compress(data, compression_used, compression_level = None):
+    if compression_used == 'zlib':
+        return zlib.compress(data, -1 if compression_level is None else compression_level)
+    if compression_used == 'gzip':
+        # mtime is fixed so that the same tiles always give the same data string
+        return gzip.compress(data, 9 if compression_level is None else compression_level, mtime=0)
+    if compression_used == 'zstd':
+        return _GetZstdModule().compress(data, compression_level)
+    if compression_used == '':
+        return data
+    raise Exception(f"tiled_utils.py : compression '{compression_used}' is not supported!")
+
+def _Decompress(compressed_data, compression_used):
+    if compression_used == 'zlib': return zlib.decompress(compressed_data)
+    if compression_used == 'gzip': return gzip.decompress(compressed_data)
+    if compression_used == 'zstd': return _GetZstdModule().decompress(compressed_data)
+    if compression_used == '':     return compressed_data
+    raise Exception(f"tiled_utils.py : compression '{compression_used}' is not supported!")
+
+class _ZstandardModule():
+    '''Wraps the third-party zstandard package to look like the standard library's compression.zstd'''
+    def __init__(self, zstandard):
+        self.zstandard = zstandard
+    def compress(self, data, level = None):
+        if level is None: return self.zstandard.ZstdCompressor().compress(data)
+        return self.zstandard.ZstdCompressor(level=level).compress(data)
+    def decompress(self, data):
+        # Streams written without their content size (e.g. by some TILED versions) need a decompressobj
+        return self.zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+_zstd_module = None
+
+def _GetZstdModule():
+    '''zstd is only in the standard library from Python 3.14 onwards, otherwise the zstandard package is needed'''
+    global _zstd_module
+    if _zstd_module is not None: return _zstd_module
+    try:
+        import compression.zstd as zstd
+        _zstd_module = zstd
+    except ImportError:
+        try:
+            import zstandard
+            _zstd_module = _ZstandardModule(zstandard)
+        except ImportError:
+            raise Exception("tiled_utils.py : zstd compression needs Python 3.14+ or the 'zstandard' package (pip install zstandard)")
+    return _zstd_module
 
 
 
@@ -144,9 +320,7 @@ def FlipTiles2d(tiles2d):
       >>> FlipTiles2d([[0, 1, 2], [3, 4, 5]])
       >>> [[-2, -1, -0], [-5, -4, -3]]
     '''
-    # Change the cell position, then content within (e.g toggling the top 3 bits)
-    flipped_tiles2d = [row[::-1] for row in tiles2d]
-    return [[FlipTileId(tile_id) if tile_id != 0 else 0 for tile_id in row] for row in flipped_tiles2d]
+    return FlipArray2d(tiles2d).tolist()
 
 
 
@@ -157,16 +331,37 @@ def RotateTiles2d(tiles2d):
       >>> RotateTiles2d([[0, 1, 2], [3, 4, 5]])
       >>> [[*3,*0], [*4,*1], [*5,*2]]
     '''
-    # Change the cell position, then content within (e.g toggling the top 3 bits)
-    rotated_tiles2d = list(zip(*tiles2d[::-1]))
-    return [[RotateTileId(tile_id) if tile_id != 0 else 0 for tile_id in row] for row in rotated_tiles2d]
+    return RotateArray2d(tiles2d).tolist()
+
+
+
+def FlipArray2d(tiles2d):
+    '''
+    Same as FlipTiles2d, but works on the whole tiles2d at once and returns a 2D numpy array (uint32).
+    Accepts either a list of lists or a numpy array
+    '''
+    # Change the cell position, then content within (e.g toggling the top 3 bits). Empty cells stay empty
+    flipped_array = numpy.asarray(tiles2d, dtype=numpy.uint32)[:, ::-1]
+    return numpy.where(flipped_array != 0, flipped_array ^ numpy.uint32(_FLIP_BIT), numpy.uint32(0))
+
+
+
+def RotateArray2d(tiles2d):
+    '''
+    Same as RotateTiles2d, but works on the whole tiles2d at once and returns a 2D numpy array (uint32).
+    Accepts either a list of lists or a numpy array
+    '''
+    # Change the cell position (90˚ clockwise), then content within: the top 3 bits are swapped using the rotate map
+    rotated_array = numpy.rot90(numpy.asarray(tiles2d, dtype=numpy.uint32), k=-1)
+    new_top_3_bits = _ROTATE_TOP_BITS_ARRAY[rotated_array >> 29]
+    rotated_ids = (rotated_array & numpy.uint32(0x1FFFFFFF)) | new_top_3_bits
+    return numpy.where(rotated_array != 0, rotated_ids, numpy.uint32(0))
 
 
 
 def FlipTileId(tile_id):
     '''Flips one tiles horizontally (pressing [x] in Tiled), e.g. 1 -> 2147483650'''
-    mask = 1 << 31
-    return tile_id ^ mask
+    return tile_id ^ _FLIP_BIT
 
 
 
@@ -186,6 +381,17 @@ def RotateTileId(tile_id):
     return tile_id
 
 
+def FlipTileIds(tile_ids):
+    '''Same as FlipTileId, but for a whole numpy array (uint32) of tile IDs at once'''
+    return tile_ids ^ numpy.uint32(_FLIP_BIT)
+
+
+
+def RotateTileIds(tile_ids):
+    '''Same as RotateTileId, but for a whole numpy array (uint32) of tile IDs at once. Unlike RotateArray2d, 0 is rotated too'''
+    return (tile_ids & numpy.uint32(0x1FFFFFFF)) | _ROTATE_TOP_BITS_ARRAY[tile_ids >> 29]
+
+
 # Maps the top 3 bit transformation patterns for TILED rotations
 _ROTATE_BIT_MAP = {
     0b000: 0b101,
@@ -198,6 +404,12 @@ _ROTATE_BIT_MAP = {
     0b001: 0b100
 }
 
+# Same as above, but already shifted into place & indexable by the top 3 bits of a whole numpy array at once
+_ROTATE_TOP_BITS_ARRAY = numpy.array([_ROTATE_BIT_MAP[top_3_bits] << 29 for top_3_bits in range(8)], dtype=numpy.uint32)
+
+# The top bit of a tile ID, toggled when flipping horizontally
+_FLIP_BIT = 1 << 31
+
 
 
 def GetTileIdPermutations(tile_id):
@@ -216,9 +428,8 @@ def GetTileIdPermutations(tile_id):
 
 def GetParentObject(obj, playdo):
     '''Return the parent of any XML tree object, e.g. the objectgroup for a given TILED object'''
-    parent_map = {child: parent for parent in playdo.level_root.iter() for child in parent}
-    parent_obj = parent_map[obj]
-    return parent_obj
+    # The playdo keeps a parent map around, so this no longer walks the whole level on every call
+    return playdo.GetParent(obj)
 
 
 
@@ -232,21 +443,74 @@ def GetNameFromObject( tiled_object ):
 
 def GetPropertyFromObject( tiled_object, property_name, return_none_if_not_found = False ):
     '''Extract the property as string, e.g. returns "20" from GetProperty('_sort')'''
-    # Check if the object has any property
-    properties = tiled_object.find('properties')
-    if properties == None:
-        if return_none_if_not_found: return None
-        else:                        return ''
-
-    # Continue searching the object's list for specific property
-    for curr_property in properties.findall('property'):
-        if curr_property.get('name') == property_name:
-            return curr_property.get('value')
+    # Look up the object's parsed properties, rather than scanning its XML on every call
+    properties_dict = GetPropertiesFromObject(tiled_object)
+    if property_name in properties_dict:
+        return properties_dict[property_name]
     # Returning None would crash when attempted to be converted into string
     if return_none_if_not_found: return None
     else:                        return ''
 
 
+
+# Parsed properties of each TILED object, filled by GetPropertiesFromObject(). Entries go away along with their
+# object, and are dropped by the property setters in this file whenever an object's properties are edited.
+# lxml elements can't be weakly referenced, and each one keeps its whole level alive. So under lxml, the parsed
+# properties are only kept for levels whose playdo asked for it (see NewPropertyCache), & go away along with it
+_cached_properties = weakref.WeakKeyDictionary() if xml_backend.HAS_WEAK_ELEMENTS else None
+_property_caches_by_root = weakref.WeakValueDictionary()
+_property_edit_count = 0
+
+class _PropertyCache(dict):
+    '''Parsed properties of the TILED objects of one level. Only a dict subclass so it can be weakly referenced'''
+
+def NewPropertyCache( level_root ):
+    '''
+     Return an empty cache for the parsed properties of the level's objects, used by GetPropertiesFromObject()
+     for as long as the caller holds on to it. Replaces the level's previous cache, if any
+    '''
+    property_cache = _PropertyCache()
+    _property_caches_by_root[level_root] = property_cache
+    return property_cache
+
+def _GetPropertyCache( tiled_object ):
+    if _cached_properties is not None: return _cached_properties
+    return _property_caches_by_root.get(tiled_object.getroottree().getroot())
+
+def GetPropertiesFromObject( tiled_object ):
+    '''
+     Return all properties of object as a dictionary, e.g. {'_sort': '20', 'note': 'abc'}
+     If a property is listed more than once, the first one is used. Do not edit the returned dictionary
+    '''
+    property_cache = _GetPropertyCache(tiled_object)
+    if property_cache is None: return ParsePropertiesFromObject(tiled_object)
+    properties_dict = property_cache.get(tiled_object)
+    if properties_dict is None:
+        properties_dict = ParsePropertiesFromObject(tiled_object)
+        property_cache[tiled_object] = properties_dict
+    return properties_dict
+
+def ParsePropertiesFromObject( tiled_object ):
+    '''Same as GetPropertiesFromObject, but always reads the object's XML & never caches the result'''
+    properties_dict = {}
+    properties = tiled_object.find('properties')
+    if properties is not None:
+        for curr_property in properties.findall('property'):
+            properties_dict.setdefault(curr_property.get('name'), curr_property.get('value'))
+    return properties_dict
+
+def ForgetCachedProperties( tiled_object ):
+    '''Must be called after editing an object's properties directly (the property setters in this file already do)'''
+    global _property_edit_count
+    property_cache = _GetPropertyCache(tiled_object)
+    if property_cache is not None: property_cache.pop(tiled_object, None)
+    _property_edit_count += 1
+
+def GetPropertyEditCount():
+    '''Return how many times object properties were edited so far, for caches built on top of object properties'''
+    return _property_edit_count
+
+
 def GetPolyPointsFromObject( tiled_object ):
     '''Obtain the polypoints from object (polygon or polyline) and return a list of tuples: [ (x1,y1), (x2,y2), ... ]'''
 
@@ -314,7 +578,7 @@ def IsTilelayerNameValid(tilelayer_name):
 # Deep-copy is needed before object copied from templates can be modified
 def CopyXMLObject(obj):
     '''Deep-copy an XML objects, mostly for making new objects from a duplicated template'''
-    return copy.deepcopy(obj)
+    return xml_backend.CloneElement(obj)
 
 
 
@@ -322,6 +586,8 @@ def SetPropertyOnObject(tiled_object, property_name, new_value):
     '''Change the value for the requested property, add new if not exist'''
 #    '''Helper function. Adds properties to a tiled object'''
 
+    ForgetCachedProperties(tiled_object)
+
     # Get the properties of object, create new one if none exists yet
     prop_elem = tiled_object.find('properties')
     if prop_elem is None:
@@ -395,6 +661,7 @@ def RemovePropertyFromObject( tiled_object, property_name ):
         properties.remove(property)
         has_property_to_be_removed = True
     if not has_property_to_be_removed: return False
+    ForgetCachedProperties(tiled_object)
 
     # If the property getting removed is the only property, add the no-op #Q property
     if len(properties) == 0:
@@ -420,8 +687,7 @@ def MoveObjectToNewObjectgroup(playdo, obj, new_objectgroup):
     '''
     # Relocate
     old_objectgroup = GetParentObject(obj, playdo)
-    old_objectgroup.remove(obj) 
-    new_objectgroup.append(obj)
+    playdo.MoveElement(obj, new_objectgroup)
     log.Extra(f"      {obj.get('name')}    {old_objectgroup.get('name')} -> {new_objectgroup.get('name')}")
 
     # Delete old objectgroup if it's empty, otherwise the level might not be able to run
@@ -439,8 +705,7 @@ def DeleteObjectgroupIfEmpty(playdo, objectgroup):
     # Delete current objectgroup
     layer_name = objectgroup.get('name')
     log.Extra(f'Removing objectgroup \"{layer_name}\"')
-    parent_folder = GetParentObject(objectgroup, playdo)
-    parent_folder.remove(objectgroup)
+    parent_folder = playdo.RemoveElement(objectgroup)
 
     # If parent layer was in a folder before removal, and folder no longer contains tilelayer/objectgroup, remove folder
     if parent_folder.tag != 'group': return                 # Do nothing if current objectgroup is not in folder
@@ -450,8 +715,7 @@ def DeleteObjectgroupIfEmpty(playdo, objectgroup):
     # Delete folder that houses the current objectgroup
     folder_name = parent_folder.get('name')
     log.Extra(f'Removing folder \"{folder_name}\"')
-    root = GetParentObject(parent_folder, playdo)
-    root.remove(parent_folder)
+    playdo.RemoveElement(parent_folder)
     # NOTE Is unable to delete nested folder
 
 
@@ -471,10 +735,11 @@ def MoveObjectgroupAfter(playdo, objectgroup, destination, insert_after = True):
     old_parent = GetParentObject(objectgroup, playdo)
     new_parent = GetParentObject(destination, playdo)
     
-    old_parent.remove(objectgroup) 
-    new_id = list(new_parent).index(destination)
+    new_siblings = list(new_parent)
+    new_id = new_siblings.index(destination)
     if insert_after: new_id += 1
-    new_parent.insert(new_id, objectgroup)
+    if old_parent is new_parent and new_siblings.index(objectgroup) < new_id: new_id -= 1  # Account for its own removal
+    playdo.MoveElement(objectgroup, new_parent, new_id)
 
     # If parent is a folder before removal, and folder no longer contains tilelayer/objectgroup, remove folder
     if old_parent.tag != 'group': return
@@ -482,8 +747,7 @@ def MoveObjectgroupAfter(playdo, objectgroup, destination, insert_after = True):
     if old_parent.find('layer') != None: return
     folder_name = old_parent.get('name')
     log.Extra(f'Removing folder \"{folder_name}\"')
-    root = GetParentObject(old_parent, playdo)
-    root.remove(old_parent)
+    playdo.RemoveElement(old_parent)
     # NOTE Is unable to delete nested folder
 
 
@@ -499,8 +763,7 @@ def MoveMetaObjectgroupToBottom(playdo):
 
     objectgroup = playdo.GetObjectGroup('meta', False)
     parent = GetParentObject(objectgroup, playdo)
-    parent.remove(objectgroup) 
-    parent.insert(0, objectgroup)
+    playdo.MoveElement(objectgroup, parent, 0)
 
 
 
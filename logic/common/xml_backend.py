@@ -0,0 +1,148 @@
+'''
+Logic module picking the XML library that levels are parsed, built & written with
+
+lxml is used when it is installed, as it parses, copies & serializes levels several times faster and
+knows the parent of every element. Otherwise, the standard library's ElementTree is used. Either way,
+levels are written out byte-for-byte the same as the standard library would.
+
+Elements of one library can't be added to the other's, so code creating elements for a level should
+use the ET handed out here rather than importing xml.etree.ElementTree itself.
+
+USAGE EXAMPLE:
+    from logic.common.xml_backend import ET
+    ET.SubElement(playdo.level_root, 'objectgroup', {'name': 'meta'})
+
+Set the environment variable STARTOOLS_XML_BACKEND=stdlib to always use the standard library.
+'''
+
+import io
+import os
+import re
+import copy
+import xml.etree.ElementTree as _stdlib_etree
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_etree = None
+
+#--------------------------------------------------#
+'''Variables'''
+
+USE_LXML = _lxml_etree is not None and os.environ.get('STARTOOLS_XML_BACKEND', '').lower() != 'stdlib'
+BACKEND_NAME = 'lxml' if USE_LXML else 'stdlib'
+ET = _lxml_etree if USE_LXML else _stdlib_etree
+
+# lxml elements know their parent, but (unlike the standard library's) they can't be weakly referenced
+HAS_PARENT_POINTERS = USE_LXML
+HAS_WEAK_ELEMENTS = not USE_LXML
+
+# The standard library drops comments & processing instructions when parsing, so lxml is told to do the same
+_LXML_PARSER_OPTIONS = {'remove_comments': True, 'remove_pis': True, 'resolve_entities': False, 'huge_tree': True}
+
+# lxml's output differs from the standard library's in a few spots, these are patched over (see WriteBytes)
+_LXML_EMPTY_ELEMENT_REGEX = re.compile(rb'<([^\s/>]+)([^>]*)></\1>')
+
+
+
+
+#--------------------------------------------------#
+'''General Public Functions'''
+
+def ParseBytes(xml_bytes):
+    '''Parses the content of an XML file & returns it as an ElementTree'''
+    if USE_LXML:
+        return _lxml_etree.ElementTree(_lxml_etree.fromstring(xml_bytes, _lxml_etree.XMLParser(**_LXML_PARSER_OPTIONS)))
+    return _stdlib_etree.ElementTree(_stdlib_etree.fromstring(xml_bytes))
+
+
+
+def ParseFile(file_path):
+    '''Parses an XML file & returns it as an ElementTree'''
+    with open(file_path, 'rb') as xml_file:
+        return ParseBytes(xml_file.read())
+
+
+
+def IterParse(source, events = ('end',)):
+    '''Same as ET.iterparse, source being a path or a binary file object'''
+    if USE_LXML:
+        return _lxml_etree.iterparse(source, events=events, **_LXML_PARSER_OPTIONS)
+    return _stdlib_etree.iterparse(source, events=events)
+
+
+
+def WriteBytes(xml_tree):
+    '''Serializes an ElementTree exactly like the standard library's xml_tree.write() does, & returns the bytes'''
+    if not USE_LXML:
+        level_bytes_io = io.BytesIO()
+        xml_tree.write(level_bytes_io)
+        return level_bytes_io.getvalue()
+
+    xml_bytes = _lxml_etree.tostring(xml_tree.getroot(), encoding='us-ascii', with_tail=False)
+
+    # Carriage returns are escaped by lxml inside text as well, the standard library only does so in attributes.
+    # They never come from TILED itself, so leave those rare levels to the standard library
+    if b'&#13;' in xml_bytes:
+        level_bytes_io = io.BytesIO()
+        _stdlib_etree.ElementTree(_stdlib_etree.fromstring(xml_bytes)).write(level_bytes_io)
+        return level_bytes_io.getvalue()
+
+    # The standard library writes empty elements as <tag /> (even those with an empty string of text) & tabs as &#09;
+    xml_bytes = xml_bytes.replace(b'/>', b' />')
+    xml_bytes = _LXML_EMPTY_ELEMENT_REGEX.sub(rb'<\1\2 />', xml_bytes)
+    return xml_bytes.replace(b'&#9;', b'&#09;')
+
+
+
+def CloneElement(element, with_tail = True):
+    '''Deep-copies an element & everything in it. The copy has no parent'''
+    element_copy = copy.deepcopy(element)
+    if not with_tail: element_copy.tail = None
+    return element_copy
+
+
+
+def CloneWithAttributes(element, new_attributes):
+    '''
+     Same as CloneElement (without the tail) followed by setting new_attributes on the copy, but faster for the
+     childless elements most TILED objects are. Attributes keep their order, new ones are added at the end
+    '''
+    if USE_LXML or len(element):
+        # lxml copies faster than it creates new elements, & elements with children need the full copy anyway
+        element_copy = copy.deepcopy(element)
+        element_copy.tail = None
+        for key, value in new_attributes.items(): element_copy.set(key, value)
+        return element_copy
+    element_copy = _stdlib_etree.Element(element.tag, {**element.attrib, **new_attributes})
+    element_copy.text = element.text
+    return element_copy
+
+
+
+def SpliceChildren(parent, children, start, end, new_children):
+    '''
+     Replaces children[start:end] with new_children, where children are the last children of parent (as listed
+     before splicing). To splice several times with the same list, go from the back & merge splices sharing a start
+    '''
+    if not children:
+        parent.extend(new_children)
+        return
+    if not USE_LXML:
+        # Children are kept in an array, so slicing by index is a single shift. Other children are few & come first
+        offset = 0
+        while parent[offset] is not children[0]: offset += 1
+        parent[offset + start:offset + end] = new_children
+        return
+
+    # Children are kept in a linked list, so finding an index means walking to it. Splice next to known children instead
+    if start < len(children):
+        for new_child in new_children: children[start].addprevious(new_child)
+    else:
+        parent.extend(new_children)
+    for old_child in children[start:end]: parent.remove(old_child)
+
+
+
+
+
+# end of file
@@ -13,8 +13,9 @@ USAGE EXAMPLE:
     tile_finder.SearchFile(file_name, tile_id)
 '''
 
+import numpy
 import logic.common.file_utils as file_utils
-import logic.common.level_playdo as play
+import logic.common.level_scanner as level_scanner
 import logic.common.log_utils as log
 
 def SearchFileForTileIds(filename, tiles_to_search):
@@ -25,49 +26,39 @@ def SearchFileForTileIds(filename, tiles_to_search):
         the 1st entry is the tile ID & the other 7 are its permutations after flipping & rotations
     
     Returns a dictionary mapping tile_layer_name to a list of coordinates where matches were found.
+    Layers sharing a name have their matches listed together.
     Returns an empty dictionary if no matches were found.
     Returns None if a file erred out and could not be searched
     '''
+    search_results = {} # dict of 'layer_name' to list of coordinate tuples
     try:
-        playdo = play.LevelPlayDo(filename)
-        tiles2d_map, tiles2d_hash = playdo.PreCalculateInternalTileData()
+        # The level is streamed one tile layer at a time (or read from its snapshot if unchanged since the last search)
+        scanner = level_scanner.LevelScanner(filename, use_cache=True)
+        for tile_layer in scanner.TileLayers():
+            # Infinite maps are searched one chunk at a time, so their empty space is never decoded
+            for chunk_x, chunk_y, tiles_array in tile_layer.GetChunks():
+                for tile_id in tiles_to_search:
+                    _RefineSearchResult(tile_id, tile_layer.name, tiles_array, search_results, chunk_x, chunk_y)
     except Exception as e:
         return None
-        
-    layers_containing_target = []
-    search_results = {} # dict of 'layer_name' to list of coordinate tuples
-    for tile_layer_name in tiles2d_hash.keys():
-        playdo.GetTiles2d(tile_layer_name)
-        tiles_hash = playdo.GetTilesHashSet(tile_layer_name)
-        for tile_id in tiles_to_search:
-            if tile_id in tiles_hash:
-                _RefineSearchResult(tile_id, tile_layer_name, tiles2d_map, search_results)
-                layers_containing_target.append(tile_layer_name)
 
     return search_results
 
-def _RefineSearchResult(search_tile_id, tile_layer_name, tiles2d_map, search_result):
+def _RefineSearchResult(search_tile_id, tile_layer_name, tiles_array, search_result, offset_x = 0, offset_y = 0):
     '''
     Refines a search result so we can attach the location of a match to the layer it was 
-    found. We use this when we have a hit in the tiles hash cache, and want to refine 
-    the result to indicate where in the tiles specifically a tile was used.
+    found, i.e. where in the tiles specifically a tile was used.
       
     search_tile_id - the tile id we are searching
-    tile_layer_name - the layer name we know it to exist in
-    tiles2d_map - map of tile_layer_name to tiles2d data - obtained from playdo
+    tile_layer_name - the name of the layer being searched
+    tiles_array - the layer's tile IDs (or one chunk's, in infinite maps) as a 2D numpy array
+    offset_x, offset_y - tile coordinates of tiles_array's top-left tile
     search_result - dictionary of tile_layer_name to a list of coordinates. _RefineSearchResult
         doesn't return a value, but it will update this search_result structure
     '''
-    containing_tiles2d = tiles2d_map[tile_layer_name]
-    
-    if tile_layer_name not in search_result:
-        search_result[tile_layer_name] = []
-        
-    for row, tile_row in enumerate(containing_tiles2d):
-        for col, tile_id in enumerate(tile_row):
-            if search_tile_id == tile_id:
-                if tile_layer_name in search_result:
-                    search_result[tile_layer_name].append((col, row))
+    rows, cols = numpy.nonzero(tiles_array == search_tile_id)
+    if len(rows) == 0: return
+    search_result.setdefault(tile_layer_name, []).extend(zip((cols + offset_x).tolist(), (rows + offset_y).tolist()))
                     
 def FormatSearchResult(search_results):
     '''Formats the search_result returned from SearchFile() into a pretty printable string'''    
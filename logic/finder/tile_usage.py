@@ -0,0 +1,260 @@
+'''
+Keeps an index of the tiles every level uses, so finding which levels use a tile takes milliseconds
+
+For each level, the index holds how many times each tile is used in each of its tile layers, all orientations
+of a tile (its flips & rotations) counting as the same tile. It lives in the tool's cache folder & is brought
+up to date by Refresh(), which only scans the levels that are new or changed since: a level is only scanned
+again when its modification time or size changed, and its content hash did too. Where exactly a tile is used
+isn't kept, as that would take about as much room as the levels themselves. tile_finder finds that out in the
+few levels the index points to.
+
+USAGE EXAMPLE:
+    import logic.finder.tile_usage as tile_usage
+    tile_usage.Refresh()                        # Scans new & changed levels, then saves the index
+    tile_usage.GetTileUsage(658)                # {level_path: {tile_layer_name: count}}
+    tile_usage.IsTileUsed(658)
+'''
+
+import os
+import json
+import zipfile
+import hashlib
+import numpy
+import logic.common.log_utils as log
+import logic.common.file_utils as file_utils
+import logic.common.level_cache as level_cache
+import logic.common.level_scanner as level_scanner
+
+#--------------------------------------------------#
+'''Variables'''
+
+INDEX_VERSION = 1               # Bump whenever the index format changes, so old indexes are ignored
+INDEX_FILE_NAME = 'tile_usage.npz'
+BASE_ID_MASK = 0x1FFFFFFF       # Tile IDs without their top 3 bits (flips & rotations)
+
+# The arrays of each level's entry, saved together as one array each
+_ARRAY_DTYPES = {'base_ids': numpy.uint32, 'layer_nums': numpy.int32, 'counts': numpy.int64}
+
+_levels = None                  # Maps the full path of each indexed level to its entry, see _ScanLevel
+_is_index_dirty = False
+_query_arrays = None            # The usage of all levels in a single set of arrays sorted by tile ID, see _GetQueryArrays
+
+
+
+
+#--------------------------------------------------#
+'''General Public Functions'''
+
+def Refresh(level_files = None, on_progress = None):
+    '''
+     Brings the index up to date with the level files (all of them by default), scanning those that are new or
+     changed, & saves it. Levels whose files are gone are dropped. Returns the number of levels scanned
+
+     on_progress - called as on_progress(num_done, num_levels, level_path) after each level, if given
+    '''
+    global _is_index_dirty, _query_arrays
+    levels = _GetLevels()
+    if level_files is None: level_files = file_utils.GetAllLevelFiles()
+
+    num_scanned = 0
+    for num, level_path in enumerate(level_files, 1):
+        full_path = os.path.abspath(level_path)
+        entry = levels.get(full_path)
+        file_stat = os.stat(full_path)
+        is_fresh = entry is not None and entry['mtime_ns'] == file_stat.st_mtime_ns and entry['size'] == file_stat.st_size
+        if not is_fresh:
+            # A level touched without edits keeps its entry, the content hash gets the final say
+            with open(full_path, 'rb') as level_file:
+                content_hash = _HashContent(level_file.read())
+            if entry is not None and entry['size'] == file_stat.st_size and entry['content_hash'] == content_hash:
+                entry['mtime_ns'] = file_stat.st_mtime_ns
+            else:
+                levels[full_path] = _ScanLevel(full_path, file_stat, content_hash)
+                num_scanned += 1
+                _query_arrays = None
+            _is_index_dirty = True
+        if on_progress is not None: on_progress(num, len(level_files), level_path)
+
+    for full_path in [full_path for full_path in levels if not os.path.exists(full_path)]:
+        del levels[full_path]
+        _is_index_dirty = True
+        _query_arrays = None
+
+    _SaveIndex()
+    log.Extra(f'-- tile_usage.py : scanned {num_scanned} of {len(level_files)} levels, the rest were up to date')
+    return num_scanned
+
+
+
+def GetTileUsage(tile_id):
+    '''
+     Returns how many times each level uses tile_id in any of its orientations, as a dictionary mapping each level's
+     full path to a dictionary of {tile_layer_name : count}. Tile layers sharing a name are counted together
+    '''
+    base_ids, level_nums, layer_nums, counts, level_paths = _GetQueryArrays()
+    base_id = tile_id & BASE_ID_MASK
+    start, end = numpy.searchsorted(base_ids, [base_id, base_id + 1])
+
+    tile_usage = {}
+    for level_num, layer_num, count in zip(level_nums[start:end].tolist(), layer_nums[start:end].tolist(), counts[start:end].tolist()):
+        level_path = level_paths[level_num]
+        layer_name = _levels[level_path]['layer_names'][layer_num]
+        level_usage = tile_usage.setdefault(level_path, {})
+        level_usage[layer_name] = level_usage.get(layer_name, 0) + count
+    return tile_usage
+
+
+
+def IsTileUsed(tile_id):
+    '''Returns True if any level uses tile_id in any of its orientations'''
+    base_ids = _GetQueryArrays()[0]
+    base_id = tile_id & BASE_ID_MASK
+    num = numpy.searchsorted(base_ids, base_id)
+    return num < len(base_ids) and base_ids[num] == base_id
+
+
+
+def GetUsedTileIds(level_files = None):
+    '''
+     Returns the sorted tile IDs (without their flips & rotations) used by any level, as a numpy array (uint32).
+     When level_files is given, only those levels are looked at
+    '''
+    base_ids, level_nums, _, _, level_paths = _GetQueryArrays()
+    if level_files is not None:
+        selected_paths = {os.path.abspath(level_path) for level_path in level_files}
+        is_selected = numpy.array([level_path in selected_paths for level_path in level_paths] + [False])
+        base_ids = base_ids[is_selected[level_nums]]
+    return numpy.unique(base_ids)
+
+
+
+def GetErroredLevels():
+    '''Returns a dictionary mapping the full path of each level that could not be scanned to its error message'''
+    return {level_path: entry['error'] for level_path, entry in _GetLevels().items() if entry['error'] is not None}
+
+
+
+
+#--------------------------------------------------#
+'''Private Functions'''
+
+def _ScanLevel(full_path, file_stat, content_hash):
+    '''
+     Returns the index entry of a level: its 'mtime_ns', 'size', 'content_hash', 'layer_names' (in document order),
+     'error' (None unless the level could not be scanned) & the 'base_ids', 'layer_nums' & 'counts' of its tiles,
+     one row per tile ID & tile layer, sorted by tile ID
+    '''
+    entry = {'mtime_ns': file_stat.st_mtime_ns, 'size': file_stat.st_size, 'content_hash': content_hash,
+        'layer_names': [], 'error': None}
+    all_base_ids = []
+    all_layer_nums = []
+    try:
+        # Snapshots (see level_cache.py) other tools already saved are reused, but the index never saves any itself.
+        # They hold every tile of the level, which is far more than the index needs to keep
+        scanner = level_scanner.LevelScanner(full_path, use_cache=True, save_snapshot=False)
+        for layer_num, tile_layer in enumerate(scanner.TileLayers()):
+            entry['layer_names'].append(tile_layer.name)
+            for _, _, tiles_array in tile_layer.GetChunks():
+                base_ids = tiles_array.ravel() & numpy.uint32(BASE_ID_MASK)
+                all_base_ids.append(base_ids[base_ids != 0])
+                all_layer_nums.append(numpy.full(len(all_base_ids[-1]), layer_num, dtype=numpy.uint64))
+    except Exception as e:
+        entry['layer_names'] = []
+        entry['error'] = str(e)
+        all_base_ids = []
+        all_layer_nums = []
+
+    # Counting (tile ID, tile layer) pairs as single keys sorts them by tile ID, then tile layer
+    keys = numpy.concatenate(all_base_ids + [numpy.zeros(0, dtype=numpy.uint32)]).astype(numpy.uint64) << numpy.uint64(32)
+    keys |= numpy.concatenate(all_layer_nums + [numpy.zeros(0, dtype=numpy.uint64)])
+    keys, counts = numpy.unique(keys, return_counts=True)
+    entry['base_ids'] = (keys >> numpy.uint64(32)).astype(numpy.uint32)
+    entry['layer_nums'] = (keys & numpy.uint64(0xFFFFFFFF)).astype(numpy.int32)
+    entry['counts'] = counts.astype(numpy.int64)
+    return entry
+
+
+
+def _GetQueryArrays():
+    '''Returns the (base_ids, level_nums, layer_nums, counts, level_paths) of all levels, sorted by base_ids'''
+    global _query_arrays
+    if _query_arrays is not None: return _query_arrays
+    levels = _GetLevels()
+    level_paths = list(levels)
+    entries = [levels[level_path] for level_path in level_paths]
+    base_ids, layer_nums, counts = [numpy.concatenate([entry[key] for entry in entries] + [numpy.zeros(0, dtype=dtype)]).astype(dtype)
+        for key, dtype in _ARRAY_DTYPES.items()]
+    level_nums = numpy.repeat(numpy.arange(len(entries), dtype=numpy.int32), [len(entry['base_ids']) for entry in entries])
+    order = numpy.argsort(base_ids, kind='stable')
+    _query_arrays = (base_ids[order], level_nums[order], layer_nums[order], counts[order], level_paths)
+    return _query_arrays
+
+
+
+def _GetLevels():
+    '''Loads the index from disk on first use. Unreadable or outdated indexes are started over'''
+    global _levels
+    if _levels is not None: return _levels
+    _levels = {}
+
+    index_path = level_cache.GetCacheFolder() / INDEX_FILE_NAME
+    if not index_path.exists(): return _levels
+    try:
+        with numpy.load(index_path, allow_pickle=False) as index_file:
+            meta = json.loads(str(index_file['meta']))
+            if meta.get('version') != INDEX_VERSION: return _levels
+            level_nums = index_file['level_nums']
+            base_ids = index_file['base_ids']
+            layer_nums = index_file['layer_nums']
+            counts = index_file['counts']
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        log.Extra('-- tile_usage.py : unreadable index, starting over')
+        return _levels
+
+    # Rows are saved level after level, so each level's rows are found by searching the level numbers
+    bounds = numpy.searchsorted(level_nums, numpy.arange(len(meta['levels']) + 1))
+    for num, (level_path, entry) in enumerate(meta['levels']):
+        entry['base_ids'] = base_ids[bounds[num]:bounds[num + 1]]
+        entry['layer_nums'] = layer_nums[bounds[num]:bounds[num + 1]]
+        entry['counts'] = counts[bounds[num]:bounds[num + 1]]
+        _levels[level_path] = entry
+    return _levels
+
+
+
+def _SaveIndex():
+    '''Writes the index to disk, if anything in it changed since it was loaded'''
+    global _is_index_dirty
+    if not _is_index_dirty: return
+    entries = list(_levels.items())
+    meta = {'version': INDEX_VERSION, 'levels': [(level_path, {key: value for key, value in entry.items() if key not in _ARRAY_DTYPES})
+        for level_path, entry in entries]}
+    arrays = {key: numpy.concatenate([entry[key] for _, entry in entries] + [numpy.zeros(0, dtype=dtype)]).astype(dtype)
+        for key, dtype in _ARRAY_DTYPES.items()}
+    arrays['level_nums'] = numpy.repeat(numpy.arange(len(entries), dtype=numpy.int32), [len(entry['base_ids']) for _, entry in entries])
+
+    index_path = level_cache.GetCacheFolder() / INDEX_FILE_NAME
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first & swapped in at once, so an interrupted save never leaves half an index
+        temp_index_path = index_path.parent / (INDEX_FILE_NAME + '.tmp')
+        with open(temp_index_path, 'wb') as index_file:
+            numpy.savez(index_file, meta=numpy.array(json.dumps(meta)), **arrays)
+        os.replace(temp_index_path, index_path)
+    except OSError as e:
+        log.Extra(f'-- tile_usage.py : could not save the index : {e}')
+        return
+    _is_index_dirty = False
+    log.Extra(f'-- tile_usage.py : saved the index of {len(entries)} levels')
+
+
+
+def _HashContent(level_bytes):
+    '''Returns a short hash of a level file's content, to tell edited levels from merely touched ones'''
+    return hashlib.blake2b(level_bytes, digest_size=16).hexdigest()
+
+
+
+
+
+# end of file
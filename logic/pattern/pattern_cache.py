@@ -0,0 +1,182 @@
+'''
+Keeps compiled patterns on disk, so pattern XMLs are only parsed, validated, decoded & trimmed once
+
+A compiled pattern is what PatternMatcher.LoadPattern makes of a pattern XML: for each of its tile layers,
+the trimmed tiles2d, its untrimmed size, how many rows & columns were trimmed, and the matching objectgroup
+serialized as XML. All compiled patterns live in a single bundle inside the tool's cache folder, shared by
+every CLI. An entry is used for as long as its pattern file keeps the same modification time & size, or
+failing that, the same content hash (e.g. after a checkout touched the file without changing it).
+Otherwise it is recompiled.
+
+The results of PatternMatcher.FindAndCreate(..., incremental = True) are kept as well, one file per level,
+tile layer & objectgroup. These hold the searched tiles & the matches found, so the next run only needs
+to search again where the tiles changed.
+
+USAGE EXAMPLE:
+    compiled_layers = pattern_cache.GetCompiledPattern(pattern_file_path)  # None if missing or stale
+    pattern_cache.StoreCompiledPattern(pattern_file_path, compiled_layers)
+    pattern_cache.SaveBundle()                                              # Writes the bundle if it changed
+'''
+
+import os
+import json
+import zipfile
+import hashlib
+import numpy
+import logic.common.log_utils as log
+import logic.common.file_utils as file_utils
+import logic.common.level_cache as level_cache
+
+#--------------------------------------------------#
+'''Variables'''
+
+BUNDLE_VERSION = 2              # Bump whenever the compiled format changes, so old bundles are ignored
+BUNDLE_FILE_NAME = 'patterns.json'
+MATCHES_FOLDER_NAME = 'matches'
+MATCHES_EXTENSION = '.npz'
+
+_bundle = None                  # The bundle as loaded from disk: {'version': ..., 'patterns': {full_path: entry}}
+_is_bundle_dirty = False
+
+
+
+
+#--------------------------------------------------#
+'''General Public Functions'''
+
+def GetCompiledPattern(pattern_file_path):
+    '''
+     Returns the compiled layers of a pattern file if it hasn't changed since it was compiled, otherwise None.
+     Each compiled layer is a dictionary of 'name', 'tiles2d', 'width', 'height', 'rows_trimmed', 'cols_trimmed'
+     & 'objectgroup_xml'
+    '''
+    global _is_bundle_dirty
+    entry = _GetBundle()['patterns'].get(os.path.abspath(pattern_file_path))
+    if entry is None: return None
+
+    # The modification time & size are cheap checks. If those changed, the content hash gets the final say
+    file_stat = os.stat(pattern_file_path)
+    if entry['mtime_ns'] == file_stat.st_mtime_ns and entry['size'] == file_stat.st_size:
+        return entry['layers']
+    if entry['size'] != file_stat.st_size or entry['content_hash'] != _HashFile(pattern_file_path):
+        return None
+    entry['mtime_ns'] = file_stat.st_mtime_ns
+    _is_bundle_dirty = True
+    return entry['layers']
+
+
+
+def StoreCompiledPattern(pattern_file_path, compiled_layers):
+    '''Adds (or replaces) the compiled layers of a pattern file in the bundle. Call SaveBundle() to persist them'''
+    global _is_bundle_dirty
+    file_stat = os.stat(pattern_file_path)
+    _GetBundle()['patterns'][os.path.abspath(pattern_file_path)] = {
+        'mtime_ns': file_stat.st_mtime_ns,
+        'size': file_stat.st_size,
+        'content_hash': _HashFile(pattern_file_path),
+        'layers': compiled_layers,
+    }
+    _is_bundle_dirty = True
+
+
+
+def SaveBundle():
+    '''Writes the bundle to disk, if anything in it changed since it was loaded'''
+    global _is_bundle_dirty
+    if not _is_bundle_dirty: return
+    bundle_path = level_cache.GetCacheFolder() / BUNDLE_FILE_NAME
+    try:
+        bundle_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first & swapped in at once, so an interrupted save never leaves half a bundle
+        temp_bundle_path = bundle_path.parent / (BUNDLE_FILE_NAME + '.tmp')
+        with open(temp_bundle_path, 'w') as bundle_file:
+            json.dump(_bundle, bundle_file)
+        os.replace(temp_bundle_path, bundle_path)
+    except OSError as e:
+        log.Extra(f'-- pattern_cache.py : could not save compiled patterns : {e}')
+        return
+    _is_bundle_dirty = False
+    log.Extra(f'-- pattern_cache.py : saved {len(_bundle["patterns"])} compiled patterns')
+
+
+
+
+#--------------------------------------------------#
+'''Match Results'''
+
+def LoadMatchResults(level_path, tile_layer_name, objects_layer_name):
+    '''
+     Returns the match results saved for a level's tile layer & objectgroup (see SaveMatchResults), or None.
+     'meta' is returned as the dictionary it was saved as
+    '''
+    results_path = _GetMatchResultsPath(level_path, tile_layer_name, objects_layer_name)
+    if not results_path.exists(): return None
+    try:
+        with numpy.load(results_path, allow_pickle=False) as results_file:
+            match_results = {key: results_file[key] for key in results_file.files}
+        match_results['meta'] = json.loads(str(match_results['meta']))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        log.Extra(f'-- pattern_cache.py : unreadable match results for {level_path}, ignoring them')
+        return None
+    return match_results
+
+
+
+def SaveMatchResults(level_path, tile_layer_name, objects_layer_name, tiles_array, pattern_indices, match_xs, match_ys, meta):
+    '''
+     Stores the results of searching a level's tile layer, replacing the previous ones
+
+     :param tiles_array:     The tiles that were searched (2D numpy array), before any were zeroed out by the search
+     :param pattern_indices: Index of each match's pattern, in the order the patterns were loaded
+     :param match_xs:        x of each match's top-left tile (matches are in the same order as their objects)
+     :param match_ys:        y of each match's top-left tile
+     :param meta:            Dictionary of anything else, must be JSON serializable
+    '''
+    results_path = _GetMatchResultsPath(level_path, tile_layer_name, objects_layer_name)
+    try:
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_results_path = results_path.parent / (results_path.name + '.tmp')
+        with open(temp_results_path, 'wb') as results_file:
+            numpy.savez(results_file, tiles_array=tiles_array, pattern_indices=pattern_indices,
+                match_xs=match_xs, match_ys=match_ys, meta=numpy.array(json.dumps(meta)))
+        os.replace(temp_results_path, results_path)
+    except OSError as e:
+        log.Extra(f'-- pattern_cache.py : could not save match results : {e}')
+
+
+
+
+#--------------------------------------------------#
+'''Private Functions'''
+
+def _GetBundle():
+    '''Loads the bundle from disk on first use. Unreadable or outdated bundles are started over'''
+    global _bundle
+    if _bundle is not None: return _bundle
+
+    bundle_path = level_cache.GetCacheFolder() / BUNDLE_FILE_NAME
+    try:
+        with open(bundle_path, 'r') as bundle_file:
+            _bundle = json.load(bundle_file)
+    except (OSError, ValueError):
+        _bundle = None
+    if not isinstance(_bundle, dict) or _bundle.get('version') != BUNDLE_VERSION:
+        _bundle = {'version': BUNDLE_VERSION, 'patterns': {}}
+    return _bundle
+
+def _GetMatchResultsPath(level_path, tile_layer_name, objects_layer_name):
+    '''Named after the level & keyed by its full path, the tile layer & the objectgroup'''
+    full_path = os.path.abspath(level_path)
+    results_key = '\n'.join([full_path, tile_layer_name, objects_layer_name])
+    results_hash = hashlib.blake2b(results_key.encode('utf-8'), digest_size=8).hexdigest()
+    return level_cache.GetCacheFolder() / MATCHES_FOLDER_NAME / f'{file_utils.StripFilename(full_path)}-{results_hash}{MATCHES_EXTENSION}'
+
+def _HashFile(file_path):
+    with open(file_path, 'rb') as pattern_file:
+        return hashlib.blake2b(pattern_file.read(), digest_size=16).hexdigest()
+
+
+
+
+
+# end of file
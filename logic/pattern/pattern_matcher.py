@@ -9,26 +9,109 @@ USAGE EXAMPLE:
     pattern_matcher_bb = PM.PatternMatcher()
     pattern_matcher_bb.LoadPattern("breakable_blocks_pattern.xml")
     pattern_matcher_bb.FindAndCreate(playdo, "_BB_input", "collisions_BB_output", allow_overlap = False)
+    pattern_matcher_bb.LogMatchStats()     # How long each pattern took & how often it matched, per tile layer
     
 '''
 
 import os
+import time
 import toml
-import xml.etree.ElementTree as ET
+import numpy
+import hashlib
+import logic.common.xml_backend as xml_backend
 import logic.common.log_utils as log
 import logic.common.file_utils as file_utils
 import logic.common.tiled_utils as tiled_utils
+import logic.common.level_playdo as play
+import logic.pattern.pattern_cache as pattern_cache
+import logic.pattern.pattern_permuter as pattern_permuter
+
+
+#--------------------------------------------------#
+'''Variables'''
+
+MAX_INCREMENTAL_CHANGE = 0.25   # An incremental FindAndCreate searches everything again past this fraction of changed tiles
+MAX_DIGESTED_OBJECTS = 1024     # How many objects (evenly spread) are looked at to tell if an objectgroup was edited
+
+_NO_KEYS = numpy.zeros(0, dtype=numpy.int64)
+
 
 
 #--------------------------------------------------#
 '''Class Initialization'''
 
+class _CompiledPattern():
+    '''A pattern's tiles, prepared once for searching: the offsets & tile IDs of its non-empty tiles'''
+
+    def __init__(self, tiles2d):
+        self.tiles_array = numpy.asarray(tiles2d, dtype=numpy.uint32)
+        self.height, self.width = self.tiles_array.shape
+        self.dys, self.dxs = numpy.nonzero(self.tiles_array)    # Empty tiles (0) match anything, so they're left out
+        self.tile_ids = self.tiles_array[self.dys, self.dxs]
+
+
+
+class _MatchStats():
+    '''What the searches for one pattern in one tile layer did & how long they took, summed over every search'''
+
+    def __init__(self):
+        self.searches = 0
+        self.windows = 0                # Locations the pattern fits at, i.e. what testing every location would test
+        self.candidates = 0             # Locations actually tested, after the prefilters
+        self.prefilter_rejections = 0   # Searches skipped outright, as a tile of the pattern wasn't in the layer
+        self.matches = 0
+        self.objects = 0
+        self.seconds = 0.0
+
+
+
+class _ObjectTemplate():
+    '''A pattern object, prepared once for copying: the object without its tail & its position within the pattern'''
+
+    def __init__(self, pattern_obj):
+        self.element = xml_backend.CloneElement(pattern_obj, with_tail=False)
+        self.x = float(pattern_obj.get('x'))
+        self.y = float(pattern_obj.get('y'))
+
+    def Instantiate(self, x, y, object_id = None):
+        new_attributes = {'x': str(x), 'y': str(y)}
+        if object_id is not None: new_attributes['id'] = str(object_id)
+        return xml_backend.CloneWithAttributes(self.element, new_attributes)
+
+
+
+class _TileIndex():
+    '''The positions of every tile ID within a tile layer, built in a single pass over the layer'''
+
+    def __init__(self, tiles_array):
+        self.width = tiles_array.shape[1]
+        flat_tiles = tiles_array.ravel()
+        # A stable sort keeps the positions of each tile ID in order, top-to-bottom then left-to-right
+        self._positions = numpy.argsort(flat_tiles, kind='stable')
+        tile_ids, starts, counts = numpy.unique(flat_tiles[self._positions], return_index=True, return_counts=True)
+        self._ranges = {tile_id: (start, start + count) for tile_id, start, count in zip(tile_ids.tolist(), starts.tolist(), counts.tolist())}
+
+    def GetCount(self, tile_id):
+        start, end = self._ranges.get(tile_id, (0, 0))
+        return end - start
+
+    def GetPositions(self, tile_id):
+        '''Returns the (ys, xs) of each tile with the ID, sorted top-to-bottom then left-to-right'''
+        start, end = self._ranges.get(tile_id, (0, 0))
+        flat_positions = self._positions[start:end]
+        return flat_positions // self.width, flat_positions % self.width
+
+
+
 class PatternMatcher():
     '''The convenience class to aid performing operations upon a TILED level XML file'''
 
     def __init__(self):
         self.pattern_tiles = {} # maps a pattern_name to a 2D list of ints (tile_ids)
         self.pattern_objects = {} # maps a pattern_name to a tuple (object_to_copy, x_offset, y_offset)
+        self._compiled_patterns = {} # maps a pattern_name to a _CompiledPattern
+        self._object_templates = {} # maps a pattern_name to a list of _ObjectTemplate
+        self._match_stats = {} # maps a tile_layer_name to a dict mapping each pattern_name to its _MatchStats
         log.Info(f"-- pattern_matcher.py : initialized ...")
 
 
@@ -36,49 +119,70 @@ class PatternMatcher():
 #--------------------------------------------------#
     '''Public Functions'''
 
-    def FindAndCreate(self, playdo, tile_layer_name, objects_layer_to_create, allow_overlap = True, discard_old = True):
-        '''<FILL IN DESCRIPTION>'''
+    def FindAndCreate(self, playdo, tile_layer_name, objects_layer_to_create, allow_overlap = True, discard_old = True,
+            assign_ids = False, incremental = False):
+        '''
+         Searches the tile layer for all loaded patterns, & adds a copy of the pattern's objects for each match found.
+         When assign_ids is set, the copies get unique ids from the map's nextobjectid instead of the pattern's own ids
+
+         With incremental (& discard_old), the tiles searched & the matches found are kept in the cache folder. The
+         next run then only searches again around the tiles that changed since, & only replaces the objects of
+         matches that changed. The result is the same as a full search, except that objects of unchanged matches are
+         kept as they were (along with any edits made to them). Whenever the previous results can't be used, e.g.
+         the patterns or the objectgroup changed in the meantime, a full search is made instead
+        '''
         
         # Get the target tile layer that will be searched for pattern matches
         target_tiles2d = playdo.GetTiles2d(tile_layer_name)
         if target_tiles2d is None:
             return
-        # Get a HASH of the target tile layer for quick checking
-        target_tiles_hash = playdo.GetTilesHashSet(tile_layer_name)
+        
+        incremental = incremental and discard_old
+        if incremental:
+            target_array = numpy.array(target_tiles2d, dtype=numpy.uint32)  # A copy, as the search zeroes out tiles
+            if self._FindAndCreateIncrementally(playdo, tile_layer_name, target_tiles2d, target_array, objects_layer_to_create, allow_overlap, assign_ids):
+                return
 
         # Get the object group to append to
         objects_group = playdo.GetObjectGroup(objects_layer_to_create, discard_old)
         total_matched_patterns = 0
 
-        for pattern_name, query_tiles2d in self.pattern_tiles.items():
-            object_group_to_copy, rows_trimmed, cols_trimmed  = self.pattern_objects[pattern_name]
+        # Search for all patterns at once
+        layer_stats = self._GetLayerStats(tile_layer_name)
+        all_locations = self._FindAllPatternsInTileMap(target_tiles2d, allow_overlap, layer_stats)
 
-            # If a quick hash check fails, skip the more expensive pattern match search
-            if not self._Possibility4MatchExists(target_tiles_hash, query_tiles2d):
-                continue
+        # Reserve the ids of all objects about to be created up front
+        object_ids = None
+        if assign_ids:
+            num_new_objects = sum(len(locations) * len(self._object_templates[pattern_name]) for pattern_name, locations in all_locations.items())
+            object_ids = iter(playdo.ReserveObjectIds(num_new_objects))
 
-            # Search for patterns
-            locations_to_add = self._FindPatternInTileMap(target_tiles2d, query_tiles2d, allow_overlap)
+        new_objects = []
+        for pattern_name, locations_to_add in all_locations.items():
             total_matched_patterns += len(locations_to_add)
             log.Info(f"-- pattern_matcher.py : {pattern_name} found {len(locations_to_add)} matches!")
 
-            # Create and append object(s) for each pattern match
-            for location in locations_to_add:
-                for pattern_obj in object_group_to_copy:
-                    offset_x = float(pattern_obj.get('x')) - cols_trimmed * playdo.tile_height
-                    offset_y = float(pattern_obj.get('y')) - rows_trimmed * playdo.tile_width
-                    object_copy = ET.fromstring(ET.tostring(pattern_obj))
-                    object_copy.set('x', str(location[0] * playdo.tile_width + offset_x))
-                    object_copy.set('y', str(location[1] * playdo.tile_height + offset_y))
-                    objects_group.append(object_copy)
-
+            # Create object(s) for each pattern match
+            start_time = time.perf_counter()
+            pattern_objects = self._CreateObjects(playdo, pattern_name, locations_to_add, object_ids)
+            new_objects += pattern_objects
+            layer_stats[pattern_name].objects += len(pattern_objects)
+            layer_stats[pattern_name].seconds += time.perf_counter() - start_time
+
+        playdo.AppendObjects(objects_group, new_objects)
+        if incremental:
+            match_keys_by_name = {pattern_name: numpy.zeros(0, dtype=numpy.int64) for pattern_name in self._compiled_patterns}
+            tilemap_width = target_array.shape[1]
+            for pattern_name, locations in all_locations.items():
+                match_keys_by_name[pattern_name] = numpy.array([y * tilemap_width + x for x, y in locations], dtype=numpy.int64)
+            self._SaveMatchResults(playdo, tile_layer_name, objects_layer_to_create, allow_overlap, assign_ids, target_array, match_keys_by_name, new_objects)
         
         # Raise an error if there are no matched patterns
         # 2026-06-01: Commented out below 2 lines of code since they cause cli_natty tool to trip up. Need further investigation
         #if total_matched_patterns == 0:
         #    raise Exception(f"No matching patterns possible because {tile_layer_name} layer was empty")
     
-    def FindAndCreateAll(self, playdo, objects_layer_to_create, allow_overlap = True):
+    def FindAndCreateAll(self, playdo, objects_layer_to_create, allow_overlap = True, assign_ids = False):
         '''Performs FindAndCreateon all ALL "visible" tile layers (layers starting with "bg_" or "fg_")'''
         tile_layers_to_search = []
         for layer in playdo.level_root.findall('layer'):
@@ -90,68 +194,308 @@ class PatternMatcher():
             return
             
         # Perform FindAndCreate on the first name in the list. When we do, discard all the contents of the old layer
-        self.FindAndCreate(playdo, tile_layers_to_search[0], objects_layer_to_create, allow_overlap = True, discard_old = True)
+        self.FindAndCreate(playdo, tile_layers_to_search[0], objects_layer_to_create, allow_overlap = True, discard_old = True, assign_ids = assign_ids)
         
         # Perform FindAndCreate on the rest of the list. This time, do NOT discard the contents
         for  layer_name in tile_layers_to_search[1:]:
-            self.FindAndCreate(playdo, layer_name, objects_layer_to_create, allow_overlap = True, discard_old = False)
+            self.FindAndCreate(playdo, layer_name, objects_layer_to_create, allow_overlap = True, discard_old = False, assign_ids = assign_ids)
+
+    def GetMatchStats(self):
+        '''
+         Returns what every FindAndCreate so far did, as a list of dictionaries (one per tile layer & pattern, in the
+         order they were searched) of 'tile_layer', 'pattern', 'searches', 'windows', 'candidates',
+         'prefilter_rejections', 'matches', 'objects' & 'seconds'. Windows are the locations a pattern fits at,
+         candidates the ones left to test after the prefilters. Seconds include creating the pattern's objects
+        '''
+        match_stats = []
+        for tile_layer_name, layer_stats in self._match_stats.items():
+            for pattern_name, pattern_stats in layer_stats.items():
+                match_stats.append({'tile_layer': tile_layer_name, 'pattern': pattern_name, **vars(pattern_stats)})
+        return match_stats
+
+    def LogMatchStats(self):
+        '''Logs GetMatchStats() as a table, slowest first, followed by the patterns that never matched anything'''
+        match_stats = self.GetMatchStats()
+        if not match_stats: return
+        log.Must(f"-- pattern_matcher.py : match stats of {len(self._compiled_patterns)} patterns")
+        log.Must(f"   {'seconds':>8} {'windows':>10} {'candidates':>10} {'rejected':>8} {'matches':>8} {'objects':>8}  tile layer / pattern")
+        for row in sorted(match_stats, key=lambda row: row['seconds'], reverse=True):
+            log.Must(f"   {row['seconds']:>8.3f} {row['windows']:>10} {row['candidates']:>10} {row['prefilter_rejections']:>8} " +
+                f"{row['matches']:>8} {row['objects']:>8}  {row['tile_layer']} / {row['pattern']}")
+
+        matched_patterns = {row['pattern'] for row in match_stats if row['matches'] > 0}
+        unmatched_patterns = [pattern_name for pattern_name in self._compiled_patterns if pattern_name not in matched_patterns]
+        if unmatched_patterns:
+            log.Must(f"   {len(unmatched_patterns)} patterns never matched : {', '.join(unmatched_patterns)}")
 
 
 
 #--------------------------------------------------#
-    '''Search?'''
+    '''Incremental Search'''
+
+    def _FindAndCreateIncrementally(self, playdo, tile_layer_name, target_tiles2d, target_array, objects_layer_to_create, allow_overlap, assign_ids):
+        '''
+         Does FindAndCreate by updating the results saved by its previous run. Returns False without having changed
+         anything when those results can't be used, in which case a full search is needed.
 
-    def _Possibility4MatchExists(self, tiles2d_hash, tiles2d_query):
-        '''Quick checks tiles2d_query contents vs a hash of the tilemap being searched to ensure the possibility for
-        a match exists. If there is no chance, we escape the more expensive future _FindPatternInTileMap call'''
-        for tile_row in tiles2d_query:
-            for tile_id in tile_row:
-                if tile_id not in tiles2d_hash:
-                    return False
+         Matches are keyed by their top-left tile (y * width + x). A location can only match differently than before
+         if its window overlaps a changed tile. Without overlap, a location also depends on the matches taken before
+         it (earlier patterns, or earlier locations of the same pattern). So whenever a match is added or removed,
+         its tiles count as changed for everything searched after it. Everything else keeps its previous result
+        '''
+        match_results = pattern_cache.LoadMatchResults(playdo.full_file_name, tile_layer_name, objects_layer_to_create)
+        if match_results is None: return False
+        meta = match_results['meta']
+        if meta.get('signature') != self._GetMatchSignature(playdo, allow_overlap, assign_ids): return False
+        old_tiles_array = match_results['tiles_array']
+        if old_tiles_array.shape != target_array.shape: return False
+
+        # Patterns with empty tiles are skipped when the tilemap has none (see _FindAllPatternsInTileMap), so that
+        # must be the same as before. Patterns too big for the tilemap are left to the full search to complain about
+        tilemap_height, tilemap_width = target_array.shape
+        has_empty_tiles = not target_array.all()
+        if meta.get('has_empty_tiles') != has_empty_tiles: return False
+        for compiled_pattern in self._compiled_patterns.values():
+            if compiled_pattern.width > tilemap_width or compiled_pattern.height > tilemap_height: return False
+
+        # The objectgroup must still hold the objects of the previous run, one template's worth per match in order
+        objects_group = playdo.GetObjectGroup(objects_layer_to_create, discard_old = False, create_new = False)
+        if objects_group is None: return False
+        old_objects = objects_group.findall('object')
+        if len(old_objects) != meta.get('num_objects') or _DigestObjectPositions(old_objects) != meta.get('objects_digest'): return False
+        if old_objects and objects_group[-1] is not old_objects[-1]: return False
+
+        changed_cells = numpy.flatnonzero(target_array != old_tiles_array)
+        if len(changed_cells) > target_array.size * MAX_INCREMENTAL_CHANGE: return False
+        log.Extra(f"-- pattern_matcher.py : {len(changed_cells)} tiles of {tile_layer_name} changed since the last search")
+        layer_stats = self._GetLayerStats(tile_layer_name)
+
+        # The previous matches of each pattern, as sorted keys. Matches are saved pattern by pattern
+        pattern_names = list(self._compiled_patterns)
+        old_match_keys = match_results['match_ys'].astype(numpy.int64) * tilemap_width + match_results['match_xs']
+        pattern_bounds = numpy.searchsorted(match_results['pattern_indices'], numpy.arange(len(pattern_names) + 1))
+        old_keys_by_name = {}
+        for num, pattern_name in enumerate(pattern_names):
+            old_keys_by_name[pattern_name] = old_match_keys[pattern_bounds[num]:pattern_bounds[num + 1]]
+
+        # Which pattern took each tile (-1 for none), as of the previous run. Updated as each pattern is redone
+        tile_owners = None
+        if not allow_overlap:
+            tile_owners = numpy.full(target_array.size, -1, dtype=numpy.int32)
+            for num, pattern_name in enumerate(pattern_names):
+                cell_offsets = _GetCellOffsets(self._compiled_patterns[pattern_name], tilemap_width)
+                tile_owners[_GetMatchCells(old_keys_by_name[pattern_name], cell_offsets)] = num
+
+        # Each pattern's changes, as the indices of its removed matches (within its old keys) & its added keys
+        changes_by_name = {}
+        for num, pattern_name in enumerate(pattern_names):
+            compiled_pattern = self._compiled_patterns[pattern_name]
+            pattern_stats = layer_stats[pattern_name]
+            pattern_stats.searches += 1
+            pattern_stats.windows += (tilemap_height - compiled_pattern.height + 1) * (tilemap_width - compiled_pattern.width + 1)
+            if not has_empty_tiles and len(compiled_pattern.tile_ids) < compiled_pattern.tiles_array.size:
+                pattern_stats.prefilter_rejections += 1
+                continue    # Skipped this time as well, so there are no matches to change
+            start_time = time.perf_counter()
+            removed_nums, added_keys, changed_cells, num_tested = _UpdateMatches(target_array, compiled_pattern, num,
+                old_keys_by_name[pattern_name], changed_cells, tile_owners)
+            pattern_stats.candidates += num_tested
+            pattern_stats.seconds += time.perf_counter() - start_time
+            if len(removed_nums) > 0 or len(added_keys) > 0: changes_by_name[pattern_name] = (removed_nums, added_keys)
+
+        # Reserve the ids of all objects about to be created up front
+        object_ids = None
+        if assign_ids:
+            num_new_objects = sum(len(added_keys) * len(self._object_templates[pattern_name])
+                for pattern_name, (_, added_keys) in changes_by_name.items())
+            object_ids = iter(playdo.ReserveObjectIds(num_new_objects))
+
+        # Keep the objects of unchanged matches. Objects of removed matches are cut out, those of added matches are
+        # inserted before the first previous match that comes after them. Splices are keyed by their start
+        object_splices = {}
+        num_objects_before = 0
+        new_keys_by_name = {}
+        for pattern_name in pattern_names:
+            old_keys = old_keys_by_name[pattern_name]
+            num_templates = len(self._object_templates[pattern_name])
+            removed_nums, added_keys = changes_by_name.get(pattern_name, (_NO_KEYS, _NO_KEYS))
+            new_keys = numpy.delete(old_keys, removed_nums)
+            new_keys = numpy.insert(new_keys, numpy.searchsorted(new_keys, added_keys), added_keys)
+            new_keys_by_name[pattern_name] = new_keys
+            layer_stats[pattern_name].matches += len(new_keys)
+            if len(new_keys) > 0: log.Info(f"-- pattern_matcher.py : {pattern_name} found {len(new_keys)} matches!")
+
+            for old_num in removed_nums.tolist():
+                start = num_objects_before + old_num * num_templates
+                end, added_objects = object_splices.get(start, (start, []))
+                object_splices[start] = (start + num_templates, added_objects)
+            start_time = time.perf_counter()
+            for old_num, added_key in zip(numpy.searchsorted(old_keys, added_keys).tolist(), added_keys.tolist()):
+                start = num_objects_before + old_num * num_templates
+                end, added_objects = object_splices.get(start, (start, []))
+                location = (added_key % tilemap_width, added_key // tilemap_width)
+                object_splices[start] = (end, added_objects + self._CreateObjects(playdo, pattern_name, [location], object_ids))
+            num_objects_before += len(old_keys) * num_templates
+            layer_stats[pattern_name].objects += len(added_keys) * num_templates
+            layer_stats[pattern_name].seconds += time.perf_counter() - start_time
+
+        # Splicing from the back keeps the positions of the splices before valid
+        for start in sorted(object_splices, reverse=True):
+            end, added_objects = object_splices[start]
+            playdo.SpliceObjects(objects_group, old_objects, start, end, added_objects)
+        log.Extra(f"-- pattern_matcher.py : matches of {len(changes_by_name)} patterns changed, the rest were kept")
+
+        # Same as the full search, the matched tiles are zeroed out
+        if not allow_overlap: _ZeroOutUsedTiles(target_tiles2d, (tile_owners >= 0).reshape(target_array.shape))
+        self._SaveMatchResults(playdo, tile_layer_name, objects_layer_to_create, allow_overlap, assign_ids, target_array,
+            new_keys_by_name, objects_group.findall('object'))
         return True
 
+    def _SaveMatchResults(self, playdo, tile_layer_name, objects_layer_to_create, allow_overlap, assign_ids, target_array, match_keys_by_name, new_objects):
+        '''Saves what the next incremental FindAndCreate needs. match_keys_by_name holds each pattern's sorted match keys'''
+        pattern_indices = numpy.concatenate([numpy.full(len(match_keys), num, dtype=numpy.int32)
+            for num, match_keys in enumerate(match_keys_by_name.values())] + [numpy.zeros(0, dtype=numpy.int32)])
+        match_keys = numpy.concatenate(list(match_keys_by_name.values()) + [numpy.zeros(0, dtype=numpy.int64)])
+        meta = {
+            'signature': self._GetMatchSignature(playdo, allow_overlap, assign_ids),
+            'has_empty_tiles': not target_array.all(),
+            'num_objects': len(new_objects),
+            'objects_digest': _DigestObjectPositions(new_objects),
+        }
+        pattern_cache.SaveMatchResults(playdo.full_file_name, tile_layer_name, objects_layer_to_create, target_array,
+            pattern_indices, match_keys % target_array.shape[1], match_keys // target_array.shape[1], meta)
+
+    def _GetMatchSignature(self, playdo, allow_overlap, assign_ids):
+        '''A digest of everything besides the tiles that the matches & their objects depend on'''
+        signature = hashlib.blake2b(digest_size=16)
+        signature.update(repr((allow_overlap, assign_ids, playdo.tile_width, playdo.tile_height, xml_backend.BACKEND_NAME)).encode('utf-8'))
+        for pattern_name, compiled_pattern in self._compiled_patterns.items():
+            _, rows_trimmed, cols_trimmed = self.pattern_objects[pattern_name]
+            signature.update(repr((pattern_name, compiled_pattern.tiles_array.shape, rows_trimmed, cols_trimmed)).encode('utf-8'))
+            signature.update(compiled_pattern.tiles_array.tobytes())
+            for object_template in self._object_templates[pattern_name]:
+                signature.update(xml_backend.ET.tostring(object_template.element))
+        return signature.hexdigest()
+
+    def _GetLayerStats(self, tile_layer_name):
+        '''Returns the dictionary of each pattern's _MatchStats for the tile layer, to be added to'''
+        layer_stats = self._match_stats.setdefault(tile_layer_name, {})
+        for pattern_name in self._compiled_patterns:
+            if pattern_name not in layer_stats: layer_stats[pattern_name] = _MatchStats()
+        return layer_stats
+
+    def _CreateObjects(self, playdo, pattern_name, locations, object_ids = None):
+        '''Returns copies of the pattern's objects for each of the (x, y) locations, ids taken from object_ids if given'''
+        _, rows_trimmed, cols_trimmed = self.pattern_objects[pattern_name]
+
+        # The offset of each object from a match's top-left tile is the same for every match
+        placed_templates = []
+        for object_template in self._object_templates[pattern_name]:
+            offset_x = object_template.x - cols_trimmed * playdo.tile_height
+            offset_y = object_template.y - rows_trimmed * playdo.tile_width
+            placed_templates.append((object_template, offset_x, offset_y))
+
+        new_objects = []
+        for location in locations:
+            for object_template, offset_x, offset_y in placed_templates:
+                new_objects.append(object_template.Instantiate(
+                    location[0] * playdo.tile_width + offset_x,
+                    location[1] * playdo.tile_height + offset_y,
+                    None if object_ids is None else next(object_ids)))
+        return new_objects
+
+
+
+#--------------------------------------------------#
+    '''Search?'''
+
+    def _FindAllPatternsInTileMap(self, tiles2d_to_search, allow_overlap, layer_stats):
+        '''Searches a tiles2d tilemap for all loaded patterns in a single pass, instead of a pass per pattern.
+
+        :param tiles2d_to_search: 2d array of tile IDs (represents a tilemap layer). We will search it for matches
+        :param layer_stats: dictionary mapping each pattern_name to the _MatchStats that the search is added to
+        :return: A dictionary mapping each pattern_name (in the order they were loaded) that was possibly in the
+            tilemap to its list of (x, y) matches, same as _FindPatternInTileMap would have found one after another
+
+        The tilemap is indexed once by tile ID. Each pattern is then anchored on its tile that is the rarest in
+        the tilemap, and only the few locations of that tile are checked against the rest of the pattern. So
+        the cost hardly grows with the number of patterns, & patterns with a tile missing from the tilemap are
+        skipped at no cost
+        '''
+        target_array = numpy.asarray(tiles2d_to_search, dtype=numpy.uint32)
+        tilemap_height, tilemap_width = target_array.shape
+        tile_index = _TileIndex(target_array)
+
+        all_locations = {}
+        is_used = numpy.zeros((tilemap_height, tilemap_width), dtype=bool)
+        for pattern_name, compiled_pattern in self._compiled_patterns.items():
+            start_time = time.perf_counter()
+            pattern_stats = layer_stats[pattern_name]
+            pattern_stats.searches += 1
+            pattern_stats.windows += max(0, tilemap_height - compiled_pattern.height + 1) * max(0, tilemap_width - compiled_pattern.width + 1)
+
+            # Quick check that each of the pattern's tiles (empty ones included) is in the tilemap, otherwise there's
+            # no chance for a match
+            tile_counts = [tile_index.GetCount(tile_id) for tile_id in compiled_pattern.tile_ids.tolist()]
+            if 0 in tile_counts or (len(compiled_pattern.tile_ids) < compiled_pattern.tiles_array.size and tile_index.GetCount(0) == 0):
+                pattern_stats.prefilter_rejections += 1
+                pattern_stats.seconds += time.perf_counter() - start_time
+                continue
+
+            if compiled_pattern.width > tilemap_width or compiled_pattern.height > tilemap_height:
+                raise Exception("-- pattern_matcher.py : _FindAllPatternsInTileMap() " + 
+                    "Error! Query is bigger than tilemap!")
+
+            candidate_ys, candidate_xs, num_tested = _FindCandidates(target_array, compiled_pattern, tile_index, tile_counts)
+            if allow_overlap:
+                all_locations[pattern_name] = list(zip(candidate_xs.tolist(), candidate_ys.tolist()))
+            else:
+                all_locations[pattern_name] = _TakeMatchesInOrder(candidate_ys, candidate_xs, compiled_pattern, is_used)
+            pattern_stats.candidates += num_tested
+            pattern_stats.matches += len(all_locations[pattern_name])
+            pattern_stats.seconds += time.perf_counter() - start_time
+
+        if not allow_overlap: _ZeroOutUsedTiles(tiles2d_to_search, is_used)
+        return all_locations
+
     def _FindPatternInTileMap(self, tiles2d_to_search, tiles2d_query, allow_overlap):
         '''Searches a tiles2d tilemap for a specific pattern.
 
         :param tiles2d_to_search: 2d array of tile IDs (represents a tilemap layer). We will search it for matches
         :param tiles2d_query: smaller 2d array of tile IDs (represents pattern we'll be searching for)
         :return: A list of (x, y) tuples where the top-left corner of the pattern was found.
+
+        Empty tiles (0) of the query match anything. If overlapping matches are not allowed, matches are taken
+        left-to-right, top-to-bottom & the tiles they matched are zeroed out in tiles2d_to_search, so that later
+        matches (and later patterns searched in the same tiles2d) can't reuse them
         '''
-        # Calculate the dimensions of the tilemap and the tiles2d_query pattern.
-        tilemap_height = len(tiles2d_to_search)
-        tilemap_width = len(tiles2d_to_search[0])
-        query_height = len(tiles2d_query)
-        query_width = len(tiles2d_query[0])
+        # Both lists of lists & numpy arrays are searched as arrays. Arrays are zeroed out in place
+        target_array = numpy.asarray(tiles2d_to_search, dtype=numpy.uint32)
+        query_array = numpy.asarray(tiles2d_query, dtype=numpy.uint32)
+        tilemap_height, tilemap_width = target_array.shape
+        query_height, query_width = query_array.shape
 
         # Ensure the tiles2d_query can fit within the tilemap.
         if query_width > tilemap_width or query_height > tilemap_height:
             raise Exception("-- pattern_matcher.py : _FindPatternInTileMap() " + 
                 "Error! Query is bigger than tilemap!")
 
-        # Helper Fn to check if the query matches the tilemap at a specific location.
-        def is_match(x, y):
-            for dy in range(query_height):
-                for dx in range(query_width):
-                    if tiles2d_query[dy][dx] == 0:
-                        continue
-                    if tiles2d_to_search[y + dy][x + dx] != tiles2d_query[dy][dx]:
-                        return False
-                        
-            # If overlapping matches are not allowed, Zero OUT searched tiles on match
-            if not allow_overlap:
-                for dy in range(query_height):
-                    for dx in range(query_width):
-                        if tiles2d_query[dy][dx] != 0:
-                            tiles2d_to_search[y + dy][x + dx] = 0 
-            return True
-
-        # Search for the tiles2d_query pattern in the tilemap.
-        matches = []
-        for y in range(tilemap_height - query_height + 1):
-            for x in range(tilemap_width - query_width + 1):
-                if is_match(x, y):
-                    matches.append((x, y))
-
+        # Find every candidate location at once, by comparing each non-empty query tile against the tilemap
+        # shifted by that tile's offset. Each comparison covers all (x, y) locations of the sliding window
+        compiled_query = _CompiledPattern(query_array)
+        num_rows = tilemap_height - query_height + 1
+        num_cols = tilemap_width - query_width + 1
+        is_candidate = numpy.ones((num_rows, num_cols), dtype=bool)
+        for dy, dx, tile_id in zip(compiled_query.dys.tolist(), compiled_query.dxs.tolist(), compiled_query.tile_ids.tolist()):
+            is_candidate &= target_array[dy:dy + num_rows, dx:dx + num_cols] == tile_id
+            if not is_candidate.any(): return []
+        candidate_ys, candidate_xs = numpy.nonzero(is_candidate)     # Sorted top-to-bottom, then left-to-right
+        if allow_overlap:
+            return list(zip(candidate_xs.tolist(), candidate_ys.tolist()))
+
+        is_used = numpy.zeros((tilemap_height, tilemap_width), dtype=bool)
+        matches = _TakeMatchesInOrder(candidate_ys, candidate_xs, compiled_query, is_used)
+        _ZeroOutUsedTiles(tiles2d_to_search, is_used)
         return matches
 
 
@@ -159,22 +503,75 @@ class PatternMatcher():
 #--------------------------------------------------#
     '''Pattern'''
 
-    def LoadPattern(self, pattern_file_path):
+    def LoadPattern(self, pattern_file_path, all_orientations = False):
         '''Load a 'pattern' to be searched for AND the objects to generate should a match be found.
            Underneath, a pattern is a tiles2d (aka 2D array of tile ids)
            
            The objects aren't created until pattern_matcher.FindAndCreate() is called.
-           ... <FILL IN>
+           Compiled patterns are kept on disk (see pattern_cache.py), so unchanged pattern files aren't parsed again.
+           To load several patterns, LoadLibrary() is preferred as the cache is then only saved once.
+           
+           With all_orientations, the 7 rotated & flipped variants of each tile layer are searched for as well,
+           same as if the pattern file had gone through cli_permutate.py (objects get 'angle' & 'flip_x' properties)
         '''
+        self._LoadPattern(pattern_file_path, all_orientations)
+        pattern_cache.SaveBundle()
+
+    def LoadLibrary(self, pattern_file_paths, all_orientations = False):
+        '''Same as calling LoadPattern() for each of the pattern files, in order'''
+        for pattern_file_path in pattern_file_paths:
+            self._LoadPattern(pattern_file_path, all_orientations)
+        pattern_cache.SaveBundle()
+
+    def _LoadPattern(self, pattern_file_path, all_orientations):
         if (not os.path.exists(pattern_file_path)):
             raise Exception(f"Pattern {pattern_file_path} was requested, but it does not exist!")
         
-        tree = ET.parse(pattern_file_path)
+        compiled_layers = pattern_cache.GetCompiledPattern(pattern_file_path)
+        if compiled_layers is None:
+            compiled_layers = self._CompilePattern(pattern_file_path)
+            pattern_cache.StoreCompiledPattern(pattern_file_path, compiled_layers)
+        else:
+            log.Extra("-- pattern_matcher.py : pattern " + pattern_file_path + " is unchanged, using its cached copy")
+        
+        for compiled_layer in compiled_layers:
+            tiles2d = compiled_layer['tiles2d']
+            rows_trimmed, cols_trimmed = compiled_layer['rows_trimmed'], compiled_layer['cols_trimmed']
+            matching_obj_group = xml_backend.ParseBytes(compiled_layer['objectgroup_xml'].encode('utf-8')).getroot()
+            key_name = file_utils.StripFilename(pattern_file_path) + '_' + compiled_layer['name']
+            self._AddPattern(key_name, tiles2d, matching_obj_group, rows_trimmed, cols_trimmed)
+            if not all_orientations: continue
+            
+            # The variants are made from the untrimmed layer, then trimmed on their own (as cli_permutate.py would)
+            untrimmed_array = numpy.zeros((compiled_layer['height'], compiled_layer['width']), dtype=numpy.uint32)
+            untrimmed_array[rows_trimmed:rows_trimmed + len(tiles2d), cols_trimmed:cols_trimmed + len(tiles2d[0])] = tiles2d
+            for variant_name, variant_array, variant_properties in pattern_permuter.GenerateOrientedVariants(untrimmed_array):
+                variant_tiles2d, variant_rows_trimmed, variant_cols_trimmed = tiled_utils.TrimTiles2d(variant_array.tolist())
+                variant_obj_group = xml_backend.CloneElement(matching_obj_group)
+                for obj in variant_obj_group.findall('object'):
+                    play.AddPropertiesToObject(obj, variant_properties)
+                self._AddPattern(key_name + '_' + variant_name, variant_tiles2d, variant_obj_group, variant_rows_trimmed, variant_cols_trimmed)
+
+    def _AddPattern(self, key_name, tiles2d, matching_obj_group, rows_trimmed, cols_trimmed):
+        '''Add tiles2d pattern & corresponding objects into internal structures for later matching'''
+        self.pattern_tiles[key_name] = tiles2d
+        self._compiled_patterns[key_name] = _CompiledPattern(tiles2d)
+        self.pattern_objects[key_name] = (matching_obj_group, rows_trimmed, cols_trimmed)
+        self._object_templates[key_name] = [_ObjectTemplate(pattern_obj) for pattern_obj in matching_obj_group]
+        
+        #log.Info("----------- pattern -----------")
+        #tiled_utils.PrintTiles2d(tiles2d, True)
+        log.Extra("-- pattern_matcher.py : LOADED pattern " + key_name + "...")
+
+    def _CompilePattern(self, pattern_file_path):
+        '''Parses & validates a pattern file, returning each tile layer's trimmed tiles2d & objectgroup (see pattern_cache.py)'''
+        tree = xml_backend.ParseFile(pattern_file_path)
         root = tree.getroot()
         
         # Check pattern file to ensure it's in the right format
         self._ValidatePattern(root, pattern_file_path)
         
+        compiled_layers = []
         for layer in root.findall('layer'):
             data = layer.find('data')
             pattern_width = int(root.get('width'))
@@ -189,14 +586,16 @@ class PatternMatcher():
                     matching_obj_group = object_group
                     break
             
-            # Add tiles2d pattern & corresponding objects into internal structures for later matching
-            key_name = file_utils.StripFilename(pattern_file_path) + '_' + tile_layer_name
-            self.pattern_tiles[key_name] = tiles2d
-            self.pattern_objects[key_name] = (matching_obj_group, rows_trimmed, cols_trimmed)
-            
-            #log.Info("----------- pattern -----------")
-            #tiled_utils.PrintTiles2d(tiles2d, True)
-            log.Extra("-- pattern_matcher.py : LOADED pattern " + key_name + "...")
+            compiled_layers.append({
+                'name': tile_layer_name,
+                'width': pattern_width,
+                'height': int(root.get('height')),
+                'tiles2d': [[int(tile_id) for tile_id in row] for row in tiles2d],
+                'rows_trimmed': rows_trimmed,
+                'cols_trimmed': cols_trimmed,
+                'objectgroup_xml': xml_backend.ET.tostring(xml_backend.CloneElement(matching_obj_group, with_tail=False), encoding='unicode'),
+            })
+        return compiled_layers
         
     def _ValidatePattern(self, pattern_root, pattern_file_name):
         ''' Check pattern file superficially to ensure they are properly formatted.
@@ -238,6 +637,181 @@ class PatternMatcher():
 
 
 #--------------------------------------------------#
+'''Search Helpers'''
+
+def _FindCandidates(target_array, compiled_pattern, tile_index, tile_counts):
+    '''
+     Returns the (ys, xs) of every location where compiled_pattern matches target_array, top-to-bottom then
+     left-to-right, & how many locations were tested. Only the locations of the pattern's rarest tile (per
+     tile_counts) are tested
+    '''
+    tilemap_height, tilemap_width = target_array.shape
+    if not tile_counts:
+        # A pattern of only empty tiles matches everywhere it fits
+        num_rows = tilemap_height - compiled_pattern.height + 1
+        num_cols = tilemap_width - compiled_pattern.width + 1
+        return numpy.repeat(numpy.arange(num_rows), num_cols), numpy.tile(numpy.arange(num_cols), num_rows), num_rows * num_cols
+    anchor = tile_counts.index(min(tile_counts))
+    anchor_dy = int(compiled_pattern.dys[anchor])
+    anchor_dx = int(compiled_pattern.dxs[anchor])
+
+    # Every location of the anchor tile gives one candidate top-left corner, as long as the pattern still fits there
+    anchor_ys, anchor_xs = tile_index.GetPositions(int(compiled_pattern.tile_ids[anchor]))
+    candidate_ys = anchor_ys - anchor_dy
+    candidate_xs = anchor_xs - anchor_dx
+    fits = (candidate_ys >= 0) & (candidate_ys <= tilemap_height - compiled_pattern.height) & \
+        (candidate_xs >= 0) & (candidate_xs <= tilemap_width - compiled_pattern.width)
+    candidate_ys = candidate_ys[fits]
+    candidate_xs = candidate_xs[fits]
+    num_tested = len(candidate_ys)
+
+    # Check the rest of the pattern's non-empty tiles at all candidates at once
+    for dy, dx, tile_id in zip(compiled_pattern.dys.tolist(), compiled_pattern.dxs.tolist(), compiled_pattern.tile_ids.tolist()):
+        if len(candidate_ys) == 0: break
+        is_match = target_array[candidate_ys + dy, candidate_xs + dx] == tile_id
+        candidate_ys = candidate_ys[is_match]
+        candidate_xs = candidate_xs[is_match]
+    return candidate_ys, candidate_xs, num_tested
+
+
+
+def _TakeMatchesInOrder(candidate_ys, candidate_xs, compiled_pattern, is_used):
+    '''
+     Walks the candidates in order, taking each one whose non-empty tiles weren't used by an earlier match yet &
+     marking them as used. Returns the list of (x, y) taken. Zeroing out a match only ever takes matches away,
+     so this is the same as searching the tilemap again after each match had its tiles zeroed out
+    '''
+    matches = []
+    for x, y in zip(candidate_xs.tolist(), candidate_ys.tolist()):
+        tile_ys = compiled_pattern.dys + y
+        tile_xs = compiled_pattern.dxs + x
+        if is_used[tile_ys, tile_xs].any(): continue
+        is_used[tile_ys, tile_xs] = True
+        matches.append((x, y))
+    return matches
+
+
+
+def _UpdateMatches(target_array, compiled_pattern, pattern_num, old_keys, changed_cells, tile_owners):
+    '''
+     Redoes the search of one pattern around the changed cells (flat indices), keeping its other previous matches.
+     Returns the indices (within old_keys) of the removed matches, the sorted keys of the added matches, the
+     changed cells grown by the tiles of both, & how many locations were tested. Without overlap (tile_owners given), tile_owners is updated with the
+     tiles the pattern now takes. Only the matches near the changed cells are looked at, never all of them
+    '''
+    tilemap_width = target_array.shape[1]
+    flat_target = target_array.ravel()
+    cell_offsets = _GetCellOffsets(compiled_pattern, tilemap_width)
+    num_tested = 0
+    while True:
+        # Only locations with a non-empty tile on a changed cell can match differently than before
+        affected_keys = _GetAffectedLocations(changed_cells, compiled_pattern, target_array.shape)
+        num_tested += len(affected_keys)
+        is_match = numpy.ones(len(affected_keys), dtype=bool)
+        for cell_offset, tile_id in zip(cell_offsets.tolist(), compiled_pattern.tile_ids.tolist()):
+            is_match &= flat_target[affected_keys + cell_offset] == tile_id
+        candidate_keys = affected_keys[is_match]
+        affected_nums = _FindSortedKeys(old_keys, affected_keys)
+        if tile_owners is None:
+            removed_nums = affected_nums[~numpy.isin(old_keys[affected_nums], candidate_keys)]
+            added_keys = numpy.setdiff1d(candidate_keys, old_keys[affected_nums])
+            return removed_nums, added_keys, changed_cells, num_tested
+
+        # A candidate may take the tiles of a previous match after it, so those are taken over again as well
+        near_keys = _GetAffectedLocations(_GetMatchCells(candidate_keys, cell_offsets), compiled_pattern, target_array.shape)
+        redone_nums = numpy.union1d(affected_nums, _FindSortedKeys(old_keys, near_keys))
+        redone_keys = old_keys[redone_nums]
+        pool_keys = numpy.union1d(numpy.setdiff1d(redone_keys, affected_keys), candidate_keys)
+        freed_cells = _GetMatchCells(redone_keys, cell_offsets)
+        taken_keys = _TakeKeysInOrder(pool_keys, cell_offsets, tile_owners, pattern_num, freed_cells)
+        removed_nums = redone_nums[~numpy.isin(redone_keys, taken_keys)]
+        added_keys = numpy.setdiff1d(taken_keys, redone_keys)
+
+        # Added or removed matches change what's searched after them, within this pattern too
+        changed_keys = numpy.concatenate([old_keys[removed_nums], added_keys])
+        grown_changed_cells = numpy.union1d(changed_cells, _GetMatchCells(changed_keys, cell_offsets))
+        if len(grown_changed_cells) > len(changed_cells):
+            changed_cells = grown_changed_cells
+            continue
+        freed_cells = freed_cells[tile_owners[freed_cells] == pattern_num]
+        tile_owners[freed_cells] = -1
+        tile_owners[_GetMatchCells(taken_keys, cell_offsets)] = pattern_num
+        return removed_nums, added_keys, changed_cells, num_tested
+
+
+
+def _TakeKeysInOrder(pool_keys, cell_offsets, tile_owners, pattern_num, freed_cells):
+    '''
+     Same as _TakeMatchesInOrder, for the match keys of one pattern. Tiles taken by earlier patterns block a match,
+     as do those still taken by this pattern's previous matches (other than the freed_cells)
+    '''
+    if len(pool_keys) == 0: return pool_keys
+    cells = pool_keys[:, None] + cell_offsets[None, :]
+    owners = tile_owners[cells]
+    is_blocked = ((owners >= 0) & (owners < pattern_num)) | ((owners == pattern_num) & ~numpy.isin(cells, freed_cells))
+    is_blocked = is_blocked.any(axis=1)
+
+    taken_keys = []
+    taken_cells = set()
+    for key, match_cells, blocked in zip(pool_keys.tolist(), cells.tolist(), is_blocked.tolist()):
+        if blocked or not taken_cells.isdisjoint(match_cells): continue
+        taken_cells.update(match_cells)
+        taken_keys.append(key)
+    return numpy.array(taken_keys, dtype=numpy.int64)
+
+
+
+def _GetAffectedLocations(cells, compiled_pattern, tilemap_shape):
+    '''Returns the sorted keys of every location where one of the pattern's non-empty tiles would lie on one of the cells'''
+    tilemap_height, tilemap_width = tilemap_shape
+    cell_ys, cell_xs = numpy.divmod(cells, tilemap_width)
+    location_ys = (cell_ys[:, None] - compiled_pattern.dys[None, :]).ravel()
+    location_xs = (cell_xs[:, None] - compiled_pattern.dxs[None, :]).ravel()
+    fits = (location_ys >= 0) & (location_ys <= tilemap_height - compiled_pattern.height) & \
+        (location_xs >= 0) & (location_xs <= tilemap_width - compiled_pattern.width)
+    return numpy.unique(location_ys[fits] * tilemap_width + location_xs[fits]).astype(numpy.int64)
+
+
+
+def _FindSortedKeys(sorted_keys, keys):
+    '''Returns the indices within sorted_keys of those keys found in it'''
+    nums = numpy.searchsorted(sorted_keys, keys)
+    is_found = nums < len(sorted_keys)
+    is_found[is_found] = sorted_keys[nums[is_found]] == keys[is_found]
+    return nums[is_found]
+
+
+
+def _GetCellOffsets(compiled_pattern, tilemap_width):
+    '''Returns where each of the pattern's non-empty tiles lies from its top-left tile, as flat index offsets'''
+    return compiled_pattern.dys.astype(numpy.int64) * tilemap_width + compiled_pattern.dxs
+
+
+
+def _GetMatchCells(match_keys, cell_offsets):
+    '''Returns the cells (flat indices) of the non-empty tiles of the matches'''
+    return (match_keys[:, None] + cell_offsets[None, :]).ravel()
+
+
+
+def _DigestObjectPositions(objects):
+    '''
+     A digest of where the objects are, used to tell if an objectgroup still holds the objects it was left with.
+     Along with the number of objects, a sample of them spread over the whole objectgroup is plenty for that
+    '''
+    sampled_objects = objects[::max(1, len(objects) // MAX_DIGESTED_OBJECTS)] + objects[-1:]
+    positions = '\n'.join(f"{obj.get('x')},{obj.get('y')}" for obj in sampled_objects)
+    return hashlib.blake2b(positions.encode('utf-8'), digest_size=16).hexdigest()
+
+
+
+def _ZeroOutUsedTiles(tiles2d, is_used):
+    '''Zero OUT the matched tiles of the searched tiles2d, either a list of lists or a numpy array'''
+    if isinstance(tiles2d, numpy.ndarray):
+        tiles2d[is_used] = 0
+    else:
+        for y, x in zip(*numpy.nonzero(is_used)):
+            tiles2d[y][x] = 0
 
 
 
@@ -1,7 +1,22 @@
 '''A convenience module that helps to auto-generate the 7 other tile and object layers as if
    the object was rotated and flipped manually
+
+   PatternMatcher.LoadPattern(..., all_orientations = True) searches for the same variants without
+   them being written into the pattern file
 '''
 import logic.common.tiled_utils as tiled_utils
+
+# Names of the 7 variants & the properties given to their objects, in the order _GenerateVariants() creates them
+VARIANT_NAMES = ["1f", "2", "2f", "3", "3f", "4", "4f"]
+VARIANT_PROPERTIES = [
+    {'flip_x': ''},                         # 1f
+    {'angle': '270'},                       # 2
+    {'angle': '90', 'flip_x': ''},          # 2f
+    {'angle': '180'},                       # 3
+    {'angle': '180', 'flip_x': ''},         # 3f
+    {'angle': '90'},                        # 4
+    {'angle': '270', 'flip_x': ''},         # 4f
+]
     
 def CreatePermutationsOfPattern(playdo):
     print("-- pattern_permuter.py")
@@ -14,25 +29,18 @@ def CreatePermutationsOfPattern(playdo):
     orig_object_group = playdo.GetObjectGroup(None, discard_old = False)
     
     # Create 7 copies of the tile layer and object group
-    tiles_2d_variants = _GenerateVariants(orig_tiles2d)
-    new_pattern_names = ["1f", "2", "2f", "3", "3f", "4", "4f"]
-    attrib_properties = [
-        {'flip_x': ''},                         # 1f
-        {'angle': '270'},                       # 2
-        {'angle': '90', 'flip_x': ''},          # 2f
-        {'angle': '180'},                       # 3
-        {'angle': '180', 'flip_x': ''},         # 3f
-        {'angle': '90'},                        # 4
-        {'angle': '270', 'flip_x': ''},         # 4f
-    ]
-    
-    for new_name, tiles_2d_var, obj_properties in zip(new_pattern_names, tiles_2d_variants, attrib_properties):
+    for new_name, tiles_2d_var, obj_properties in GenerateOrientedVariants(orig_tiles2d):
         encoded_data_str = tiled_utils.EncodeIntoZlibString64(tiles_2d_var)
         # TODO: Important to get the actual Tiled object ID? using '100' in the meanwhile
         playdo.AddNewTileLayer(new_name, encoded_data_str, '100')
         playdo.DuplicateObjectGroup(orig_object_group, new_name, obj_properties)
             
 
+def GenerateOrientedVariants(tiles_2d):
+    '''Returns the 7 other orientations of tiles_2d as a list of (variant name, 2D numpy array, properties for its objects)'''
+    return list(zip(VARIANT_NAMES, _GenerateVariants(tiles_2d), VARIANT_PROPERTIES))
+
+
 def _GetAnyTiles2d(playdo):
     '''Fetches the first tile layer. We do this since we expect there'd be just one tile layer'''
     all_tile_layer_names = playdo.GetAllTileLayerNames()
@@ -41,15 +49,16 @@ def _GetAnyTiles2d(playdo):
 
 
 def _GenerateVariants(tiles_2d):
+    # Variants are 2D numpy arrays, transformed as a whole rather than tile by tile
     variants = []
     # first append a flipped version of the original tiles_2d
-    variants.append(tiled_utils.FlipTiles2d(tiles_2d))
+    variants.append(tiled_utils.FlipArray2d(tiles_2d))
     # Next, Rotate 90, 180, 270 degrees. Append rotated and flipped-rotated variants
     rotated = tiles_2d
     for _ in range(3):
-        rotated = tiled_utils.RotateTiles2d(rotated)
+        rotated = tiled_utils.RotateArray2d(rotated)
         variants.append(rotated)
-        variants.append(tiled_utils.FlipTiles2d(rotated))
+        variants.append(tiled_utils.FlipArray2d(rotated))
 
     return variants
     
@@ -1,24 +1,56 @@
 '''A convenience module for reskinning levels'''
 import os
 import sys
-import copy
-import xml.etree.ElementTree as ET
+import numpy
+import logic.common.xml_backend as xml_backend
 import logic.common.tiled_utils as tiled_utils
 import logic.common.image_utils as image_utils
 import logic.common.file_utils as file_utils
 import logic.common.log_utils as log
 
+class _TileLookupTable():
+    '''
+     A tile ID to tile ID map laid out as arrays, so whole tile layers are remapped at once. There's a row for each
+     combination of the top 3 bits (flips & rotations), indexed by the tile ID without those bits
+    '''
+    def __init__(self, tile_to_tile_map):
+        tile_ids = numpy.fromiter(tile_to_tile_map.keys(), dtype=numpy.uint32, count=len(tile_to_tile_map))
+        new_tile_ids = numpy.fromiter(tile_to_tile_map.values(), dtype=numpy.uint32, count=len(tile_to_tile_map))
+        self.max_base_id = int((tile_ids & _BASE_ID_MASK).max()) if len(tile_ids) > 0 else 0
+        self.new_tile_ids = numpy.zeros((8, self.max_base_id + 1), dtype=numpy.uint32)
+        self.is_mapped = numpy.zeros((8, self.max_base_id + 1), dtype=bool)
+        self.new_tile_ids[tile_ids >> 29, tile_ids & _BASE_ID_MASK] = new_tile_ids
+        self.is_mapped[tile_ids >> 29, tile_ids & _BASE_ID_MASK] = True
+
+    def GetIndices(self, tiles_array):
+        '''Returns where each tile of tiles_array is looked up in the table. Tables of the same size share these'''
+        base_ids = tiles_array & _BASE_ID_MASK
+        return tiles_array >> 29, numpy.minimum(base_ids, self.max_base_id), base_ids <= self.max_base_id
+
+    def GetMappedTiles(self, indices):
+        '''Returns which tiles of tiles_array are in the map'''
+        top_bits, clipped_base_ids, is_in_range = indices
+        return self.is_mapped[top_bits, clipped_base_ids] & is_in_range
+
+    def Remap(self, tiles_array, indices, is_mapped):
+        '''Returns a copy of tiles_array with its mapped tiles replaced'''
+        top_bits, clipped_base_ids, _ = indices
+        return numpy.where(is_mapped, self.new_tile_ids[top_bits, clipped_base_ids], tiles_array)
+
+
+
 class TileRemapper():
     '''The convenience class to aid performing remap operations upon a TILED level XML file'''
     def __init__(self):
         self.A_to_B_map = {} # maps tile ID to another tile ID
         self.B_to_A_map = {} # maps tile ID to another tile ID (reversed direction)
+        self._lookup_tables = None # (A_to_B, B_to_A) as _TileLookupTable, built from the maps on the next Remap
         
     def LoadRemapXml(self, pattern_file_path, expand_map_bindings=True):
         """Create a mapping of old tile IDs to new tile IDs to rebind the tile IDs of one level"""
 
         # Extract XML root and validate pattern has correct format (2 tile layers)
-        xml_tree = ET.parse(pattern_file_path)
+        xml_tree = xml_backend.ParseFile(pattern_file_path)
         root = xml_tree.getroot()
         map_width = int(root.get('width'))
         self._ValidateRemapXml(root, pattern_file_path)
@@ -27,18 +59,14 @@ class TileRemapper():
         layer_A, layer_B = root.findall('layer')
         data_A = layer_A.find('data').text.strip()
         data_B = layer_B.find('data').text.strip()
-        tile_2d_map_A = tiled_utils.DecodeIntoTiles2d(data_A, map_width)
-        tile_2d_map_B = tiled_utils.DecodeIntoTiles2d(data_B, map_width)
+        tile_ids_A = tiled_utils.DecodeIntoArray2d(data_A, map_width).ravel().tolist()
+        tile_ids_B = tiled_utils.DecodeIntoArray2d(data_B, map_width).ravel().tolist()
+        self._lookup_tables = None
         
         # Populate the remapping dictionaries (2 are created to auto-detect ideal mapping direction)
-        rows = len(tile_2d_map_A)
-        cols = len(tile_2d_map_A[0])
-        for i in range(rows):
-            for j in range(cols):
-                tile_id_A = tile_2d_map_A[i][j]
-                tile_id_B = tile_2d_map_B[i][j]
-                self.A_to_B_map[tile_id_A] = tile_id_B
-                self.B_to_A_map[tile_id_B] = tile_id_A
+        # Tiles are added row by row, so a tile ID that appears more than once is mapped to its last counterpart
+        self.A_to_B_map.update(zip(tile_ids_A, tile_ids_B))
+        self.B_to_A_map.update(zip(tile_ids_B, tile_ids_A))
                 
         # Expand the remapping dictionary to include flips & rotations
         if expand_map_bindings:
@@ -46,42 +74,47 @@ class TileRemapper():
             _ExpandMapBindings(self.B_to_A_map)
     
     
-    def LoadMigrationMap(self, new_tiles_xml, tiles_png_path):
-        """Create a massive mapping of old tile IDs to new tile IDs to migrate the entire LEVELs folder"""
+    def LoadMigrationMap(self, new_tiles_xml, tiles_png_path, used_tile_ids = None):
+        """Create a massive mapping of old tile IDs to new tile IDs to migrate the entire LEVELs folder
+        
+           used_tile_ids: tile IDs (without flips & rotations) used by the levels, see tile_usage.GetUsedTileIds.
+                When given, forgotten tiles that no level uses are left out, as migrating them changes nothing
+        """
         
         # Extract XML root and validate new_tiles_xml has correct format (1 tile layer & correct size)
-        root = ET.parse(new_tiles_xml).getroot()
+        root = xml_backend.ParseFile(new_tiles_xml).getroot()
         self._ValidateMigrationXml(root, new_tiles_xml, tiles_png_path)
         
         # Get size info and tiles2d data
         map_width = int(root.get('width'))
         map_height = int(root.get('height'))
         tiles_data  = root.find('layer').find('data').text.strip()
-        tiles2d_map = tiled_utils.DecodeIntoTiles2d(tiles_data, map_width)
+        tile_ids_A = tiled_utils.DecodeIntoArray2d(tiles_data, map_width).ravel()
+        self._lookup_tables = None
         
         # Populate the remapping dictionary & track forgotten tiles that do not exist in new mapping
+        # Each cell's new tile ID is its position (counting from 1, row by row), the last one wins for repeated tiles
         max_num_tiles = map_width * map_height
-        unseen_tile_ids = {n for n in range(1, max_num_tiles + 1)}
-        tile_id_B = 1
-        for i in range(map_height):
-            for j in range(map_width):
-                tile_id_A = tiles2d_map[i][j]
-                self.A_to_B_map[tile_id_A] = tile_id_B
-                tile_id_B += 1
-                unseen_tile_ids.discard(tile_id_A)
+        self.A_to_B_map.update(zip(tile_ids_A.tolist(), range(1, len(tile_ids_A) + 1)))
+        unseen_tile_ids = numpy.setdiff1d(numpy.arange(1, max_num_tiles + 1, dtype=numpy.uint32), tile_ids_A)
+        if used_tile_ids is not None:
+            unseen_tile_ids = unseen_tile_ids[numpy.isin(unseen_tile_ids, used_tile_ids)]
+        unseen_tile_ids = unseen_tile_ids.tolist()
                 
         # Expand the remapping dictionary to include flips, rotations, and the zero case
         _ExpandMapBindings(self.A_to_B_map)
         self.A_to_B_map[0] = 0
         
-        # Prune forgotten tiles to only unique cases
-        unseen_tile_ids = self._PruneOutRedundantTiles(unseen_tile_ids, tiles_png_path)
+        # Prune forgotten tiles to only unique cases. The tilesheet is sliced once, for both pruning & the collage
+        tiles_array = image_utils.SliceTileSheetIntoArray(tiles_png_path) if unseen_tile_ids else None
+        unseen_tile_ids = self._PruneOutRedundantTiles(unseen_tile_ids, tiles_array)
         
         # If forgotten tiles still exist, display them for user convenience
         if unseen_tile_ids:
             # Create a list of tuples (tile_id, Image) - that is the format needed to display a collage
-            tiles_images = image_utils.SliceTileSheet(tiles_png_path)
-            unseen_tiles_n_images = [(tile_id, tiles_images[tile_id - 1]) for tile_id in unseen_tile_ids] 
+            # Only the forgotten tiles are made into images
+            unseen_tiles_n_images = [(tile_id, image_utils.NpArrayToImage(_GetTileFromSheet(tiles_array, tile_id)))
+                for tile_id in unseen_tile_ids]
             image_title = "- MIGRATION : FORGOTTEN TILES ? -"
             unmatched_png_path = file_utils.GetOutputFolder() + 'migration_forgotten.png'
             image_utils.CreateTilesCollage(image_title, unseen_tiles_n_images, unmatched_png_path)
@@ -89,9 +122,8 @@ class TileRemapper():
         return unseen_tile_ids
         
         
-    def _PruneOutRedundantTiles(self, unseen_tile_ids, tiles_png_path):
-        '''Takes set of tile_ids & tilesheet png path. Extracts image data to prune redundancies'''
-        tiles_np_array = image_utils.SliceTileSheet(tiles_png_path, make_into_np_array = True)
+    def _PruneOutRedundantTiles(self, unseen_tile_ids, tiles_array):
+        '''Takes list of tile_ids & the tilesheet sliced by SliceTileSheetIntoArray. Uses image data to prune redundancies'''
         unique_unseen_tiles_hash = set()
         unique_unseen_tile_ids = []
             
@@ -102,7 +134,7 @@ class TileRemapper():
             
             # Check 2 : Next, we get a hash of image referenced by the tile ID. If it truly
             # is unique, we add it to unseen_tile_ids, and update our hash check set
-            tile_hash = tiles_np_array[tile_id - 1].tobytes()            
+            tile_hash = _GetTileFromSheet(tiles_array, tile_id).tobytes()
             if tile_hash not in unique_unseen_tiles_hash:
                 unique_unseen_tile_ids.append(tile_id)
                 unique_unseen_tiles_hash.add(tile_hash)
@@ -117,6 +149,8 @@ class TileRemapper():
            force_A_to_B: If this is true, we won't do the tiles counting thing to see which
                 direction had more, we go A to B, where B (the tile layer above) is the one
                 we want to map too
+
+           Returns the number of tiles that were changed, across all tile layers
         '''
         
     
@@ -125,58 +159,76 @@ class TileRemapper():
         # TileRemapper contains 2 dicts to check which map (A_to_B or B_to_A) is more effective
         # However, when performing a large scale "tile migration", only the A_to_B map is used
         using_dual_maps = len(self.A_to_B_map) == len(self.B_to_A_map)
+
+        # Both maps are looked up as tables indexed by tile ID, built once & reused for every level remapped
+        self.PrepareLookupTables()
+        lookup_A_to_B, lookup_B_to_A = self._lookup_tables
         
+        # All layers are decoded up front & re-encoded at the end, each time all at once across a thread pool
+        decode_jobs = []
         for tile_layer in all_tile_layers:
             data_element = tile_layer.find('data')
-            encoding_used = data_element.get('encoding')
-            old_data = data_element.text.strip()
-
             # copied over layers from cli_pic now uses their own width and height, rather than the destination's dimension
-            layer_width  = int(tile_layer.get('width',  playdo.map_width))
-            layer_height = int(tile_layer.get('height', playdo.map_height))
-            tiles2d = tiled_utils.DecodeIntoTiles2d(old_data, layer_width, encoding_used)
+            layer_width = int(tile_layer.get('width', playdo.map_width))
+            decode_jobs.append((data_element.text.strip(), layer_width) + tiled_utils.GetDataCodec(data_element))
+        all_tiles_arrays = tiled_utils.DecodeManyIntoArray2d(decode_jobs)
+        
+        layers_to_encode = []   # (tile_layer, new tiles array) of each layer that was remapped, in document order
+        total_tiles_changed = 0
+        for tile_layer, tiles_array in zip(all_tile_layers, all_tiles_arrays):
+            indices_A_to_B = lookup_A_to_B.GetIndices(tiles_array)
 
             if not using_dual_maps:
                 # Performing Tile Migration
-
-                # now loops over layer_height and layer_width rather than playdo.map_width/playdo.map_height
-                for i in range(layer_height):
-                    for j in range(layer_width):
-                        if tiles2d[i][j] in self.A_to_B_map:
-                            tiles2d[i][j] = self.A_to_B_map[tiles2d[i][j]]
-                tile_layer.find('data').text = tiled_utils.EncodeToTiledFormat(tiles2d, encoding_used)
+                lookup, indices, is_mapped = lookup_A_to_B, indices_A_to_B, lookup_A_to_B.GetMappedTiles(indices_A_to_B)
                 
             else:
                 # Performing Tile Remap
-                
-                # First, make two copies of the tile layer being remapped
-                tiles2d_AB = copy.deepcopy(tiles2d)
-                tiles2d_BA = copy.deepcopy(tiles2d)
-                count_remapped_A_to_B = 0
-                count_remapped_B_to_A = 0
-                
-                # Subject both tile layer copies to remapping, one uses A_B mapping, the other B_A mapping
-                for i in range(layer_height):
-                    for j in range(layer_width):
-                        if tiles2d[i][j] in self.A_to_B_map:
-                            tiles2d_AB[i][j] = self.A_to_B_map[tiles2d[i][j]]
-                            count_remapped_A_to_B += 1
-                        if tiles2d[i][j] in self.B_to_A_map:
-                            tiles2d_BA[i][j] = self.B_to_A_map[tiles2d[i][j]]
-                            count_remapped_B_to_A += 1
+
+                # Count the tiles each mapping (A_B & B_A) would remap, then only remap with the one that had more
+                indices_B_to_A = indices_A_to_B
+                if lookup_B_to_A.max_base_id != lookup_A_to_B.max_base_id:
+                    indices_B_to_A = lookup_B_to_A.GetIndices(tiles_array)
+                is_mapped_A_to_B = lookup_A_to_B.GetMappedTiles(indices_A_to_B)
+                is_mapped_B_to_A = lookup_B_to_A.GetMappedTiles(indices_B_to_A)
+                count_remapped_A_to_B = int(numpy.count_nonzero(is_mapped_A_to_B))
+                count_remapped_B_to_A = int(numpy.count_nonzero(is_mapped_B_to_A))
                 
                 if force_A_to_B:
-                    count_remapped_A_to_B = sys.maxint
+                    count_remapped_A_to_B = sys.maxsize
                     
                 # Rewrite the original tile layer with the remapped data. We use whichever mapping had more matches
                 if count_remapped_A_to_B == 0 and count_remapped_B_to_A == 0:
                     continue
                 elif count_remapped_A_to_B > count_remapped_B_to_A:
-                    tile_layer.find('data').text = tiled_utils.EncodeToTiledFormat(tiles2d_AB, encoding_used)
-                    log.Info(f"-- tile_remapper.py : layer {tile_layer.get('name')} remapped {count_remapped_A_to_B} tiles!")
+                    lookup, indices, is_mapped, count_remapped = lookup_A_to_B, indices_A_to_B, is_mapped_A_to_B, count_remapped_A_to_B
                 else:
-                    tile_layer.find('data').text = tiled_utils.EncodeToTiledFormat(tiles2d_BA, encoding_used)
-                    log.Info(f"-- tile_remapper.py : layer {tile_layer.get('name')} remapped {count_remapped_B_to_A} tiles!")
+                    lookup, indices, is_mapped, count_remapped = lookup_B_to_A, indices_B_to_A, is_mapped_B_to_A, count_remapped_B_to_A
+            
+            # Layers left untouched (e.g. every tile mapped onto itself) keep their original data & are not re-encoded
+            new_tiles_array = lookup.Remap(tiles_array, indices, is_mapped)
+            num_tiles_changed = int(numpy.count_nonzero(new_tiles_array != tiles_array))
+            if num_tiles_changed == 0: continue
+            layers_to_encode.append((tile_layer, new_tiles_array))
+            total_tiles_changed += num_tiles_changed
+            if using_dual_maps:
+                log.Info(f"-- tile_remapper.py : layer {tile_layer.get('name')} remapped {count_remapped} tiles!")
+        
+        # Remapped layers keep the encoding & compression they already had
+        encode_jobs = [(tiles_array,) + tiled_utils.GetDataCodec(tile_layer.find('data')) + (None,) for tile_layer, tiles_array in layers_to_encode]
+        encoded_strs = tiled_utils.EncodeManyToTiledFormat(encode_jobs)
+        for (tile_layer, _), encoded_str in zip(layers_to_encode, encoded_strs):
+            tile_layer.find('data').text = encoded_str
+        return total_tiles_changed
+    
+    
+    def PrepareLookupTables(self):
+        '''
+         Builds the lookup tables Remap uses out of the loaded maps, if not built yet. Done before handing the
+         TileRemapper to other processes, so they don't each build the tables again
+        '''
+        if self._lookup_tables is None:
+            self._lookup_tables = (_TileLookupTable(self.A_to_B_map), _TileLookupTable(self.B_to_A_map))
     
     
     def _ValidateRemapXml(self, pattern_root, pattern_file_name):
@@ -222,18 +274,32 @@ class TileRemapper():
             sys.exit()
 
 
+# Tile IDs without their top 3 bits (flips & rotations)
+_BASE_ID_MASK = numpy.uint32(0x1FFFFFFF)
+
+
+def _GetTileFromSheet(tiles_array, tile_id):
+    '''Returns the pixels of a tile_id within a tilesheet sliced by image_utils.SliceTileSheetIntoArray'''
+    row, col = divmod(tile_id - 1, tiles_array.shape[1])
+    return tiles_array[row, col]
+
+
 def _ExpandMapBindings(tile_to_tile_map):
     '''Takes a tile_id to tile_id map & expands it to include the flipped & rotated permutations'''
-    tile_map_key_values = list(tile_to_tile_map.items())
-    for tile_id_A, tile_id_B in tile_map_key_values:
-        # Add the flipped entry
-        tile_to_tile_map[tiled_utils.FlipTileId(tile_id_A)] = tiled_utils.FlipTileId(tile_id_B)            
-        for _ in range(3):
-            # Rotate the Tile IDs & Add
-            tile_id_A = tiled_utils.RotateTileId(tile_id_A)
-            tile_id_B = tiled_utils.RotateTileId(tile_id_B)
-            tile_to_tile_map[tile_id_A] = tile_id_B
-            # Add the rotated entry again, but flipped
-            tile_to_tile_map[tiled_utils.FlipTileId(tile_id_A)] = tiled_utils.FlipTileId(tile_id_B)
+    tile_ids_A = numpy.fromiter(tile_to_tile_map.keys(), dtype=numpy.uint32, count=len(tile_to_tile_map))
+    tile_ids_B = numpy.fromiter(tile_to_tile_map.values(), dtype=numpy.uint32, count=len(tile_to_tile_map))
+
+    # Each entry gets its flipped entry, then 3 times its rotated entry followed by the rotated entry flipped.
+    # Entries are added in that order, entry after entry, so later ones overwrite earlier ones just like adding
+    # them one at a time would
+    new_ids_A = [tiled_utils.FlipTileIds(tile_ids_A)]
+    new_ids_B = [tiled_utils.FlipTileIds(tile_ids_B)]
+    for _ in range(3):
+        # Rotate the Tile IDs & Add
+        tile_ids_A = tiled_utils.RotateTileIds(tile_ids_A)
+        tile_ids_B = tiled_utils.RotateTileIds(tile_ids_B)
+        new_ids_A += [tile_ids_A, tiled_utils.FlipTileIds(tile_ids_A)]
+        new_ids_B += [tile_ids_B, tiled_utils.FlipTileIds(tile_ids_B)]
+    tile_to_tile_map.update(zip(numpy.stack(new_ids_A, axis=1).ravel().tolist(), numpy.stack(new_ids_B, axis=1).ravel().tolist()))
     # After 3 iterations, we have captured all 8 possible orientations of a tile
 
@@ -115,8 +115,7 @@ def _AddTilelayerBelowMeta(playdo, tile_layer_name, new_tiles2d):
     if tile_layer_to_rewrite is None:
         tile_layer_to_rewrite = playdo.AddNewTileLayer(tile_layer_name, "")
         insert_index = list(playdo.level_root).index( playdo.GetObjectGroup('meta', False) )
-        playdo.level_root.remove(tile_layer_to_rewrite)
-        playdo.level_root.insert(insert_index, tile_layer_to_rewrite)
+        playdo.MoveElement(tile_layer_to_rewrite, playdo.level_root, insert_index)
 
     # Set tiles2D to the tilelayer
     tile_layer_to_rewrite.find('data').text = tiled_utils.EncodeIntoZlibString64(new_tiles2d)
@@ -10,7 +10,7 @@ USAGE EXAMPLE:
 
 import time
 import math
-import xml.etree.ElementTree as ET
+from logic.common.xml_backend import ET
 from shapely.geometry import LineString, Polygon
 
 import logic.common.log_utils as log
@@ -104,6 +104,7 @@ def rename_property(tiled_object, old_name, new_name):
 	for property in prop_elem.findall('property'):
 		if property.get('name') != old_name: continue
 		property.set('name', new_name)
+		tiled_utils.ForgetCachedProperties(tiled_object)
 		break
 
 